@@ -0,0 +1,165 @@
+"""Benchmark de una ejecución completa de main.py sobre ciudades sintéticas.
+
+Cada tamaño se mide en un proceso aparte (el pico de RSS es por proceso): se
+genera la ciudad, se ejecuta el script con AppTest contra el directorio local
+y se recogen los tiempos por etapa y por pestaña, el pico de RSS y los bytes
+de las figuras de Plotly enviadas al navegador.
+
+    python -m benchmarks.bench_app --filas 10000 100000 1000000 --guardar benchmarks/baseline.json
+    python -m benchmarks.bench_app --filas 100000 --comparar benchmarks/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _pico_rss_mb():
+    # ru_maxrss está en KiB en Linux y en bytes en macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 1024 / 1024 if sys.platform == "darwin" else pico / 1024
+
+
+def medir(filas, repeticiones, directorio):
+    """Ejecuta el panel `repeticiones` veces sobre una ciudad de `filas` alojamientos."""
+    from benchmarks.datos_sinteticos import escribir_ciudades
+
+    escribir_ciudades(directorio, filas)
+    os.environ["AIRBNB_DATA_DIR"] = directorio
+    os.environ["AIRBNB_CACHE_DIR"] = os.path.join(directorio, "cache")
+    os.environ["AIRBNB_PERFIL"] = "1"
+
+    from streamlit.testing.v1 import AppTest
+    from panel import medicion
+
+    at = AppTest.from_file(os.path.join(RAIZ, "main.py"), default_timeout=1800)
+    ejecuciones = []
+    for _ in range(repeticiones):
+        medicion.reiniciar()
+        inicio = time.perf_counter()
+        # La primera ejecución carga la página; las siguientes son reruns
+        at.run()
+        total = time.perf_counter() - inicio
+        if at.exception:
+            raise RuntimeError(f"main.py falló con {filas} filas: {at.exception[0].message}")
+        etapas = defaultdict(float)
+        for nombre, segundos in medicion.registro:
+            etapas[nombre] += segundos
+        figuras = at.get("plotly_chart")
+        ejecuciones.append({
+            "total_s": total,
+            "etapas_s": dict(etapas),
+            "figuras": len(figuras),
+            "bytes_figuras": sum(len(f.proto.spec) for f in figuras),
+        })
+    return {"filas": filas, "pico_rss_mb": _pico_rss_mb(), "ejecuciones": ejecuciones}
+
+
+def _resumir(resultado):
+    # Mediana de cada métrica entre repeticiones
+    def mediana(valores):
+        valores = sorted(valores)
+        return valores[len(valores) // 2]
+
+    ejecuciones = resultado["ejecuciones"]
+    nombres = sorted({n for e in ejecuciones for n in e["etapas_s"]})
+    return {
+        "filas": resultado["filas"],
+        "pico_rss_mb": round(resultado["pico_rss_mb"], 1),
+        "total_s": round(mediana([e["total_s"] for e in ejecuciones]), 4),
+        "etapas_s": {n: round(mediana([e["etapas_s"].get(n, 0.0) for e in ejecuciones]), 4) for n in nombres},
+        "figuras": ejecuciones[-1]["figuras"],
+        "bytes_figuras": ejecuciones[-1]["bytes_figuras"],
+    }
+
+
+def _ejecutar_en_proceso(filas, repeticiones, directorio):
+    salida = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_app", "--trabajador",
+         "--filas", str(filas), "--repeticiones", str(repeticiones), "--directorio", directorio],
+        cwd=RAIZ, capture_output=True, text=True, check=False,
+    )
+    if salida.returncode != 0:
+        raise RuntimeError(salida.stderr.strip().splitlines()[-1] if salida.stderr else "error desconocido")
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def _imprimir(resumenes, referencia=None):
+    referencia = {r["filas"]: r for r in (referencia or {}).get("resultados", [])}
+    for resumen in resumenes:
+        base = referencia.get(resumen["filas"])
+        print(f"\n== {resumen['filas']} alojamientos ==")
+
+        def linea(nombre, valor, anterior, unidad):
+            cambio = f"  ({valor / anterior:.2f}x)" if anterior else ""
+            decimales = 4 if unidad == "s" else 0
+            print(f"  {nombre:<28} {valor:>14,.{decimales}f} {unidad}{cambio}")
+
+        linea("total", resumen["total_s"], base and base["total_s"], "s")
+        for nombre, segundos in resumen["etapas_s"].items():
+            linea(nombre, segundos, base and base["etapas_s"].get(nombre), "s")
+        linea("pico RSS", resumen["pico_rss_mb"], base and base["pico_rss_mb"], "MB")
+        linea("bytes de figuras", resumen["bytes_figuras"], base and base["bytes_figuras"], "B")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--directorio", help="Directorio para los ficheros sintéticos")
+    parser.add_argument("--guardar", help="Fichero JSON donde guardar los resultados como referencia")
+    parser.add_argument("--comparar", help="Fichero JSON de referencia con el que comparar")
+    parser.add_argument("--trabajador", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.trabajador:
+        resultado = medir(args.filas[0], args.repeticiones, args.directorio)
+        print(json.dumps(_resumir(resultado)))
+        return
+
+    resumenes = []
+    with tempfile.TemporaryDirectory() as temporal:
+        for filas in args.filas:
+            directorio = os.path.join(args.directorio or temporal, str(filas))
+            resumenes.append(_ejecutar_en_proceso(filas, args.repeticiones, directorio))
+
+    referencia = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            referencia = json.load(f)
+    _imprimir(resumenes, referencia)
+
+    if args.guardar:
+        import numpy
+        import pandas
+        import plotly
+        import streamlit
+
+        with open(args.guardar, "w", encoding="utf-8") as f:
+            json.dump({
+                "fecha": datetime.now().isoformat(timespec="seconds"),
+                "entorno": {
+                    "python": platform.python_version(),
+                    "plataforma": platform.platform(),
+                    "cpus": os.cpu_count(),
+                    "pandas": pandas.__version__,
+                    "numpy": numpy.__version__,
+                    "plotly": plotly.__version__,
+                    "streamlit": streamlit.__version__,
+                },
+                "resultados": resumenes,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.guardar}")
+
+
+if __name__ == "__main__":
+    main()
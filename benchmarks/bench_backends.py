@@ -0,0 +1,133 @@
+"""Benchmark de los motores de consulta (panel/backends.py) por tamaño e hilos.
+
+Cada combinación de tamaño, motor e hilos se mide en un proceso aparte (Polars
+fija su pool de hilos al importarse): se genera la ciudad, se publica en un
+directorio temporal y se miden las peticiones del panel (filas filtradas,
+mediana por barrio, recuento por tipo de habitación, histograma por rangos y
+media por tipo) con los filtros por defecto. Antes de medir se comprueba que
+cada motor devuelve lo mismo que pandas.
+
+    python -m benchmarks.bench_backends --filas 100000 1000000 --hilos 1 2 4 8
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BORDES_DISPONIBILIDAD = [0, 30, 90, 180, 270, 365]
+
+
+def _peticiones(backend, filtros):
+    return {
+        "posiciones": lambda: backend.posiciones(filtros),
+        "mediana_barrio": lambda: backend.agrupar(filtros, "neighbourhood_cleansed", "price"),
+        "conteo_tipo": lambda: backend.contar(filtros, "room_type"),
+        "histograma": lambda: backend.histograma(filtros, "availability_365", BORDES_DISPONIBILIDAD),
+        "media_tipo": lambda: backend.agrupar(filtros, "room_type", "review_scores_rating", "mean"),
+    }
+
+
+def _comprobar(resultado, referencia, nombre):
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(referencia, pd.DataFrame):
+        iguales = (list(resultado.iloc[:, 0]) == list(referencia.iloc[:, 0])
+                   and np.allclose(resultado.iloc[:, 1], referencia.iloc[:, 1], equal_nan=True)
+                   and np.array_equal(resultado["n"], referencia["n"]))
+    elif isinstance(referencia, pd.Series):
+        iguales = resultado.sort_index().equals(referencia.sort_index().astype(resultado.dtype))
+    else:
+        iguales = np.array_equal(resultado, referencia)
+    if not iguales:
+        raise AssertionError(f"{nombre}: el resultado no coincide con el de pandas")
+
+
+def medir(filas, motor, hilos, repeticiones, directorio):
+    """Mide cada petición con `motor` sobre una ciudad sintética de `filas` alojamientos."""
+    os.environ["AIRBNB_CACHE_DIR"] = directorio
+    from benchmarks.datos_sinteticos import generar_ciudad
+    from panel import almacen, backends
+    from panel.preparacion import filtros_por_defecto, limites_filtros, opciones_categoricas, preparar_dataset
+
+    ruta = almacen.publicar("bench", preparar_dataset(generar_ciudad(filas)))
+    data = almacen.abrir("bench")
+    cat = almacen.catalogo("bench")
+    filtros = filtros_por_defecto(limites_filtros(cat), *opciones_categoricas(cat))
+
+    inicio = time.perf_counter()
+    backend = backends.crear(data, ruta, motor, hilos)
+    carga = time.perf_counter() - inicio
+    if backend.nombre != motor:
+        raise RuntimeError(f"El motor {motor} no está disponible")
+
+    referencia = _peticiones(backends.BackendPandas(data), filtros)
+    tiempos = {}
+    for nombre, peticion in _peticiones(backend, filtros).items():
+        _comprobar(peticion(), referencia[nombre](), nombre)
+        muestras = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            peticion()
+            muestras.append(time.perf_counter() - inicio)
+        tiempos[nombre] = sorted(muestras)[len(muestras) // 2]
+    return {"filas": filas, "motor": motor, "hilos": hilos, "carga_s": carga, "tiempos_s": tiempos}
+
+
+def _ejecutar_en_proceso(filas, motor, hilos, repeticiones, directorio):
+    entorno = dict(os.environ, POLARS_MAX_THREADS=str(hilos))
+    salida = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_backends", "--trabajador", "--filas", str(filas),
+         "--motores", motor, "--hilos", str(hilos), "--repeticiones", str(repeticiones), "--directorio", directorio],
+        cwd=RAIZ, env=entorno, capture_output=True, text=True, check=False,
+    )
+    if salida.returncode != 0:
+        raise RuntimeError(salida.stderr.strip().splitlines()[-1] if salida.stderr else "error desconocido")
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--motores", nargs="+", default=None, help="Por defecto, todos los instalados")
+    parser.add_argument("--hilos", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--directorio", help="Directorio para los ficheros sintéticos")
+    parser.add_argument("--guardar", help="Fichero JSON donde guardar los resultados")
+    parser.add_argument("--trabajador", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.trabajador:
+        resultado = medir(args.filas[0], args.motores[0], args.hilos[0], args.repeticiones, args.directorio)
+        print(json.dumps(resultado))
+        return
+
+    from panel import backends
+
+    motores = args.motores or backends.disponibles()
+    resultados = []
+    with tempfile.TemporaryDirectory() as temporal:
+        for filas in args.filas:
+            print(f"\n== {filas} alojamientos ==")
+            for motor in motores:
+                # pandas no usa más de un hilo
+                for hilos in args.hilos[:1] if motor == "pandas" else args.hilos:
+                    directorio = os.path.join(args.directorio or temporal, f"{filas}-{motor}-{hilos}")
+                    r = _ejecutar_en_proceso(filas, motor, hilos, args.repeticiones, directorio)
+                    resultados.append(r)
+                    print(f"  {motor:<7} {hilos:>2} hilos  carga {r['carga_s']:6.3f} s | "
+                          + "  ".join(f"{n} {s * 1000:7.1f} ms" for n, s in r["tiempos_s"].items()))
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as f:
+            json.dump({"fecha": datetime.now().isoformat(timespec="seconds"), "cpus": os.cpu_count(),
+                       "resultados": resultados}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Micro-benchmarks de los núcleos de preparación de datos de cada rerun.
+
+Mide por separado, a varios tamaños, el parseo y conteo de amenidades con las
+columnas `has_*`, la conversión numérica, la conversión de porcentajes, la
+máscara de filtros del sidebar y los bloques de agrupación en rangos. Para
+cada núcleo se informa del tiempo (mínimo y mediana) y, en una ejecución
+aparte con tracemalloc, del pico de memoria asignada.
+
+    python -m benchmarks.bench_kernels --filas 10000 100000 --guardar benchmarks/kernels.json
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.datos_sinteticos import generar_ciudad
+from panel import preparacion
+
+# Los mismos rangos que usan los gráficos de main.py
+RANGOS = [
+    ("availability_365", [0, 50, 100, 150, 200, 250, 300, 365],
+     ["0-50", "51-100", "101-150", "151-200", "201-250", "251-300", "301-365"]),
+    ("host_response_rate", [0, 50, 80, 95, 100], ["0-50%", "50-80%", "80-95%", "95-100%"]),
+    ("host_acceptance_rate", [0, 50, 80, 100], ["0-50%", "50-80%", "80-100%"]),
+    ("number_of_reviews", [0, 10, 50, 100, float("inf")], ["0-10", "10-50", "50-100", ">100"]),
+    ("review_scores_rating", [0, 80, 90, 100], ["0-80", "80-90", "90-100"]),
+    ("review_scores_communication", [0, 80, 90, 100], ["0-80", "80-90", "90-100"]),
+    ("review_scores_checkin", [0, 80, 90, 100], ["0-80", "80-90", "90-100"]),
+    ("minimum_nights", [0, 2, 7, 365], ["1-2 noches", "3-7 noches", ">7 noches"]),
+    ("maximum_nights", [0, 30, 365, 1125], ["≤30 noches", "31-365 noches", ">365 noches"]),
+]
+
+
+def _datos_crudos(filas):
+    # Columnas numéricas como texto: el peor caso para la conversión
+    data = generar_ciudad(filas)
+    for col in preparacion.numeric_columns:
+        if col in data.columns:
+            data[col] = data[col].astype(str)
+    return data
+
+
+def _datos_convertidos(crudos):
+    data = crudos.copy()
+    preparacion.convertir_numericas(data)
+    preparacion.convertir_porcentajes(data)
+    return data
+
+
+def _agrupar_en_rangos(data, min_points=5):
+    for col, bins, labels in RANGOS:
+        plot_data = data.dropna(subset=[col])
+        rangos = preparacion.cortar_en_rangos(plot_data[col], bins, labels)
+        conteos = rangos.value_counts()
+        validos = conteos[conteos >= min_points].index.tolist()
+        plot_data[rangos.isin(validos)]
+
+
+def nucleos(crudos):
+    """Devuelve (nombre, preparar, ejecutar); `preparar` no se cronometra."""
+    convertidos = _datos_convertidos(crudos)
+    filtros = dict(
+        neighborhoods=convertidos["neighbourhood_cleansed"].unique()[:5].tolist(),
+        room_types=convertidos["room_type"].unique().tolist(),
+        price_range=(0, 500),
+        min_reviews=0,
+        min_nights_range=(1, 7),
+    )
+    amenidades_parseadas = convertidos["amenities"].apply(preparacion.parse_amenities)
+    conteo = preparacion.contar_amenidades(amenidades_parseadas)
+    comunes = [a for a, _ in conteo.most_common(10)]
+
+    return [
+        ("amenidades_parseo",
+         lambda: convertidos["amenities"],
+         lambda serie: serie.apply(preparacion.parse_amenities)),
+        ("amenidades_conteo",
+         lambda: amenidades_parseadas,
+         preparacion.contar_amenidades),
+        ("amenidades_has",
+         lambda: convertidos[["amenities"]].assign(amenities=amenidades_parseadas),
+         lambda data: preparacion.marcar_amenidades(data, comunes)),
+        ("amenidades_total",
+         lambda: convertidos[["amenities"]].copy(),
+         preparacion.procesar_amenidades),
+        ("conversion_numerica",
+         lambda: crudos[[c for c in preparacion.numeric_columns if c in crudos.columns]].copy(),
+         preparacion.convertir_numericas),
+        ("conversion_porcentajes",
+         lambda: crudos[preparacion.percent_columns].copy(),
+         preparacion.convertir_porcentajes),
+        ("mascara_filtros",
+         lambda: convertidos,
+         lambda data: preparacion.mascara_filtros(data, **filtros)),
+        ("agrupacion_rangos",
+         lambda: convertidos.assign(
+             host_response_rate=convertidos["host_response_rate"] * 100,
+             host_acceptance_rate=convertidos["host_acceptance_rate"] * 100,
+             review_scores_rating=convertidos["review_scores_rating"] * 20,
+             review_scores_communication=convertidos["review_scores_communication"] * 20,
+             review_scores_checkin=convertidos["review_scores_checkin"] * 20,
+         ),
+         _agrupar_en_rangos),
+    ]
+
+
+def medir(preparar, ejecutar, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        argumento = preparar()
+        inicio = time.perf_counter()
+        ejecutar(argumento)
+        tiempos.append(time.perf_counter() - inicio)
+    tiempos.sort()
+
+    # Memoria en una ejecución aparte: tracemalloc ralentiza el código Python
+    argumento = preparar()
+    tracemalloc.start()
+    try:
+        ejecutar(argumento)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "min_s": tiempos[0],
+        "mediana_s": tiempos[len(tiempos) // 2],
+        "pico_asignado_mb": pico / 1024 / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--nucleos", nargs="*", help="Limitar a estos núcleos")
+    parser.add_argument("--guardar", help="Fichero JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    resultados = []
+    for filas in args.filas:
+        crudos = _datos_crudos(filas)
+        print(f"\n== {filas} alojamientos ==")
+        print(f"  {'núcleo':<24} {'mín (s)':>10} {'mediana (s)':>12} {'pico (MB)':>10}")
+        for nombre, preparar, ejecutar in nucleos(crudos):
+            if args.nucleos and nombre not in args.nucleos:
+                continue
+            medida = medir(preparar, ejecutar, args.repeticiones)
+            resultados.append({"filas": filas, "nucleo": nombre, **medida})
+            print(f"  {nombre:<24} {medida['min_s']:>10.4f} {medida['mediana_s']:>12.4f} "
+                  f"{medida['pico_asignado_mb']:>10.1f}")
+
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as f:
+            json.dump({
+                "fecha": datetime.now().isoformat(timespec="seconds"),
+                "resultados": resultados,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.guardar}")
+
+
+if __name__ == "__main__":
+    main()
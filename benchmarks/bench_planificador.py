@@ -0,0 +1,168 @@
+"""Benchmark de latencia con varias sesiones concurrentes, con y sin planificador.
+
+Simula `--sesiones` sesiones que mueven el deslizador de precio sobre la misma
+ciudad (cada rerun filtra y construye dos pestañas) y una sesión ligera que
+solo mira un barrio. En modo "directo" cada sesión calcula en su propio hilo,
+como hace Streamlit; en modo "planificador" el trabajo pasa por
+panel/planificador.py; en modo "arrastre" además cada sesión pesada lanza un
+rerun nuevo cada `--intervalo` s abandonando el anterior, como al arrastrar
+un deslizador. Se informa de los percentiles de latencia por rerun de las
+sesiones pesadas y de la ligera, de los trabajos compartidos y del tiempo que
+tardan en detenerse los trabajos cancelados.
+
+    python -m benchmarks.bench_planificador --filas 100000 --sesiones 1 4 16
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.datos_sinteticos import generar_ciudad
+from panel import catalogo
+from panel.facetas import IndiceFacetas
+from panel.graficos import Grabacion, tab_anfitrion, tab_precios
+from panel.planificador import Planificador, Testigo
+from panel.preparacion import filtros_por_defecto, limites_filtros, opciones_categoricas, preparar_dataset, procesar_amenidades
+
+# Rangos de precio por los que pasan las sesiones pesadas al arrastrar el deslizador
+RANGOS_PRECIO = [(0, 100), (0, 150), (0, 200), (50, 200), (50, 300), (100, 500)]
+
+
+def _filtrar(testigo, data, facetas, filtros):
+    filtered_data = data.take(np.flatnonzero(facetas.mascara(filtros)))
+    if len(filtered_data) > 0 and "amenities" in filtered_data.columns:
+        procesar_amenidades(filtered_data, comprobar=testigo.comprobar)
+    return filtered_data
+
+
+def _grabar(testigo, tab, filtered_data):
+    grabacion = Grabacion(testigo)
+    tab(grabacion, filtered_data)
+    return grabacion
+
+
+def _rerun(planificador, sesion, data, facetas, filtros, abandonar=None):
+    """Un rerun; con `abandonar` (un Event) se deja a medias en cuanto se activa."""
+    clave = tuple((k, tuple(v) if isinstance(v, (list, tuple)) else v) for k, v in filtros.items())
+    if planificador is None:
+        filtered_data = _filtrar(Testigo(), data, facetas, filtros)
+        for tab in (tab_precios, tab_anfitrion):
+            _grabar(Testigo(), tab, filtered_data)
+        return True
+
+    def esperar(encargo):
+        # None si el rerun se abandona antes de que termine
+        while not encargo.done():
+            if abandonar is not None and abandonar.is_set():
+                return None
+            time.sleep(0.005)
+        return encargo.result()
+
+    encargos = [planificador.enviar(sesion, ("filtrado",) + clave, _filtrar, data, facetas, filtros)]
+    try:
+        filtered_data = esperar(encargos[0])
+        if filtered_data is None:
+            return False
+        encargos += [planificador.enviar(sesion, (tab.__name__,) + clave, _grabar, tab, filtered_data, conservar=True)
+                     for tab in (tab_precios, tab_anfitrion)]
+        return all(esperar(encargo) is not None for encargo in encargos[1:])
+    finally:
+        for encargo in encargos:
+            encargo.abandonar()
+
+
+def _percentiles(latencias):
+    if not latencias:
+        return {}
+    return {f"p{p}_s": float(np.percentile(latencias, p)) for p in (50, 95, 99)} | {"max_s": max(latencias)}
+
+
+def medir(data, facetas, filtros_base, sesiones, reruns, trabajadores, modo, intervalo=0.2):
+    planificador = Planificador(trabajadores) if modo != "directo" else None
+    pesadas, ligera = [], []
+    terminado = threading.Event()
+
+    def sesion_pesada(i):
+        azar = random.Random(i)
+        for n in range(reruns):
+            filtros = dict(filtros_base, price_range=azar.choice(RANGOS_PRECIO))
+            inicio = time.perf_counter()
+            if modo == "arrastre" and n < reruns - 1:
+                # El siguiente movimiento del deslizador llega a los `intervalo` s
+                abandonar = threading.Event()
+                threading.Timer(intervalo, abandonar.set).start()
+                if not _rerun(planificador, f"pesada-{i}", data, facetas, filtros, abandonar):
+                    continue
+            else:
+                _rerun(planificador, f"pesada-{i}", data, facetas, filtros)
+            pesadas.append(time.perf_counter() - inicio)
+
+    def sesion_ligera():
+        filtros = dict(filtros_base, neighborhoods=filtros_base["neighborhoods"][:1])
+        while not terminado.is_set():
+            inicio = time.perf_counter()
+            _rerun(planificador, "ligera", data, facetas, filtros)
+            ligera.append(time.perf_counter() - inicio)
+            time.sleep(0.05)
+
+    hilos = [threading.Thread(target=sesion_pesada, args=(i,)) for i in range(sesiones)]
+    hilo_ligero = threading.Thread(target=sesion_ligera)
+    inicio = time.perf_counter()
+    hilo_ligero.start()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    terminado.set()
+    hilo_ligero.join()
+    resultado = {
+        "modo": modo, "sesiones": sesiones, "total_s": time.perf_counter() - inicio,
+        "pesadas": _percentiles(pesadas), "ligera": _percentiles(ligera),
+    }
+    if planificador is not None:
+        estado = planificador.estadisticas()
+        resultado.update({c: estado[c] for c in ("compartidos", "reutilizados", "cancelados", "cancelacion_p95")})
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, default=100000)
+    parser.add_argument("--sesiones", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--reruns", type=int, default=5, help="Reruns de cada sesión pesada")
+    parser.add_argument("--intervalo", type=float, default=0.2, help="Segundos entre movimientos en modo arrastre")
+    parser.add_argument("--trabajadores", type=int, default=None, help="Hilos del planificador (por defecto, uno por CPU)")
+    parser.add_argument("--guardar", help="Fichero JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    data = preparar_dataset(generar_ciudad(args.filas))
+    cat = catalogo.describir(data)
+    opciones = opciones_categoricas(cat)
+    facetas = IndiceFacetas(data, *opciones)
+    filtros_base = filtros_por_defecto(limites_filtros(cat), *opciones)
+    trabajadores = args.trabajadores or Planificador().trabajadores
+
+    resultados = []
+    for sesiones in args.sesiones:
+        for modo in ("directo", "planificador", "arrastre"):
+            r = medir(data, facetas, filtros_base, sesiones, args.reruns, trabajadores, modo, args.intervalo)
+            resultados.append(r)
+            print(
+                f"{sesiones:>3} sesiones {modo:<13} total {r['total_s']:7.2f} s | "
+                f"pesadas p50 {r['pesadas']['p50_s']:6.2f} p95 {r['pesadas']['p95_s']:6.2f} s | "
+                f"ligera p50 {r['ligera'].get('p50_s', float('nan')):6.2f} p95 {r['ligera'].get('p95_s', float('nan')):6.2f} s"
+                + (f" | compartidos {r['compartidos']}, cancelados {r['cancelados']} "
+                   f"(p95 {r['cancelacion_p95'] * 1000:.0f} ms)" if "compartidos" in r else "")
+            )
+    if args.guardar:
+        with open(args.guardar, "w") as f:
+            json.dump({"fecha": datetime.now().isoformat(), "filas": args.filas,
+                       "trabajadores": trabajadores, "resultados": resultados}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""Generador de ciudades sintéticas con la forma de los ficheros de InsideAirbnb.
+
+Produce los mismos nombres de fichero que `ciudades_urls` en main.py para que
+el panel pueda leerlos con AIRBNB_DATA_DIR apuntando al directorio generado.
+
+    python -m benchmarks.datos_sinteticos --filas 100000 --directorio /tmp/airbnb
+    python -m benchmarks.datos_sinteticos --filas 10000 --directorio /tmp/airbnb --calendario
+"""
+import argparse
+import gzip
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import Voronoi
+
+AMENIDADES = [
+    "Wifi", "Kitchen", "Essentials", "Hair dryer", "Hangers", "Iron", "Washer",
+    "Air conditioning", "Heating", "Hot water", "TV", "Dishes and silverware",
+    "Refrigerator", "Microwave", "Cooking basics", "Bed linens", "Elevator",
+    "Dedicated workspace", "Coffee maker", "Shampoo", "Smoke alarm",
+    "Fire extinguisher", "First aid kit", "Long term stays allowed", "Balcony",
+    "Private entrance", "Pool", "Free parking on premises", "Paid parking off premises",
+    "Patio or balcony", "Oven", "Stove", "Dishwasher", "Crib", "Self check-in",
+    "Lockbox", "Luggage dropoff allowed", "Extra pillows and blankets",
+    "Room-darkening shades", "Bathtub", "Beach essentials", "Sea view",
+    "Outdoor furniture", "BBQ grill", "Garden view", "City skyline view",
+    "Pets allowed", "Gym", "Hot tub", "Baby bath",
+]
+TIPOS_HABITACION = ["Entire home/apt", "Private room", "Hotel room", "Shared room"]
+PESOS_HABITACION = [0.62, 0.34, 0.03, 0.01]
+TIPOS_PROPIEDAD = [
+    "Entire rental unit", "Private room in rental unit", "Entire condo",
+    "Entire home", "Entire serviced apartment", "Room in hotel",
+    "Private room in home", "Entire loft", "Entire villa", "Room in boutique hotel",
+]
+TIEMPOS_RESPUESTA = ["within an hour", "within a few hours", "within a day", "a few days or more"]
+PALABRAS_NOMBRE = [
+    "Ático", "Piso", "Apartamento", "Estudio", "Habitación", "Loft", "Casa",
+    "luminoso", "céntrico", "con terraza", "con piscina", "cerca de la playa",
+    "reformado", "acogedor", "vistas al mar", "en el casco antiguo",
+]
+
+
+def generar_ciudad(filas, semilla=0, barrios=60):
+    """Devuelve un DataFrame de `filas` alojamientos con columnas de InsideAirbnb."""
+    rng = np.random.default_rng(semilla)
+
+    # Barrios con popularidad desigual y un centro geográfico propio
+    nombres_barrios = np.array([f"Barrio {i:02d}" for i in range(barrios)])
+    popularidad = rng.pareto(1.2, barrios) + 1
+    popularidad /= popularidad.sum()
+    barrio = rng.choice(barrios, size=filas, p=popularidad)
+    centros_lat = 41.39 + rng.normal(0, 0.03, barrios)
+    centros_lon = 2.17 + rng.normal(0, 0.04, barrios)
+
+    tipo = rng.choice(len(TIPOS_HABITACION), size=filas, p=PESOS_HABITACION)
+    accommodates = np.where(tipo == 0, rng.integers(1, 9, filas), rng.integers(1, 3, filas))
+    bedrooms = np.maximum(1, accommodates // 2 + rng.integers(-1, 2, filas)).astype(float)
+    beds = np.maximum(1, bedrooms + rng.integers(0, 3, filas)).astype(float)
+    bathrooms = np.maximum(1, np.round((bedrooms / 2 + rng.normal(0, 0.4, filas)) * 2) / 2)
+    precio = np.round(rng.lognormal(np.log(60 + 18 * accommodates), 0.55), 0)
+
+    disponibilidad = rng.integers(0, 366, filas)
+    reseñas = rng.negative_binomial(1, 0.02, filas)
+    noches_min = rng.choice([1, 1, 1, 2, 2, 3, 4, 5, 7, 30, 31, 90], size=filas)
+    noches_max = rng.choice([30, 60, 90, 365, 1125, 9999], size=filas)
+    listados_anfitrion = rng.geometric(0.35, filas)
+
+    # Puntuaciones en escala 0-5 con huecos para alojamientos sin reseñas
+    def puntuacion(media):
+        valores = np.clip(rng.normal(media, 0.3, filas), 1, 5).round(2)
+        return np.where(reseñas == 0, np.nan, valores)
+
+    # Fechas como texto, igual que en los ficheros originales
+    dias_alta = rng.integers(0, 15 * 365, filas)
+    host_since = (pd.Timestamp("2024-06-01") - pd.to_timedelta(dias_alta, unit="D")).strftime("%Y-%m-%d")
+    last_scraped = np.where(rng.random(filas) < 0.8, "2024-06-15", "2024-06-16")
+
+    # Tasas porcentuales como texto ("95%"), con nulos
+    def tasa(alfa, beta):
+        valores = (rng.beta(alfa, beta, filas) * 100).round().astype(int).astype(str)
+        return np.where(rng.random(filas) < 0.15, None, np.char.add(valores, "%"))
+
+    # Amenidades como cadena de lista, con tamaño variable por alojamiento
+    popularidad_amenidades = np.linspace(0.95, 0.05, len(AMENIDADES))
+    presencia = rng.random((filas, len(AMENIDADES))) < popularidad_amenidades
+    nombres_amenidades = np.array(AMENIDADES, dtype=object)
+    amenities = [
+        "[" + ", ".join(f'"{a}"' for a in nombres_amenidades[fila]) + "]"
+        for fila in presencia
+    ]
+
+    nombre = [
+        f"{PALABRAS_NOMBRE[a]} {PALABRAS_NOMBRE[b]} {PALABRAS_NOMBRE[c]}"
+        for a, b, c in zip(
+            rng.integers(0, 7, filas), rng.integers(7, 12, filas), rng.integers(12, 16, filas)
+        )
+    ]
+
+    return pd.DataFrame({
+        "id": np.arange(1, filas + 1, dtype=np.int64),
+        "name": nombre,
+        "neighbourhood_cleansed": nombres_barrios[barrio],
+        "latitude": centros_lat[barrio] + rng.normal(0, 0.006, filas),
+        "longitude": centros_lon[barrio] + rng.normal(0, 0.008, filas),
+        "property_type": np.array(TIPOS_PROPIEDAD)[rng.integers(0, len(TIPOS_PROPIEDAD), filas)],
+        "room_type": np.array(TIPOS_HABITACION)[tipo],
+        "accommodates": accommodates,
+        "bathrooms": bathrooms,
+        "bedrooms": bedrooms,
+        "beds": beds,
+        "amenities": amenities,
+        "price": precio,
+        "minimum_nights": noches_min,
+        "maximum_nights": noches_max,
+        "availability_365": disponibilidad,
+        "number_of_reviews": reseñas,
+        "last_scraped": last_scraped,
+        "host_since": host_since,
+        "host_response_time": np.array(TIEMPOS_RESPUESTA)[rng.integers(0, 4, filas)],
+        "host_response_rate": tasa(8, 1),
+        "host_acceptance_rate": tasa(5, 1),
+        "host_listings_count": listados_anfitrion,
+        "host_total_listings_count": listados_anfitrion + rng.integers(0, 3, filas),
+        "review_scores_rating": puntuacion(4.7),
+        "review_scores_cleanliness": puntuacion(4.6),
+        "review_scores_checkin": puntuacion(4.8),
+        "review_scores_communication": puntuacion(4.8),
+        "review_scores_location": puntuacion(4.7),
+    })
+
+
+def escribir_ciudad(ruta, filas, semilla=0, filas_por_grupo=65536):
+    """Genera una ciudad y la guarda en parquet con grupos de filas de tamaño fijo."""
+    data = generar_ciudad(filas, semilla=semilla)
+    data.to_parquet(ruta, index=False, row_group_size=filas_por_grupo)
+    return ruta
+
+
+def generar_barrios(data, vertices_por_lado=40):
+    """GeoJSON de barrios: celdas de Voronoi de los centros con bordes ondulados.
+
+    La ondulación depende solo de la posición, así que los barrios vecinos
+    comparten exactamente el mismo borde.
+    """
+    centros = data.groupby("neighbourhood_cleansed")[["longitude", "latitude"]].mean()
+    puntos = centros.to_numpy()
+    # Un anillo de puntos auxiliares alrededor de la ciudad acota las celdas exteriores
+    centro = puntos.mean(axis=0)
+    radio = np.abs(data[["longitude", "latitude"]].to_numpy() - centro).max(axis=0) * 1.3
+    angulos = np.linspace(0, 2 * np.pi, 24, endpoint=False)
+    auxiliares = centro + radio * np.column_stack([np.cos(angulos), np.sin(angulos)])
+    voronoi = Voronoi(np.vstack([puntos, auxiliares]))
+    t = np.linspace(0, 1, vertices_por_lado, endpoint=False)[:, None]
+
+    features = []
+    for i, nombre in enumerate(centros.index):
+        region = voronoi.regions[voronoi.point_region[i]]
+        esquinas = voronoi.vertices[region]
+        siguientes = np.roll(esquinas, -1, axis=0)
+        anillo = np.concatenate([a + t * (b - a) for a, b in zip(esquinas, siguientes)])
+        anillo = anillo + 0.0004 * np.sin(anillo[:, ::-1] * 900)
+        anillo = np.vstack([anillo, anillo[:1]]).round(6).tolist()
+        features.append({
+            "type": "Feature",
+            "properties": {"neighbourhood": nombre, "neighbourhood_group": None},
+            "geometry": {"type": "MultiPolygon", "coordinates": [[anillo]]},
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def escribir_calendario(ruta, data, dias=365, semilla=0, filas_por_bloque=2000):
+    """Escribe un `calendar.csv.gz` de InsideAirbnb: una fila por alojamiento y día.
+
+    La ocupación y el precio siguen una temporada con pico en agosto; se escribe
+    por bloques de alojamientos para no tener todo el calendario en memoria.
+    """
+    rng = np.random.default_rng(semilla)
+    fechas = pd.date_range("2024-06-15", periods=dias, freq="D")
+    temporada = 1 + 0.35 * np.cos(2 * np.pi * (fechas.dayofyear.to_numpy() - 220) / 365)
+    fin_de_semana = np.where(fechas.dayofweek.to_numpy() >= 4, 1.15, 1.0)
+    texto_fechas = fechas.strftime("%Y-%m-%d").to_numpy()
+    libre_base = data["availability_365"].to_numpy() / 365
+    with gzip.open(ruta, "wt", encoding="utf-8", newline="") as f:
+        f.write("listing_id,date,available,price,adjusted_price,minimum_nights,maximum_nights\n")
+        for inicio in range(0, len(data), filas_por_bloque):
+            fin = min(inicio + filas_por_bloque, len(data))
+            n = fin - inicio
+            prob_libre = np.clip(libre_base[inicio:fin, None] / temporada[None, :] ** 2, 0, 1)
+            libre = rng.random((n, dias)) < prob_libre
+            precio = data["price"].to_numpy()[inicio:fin, None] * temporada * fin_de_semana
+            bloque = pd.DataFrame({
+                "listing_id": np.repeat(data["id"].to_numpy()[inicio:fin], dias),
+                "date": np.tile(texto_fechas, n),
+                "available": np.where(libre.ravel(), "t", "f"),
+                "price": pd.Series(precio.ravel()).map("${:,.2f}".format),
+                "adjusted_price": "",
+                "minimum_nights": np.repeat(data["minimum_nights"].to_numpy()[inicio:fin], dias),
+                "maximum_nights": np.repeat(data["maximum_nights"].to_numpy()[inicio:fin], dias),
+            })
+            bloque.to_csv(f, header=False, index=False)
+    return ruta
+
+
+def escribir_ciudades(directorio, filas, ciudades=None, semilla=0, calendario=False):
+    """Escribe `inmuebles_<ciudad>.parquet` y `barrios_<ciudad>.geojson` por ciudad en `directorio`."""
+    os.makedirs(directorio, exist_ok=True)
+    ciudades = ciudades or ["barcelona"]
+    rutas = []
+    for i, ciudad in enumerate(ciudades):
+        ruta = os.path.join(directorio, f"inmuebles_{ciudad.lower()}.parquet")
+        rutas.append(escribir_ciudad(ruta, filas, semilla=semilla + i))
+        ruta_barrios = os.path.join(directorio, f"barrios_{ciudad.lower()}.geojson")
+        with open(ruta_barrios, "w", encoding="utf-8") as f:
+            json.dump(generar_barrios(pd.read_parquet(ruta, columns=["neighbourhood_cleansed", "latitude", "longitude"])), f)
+        rutas.append(ruta_barrios)
+        if calendario:
+            ruta_calendario = os.path.join(directorio, f"calendario_{ciudad.lower()}.csv.gz")
+            columnas = ["id", "price", "availability_365", "minimum_nights", "maximum_nights"]
+            rutas.append(escribir_calendario(ruta_calendario, pd.read_parquet(ruta, columns=columnas), semilla=semilla + i))
+    return rutas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, default=10000)
+    parser.add_argument("--directorio", required=True)
+    parser.add_argument("--ciudades", nargs="*", default=["barcelona"])
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--calendario", action="store_true", help="Escribir también calendario_<ciudad>.csv.gz")
+    args = parser.parse_args()
+    for ruta in escribir_ciudades(args.directorio, args.filas, args.ciudades, args.semilla, args.calendario):
+        print(ruta)
+
+
+if __name__ == "__main__":
+    main()
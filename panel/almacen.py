@@ -0,0 +1,232 @@
+"""Almacén de datasets preparados en ficheros Arrow mapeados en memoria.
+
+Cada ciudad se prepara una sola vez (limpieza, conversión y variables
+derivadas) y se publica como fichero Arrow IPC sin comprimir. Los procesos del
+servidor lo abren con `mmap`: las columnas numéricas se leen sin copia, así que
+todas las sesiones y todos los procesos comparten las mismas páginas de la
+caché del sistema operativo. Los arrays resultantes son de solo lectura.
+
+Junto a cada fichero se guarda su catálogo de columnas (ver panel/catalogo.py),
+su índice de búsqueda de texto (ver panel/busqueda.py) y las firmas de sus
+amenidades (ver panel/similitud.py). Cada scrape publicado se registra además
+como versión del histórico de la ciudad (ver panel/historico.py).
+
+El directorio se configura con AIRBNB_CACHE_DIR y la caducidad con
+AIRBNB_CACHE_HORAS (24 h por defecto) para los orígenes remotos.
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from panel import busqueda as busquedas
+from panel import catalogo as catalogos
+from panel import historico as historicos
+from panel import similitud as similitudes
+from panel.preparacion import marcar_atipicos, preparar_dataset
+
+# Cambiar al modificar la preparación para invalidar los ficheros publicados
+VERSION = "3"
+
+DIRECTORIO_CACHE = os.environ.get("AIRBNB_CACHE_DIR", os.path.join(tempfile.gettempdir(), "airbnb_panel"))
+HORAS_CADUCIDAD = float(os.environ.get("AIRBNB_CACHE_HORAS", "24"))
+
+
+def ruta_dataset(ciudad):
+    return os.path.join(DIRECTORIO_CACHE, f"{ciudad.lower()}.arrow")
+
+
+def _firma_origen(origen):
+    # Los ficheros locales se identifican también por su fecha de modificación
+    if os.path.exists(origen):
+        return f"{os.path.abspath(origen)}@{os.path.getmtime(origen)}"
+    return origen
+
+
+@contextmanager
+def _bloqueo(ruta):
+    # Evita que varios procesos preparen la misma ciudad a la vez
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(ruta + ".lock", "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _a_tabla(data):
+    # Los float se guardan con NaN en lugar de nulos para que la lectura sea sin copia
+    columnas = []
+    for col in data.columns:
+        serie = data[col]
+        if serie.dtype.kind == "f":
+            columnas.append(pa.array(serie.to_numpy(), from_pandas=False))
+        else:
+            columnas.append(pa.Array.from_pandas(serie))
+    return pa.Table.from_arrays(columnas, names=[str(c) for c in data.columns])
+
+
+def publicar(ciudad, data, origen=""):
+    """Escribe el dataset preparado de forma atómica y devuelve su ruta."""
+    os.makedirs(DIRECTORIO_CACHE, exist_ok=True)
+    ruta = ruta_dataset(ciudad)
+    tabla = _a_tabla(data)
+    metadatos = {"version": VERSION, "origen": _firma_origen(origen)}
+    tabla = tabla.replace_schema_metadata({"panel": json.dumps(metadatos)})
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with pa.OSFile(temporal, "wb") as f:
+        with pa.ipc.new_file(f, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+    # Los lectores que ya tienen mapeado el fichero anterior lo siguen viendo
+    os.replace(temporal, ruta)
+    catalogos.guardar(ruta, catalogos.describir(data))
+    busquedas.guardar(ruta, busquedas.IndiceTexto.construir(data))
+    similitudes.guardar(ruta, similitudes.IndiceSimilitud.construir(data))
+    historicos.registrar(ruta, data, _firma_origen(origen))
+    return ruta
+
+
+def _vigente(ruta, origen):
+    if not os.path.exists(ruta):
+        return False
+    try:
+        with pa.memory_map(ruta, "r") as fuente:
+            esquema = pa.ipc.open_file(fuente).schema
+        metadatos = json.loads((esquema.metadata or {}).get(b"panel", b"{}"))
+    except (pa.ArrowInvalid, OSError, ValueError):
+        return False
+    if metadatos.get("version") != VERSION or metadatos.get("origen") != _firma_origen(origen):
+        return False
+    if not os.path.exists(origen):
+        return time.time() - os.path.getmtime(ruta) < HORAS_CADUCIDAD * 3600
+    return True
+
+
+def vigente(ciudad, origen):
+    """Indica si ya hay un dataset publicado y al día para `ciudad`."""
+    return _vigente(ruta_dataset(ciudad), origen)
+
+
+def _ruta_local(ciudad, origen):
+    # La lectura por grupos necesita acceso aleatorio: los orígenes remotos se descargan antes
+    if os.path.exists(origen):
+        return origen
+    destino = os.path.join(DIRECTORIO_CACHE, f"{ciudad.lower()}.parquet")
+    temporal = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with urllib.request.urlopen(origen) as respuesta, open(temporal, "wb") as f:
+        shutil.copyfileobj(respuesta, f, 1 << 20)
+    os.replace(temporal, destino)
+    return destino
+
+
+def leer_por_grupos(ruta, filas_por_lote=65536):
+    """Genera (parte preparada, filas totales) leyendo el parquet grupo a grupo."""
+    fichero = pq.ParquetFile(ruta)
+    total = fichero.metadata.num_rows
+    for lote in fichero.iter_batches(batch_size=filas_por_lote):
+        yield preparar_dataset(lote.to_pandas()), total
+
+
+def abrir(ciudad):
+    """Abre el dataset publicado de una ciudad sin copiar sus columnas numéricas."""
+    tabla = pa.ipc.open_file(pa.memory_map(ruta_dataset(ciudad), "r")).read_all()
+    return tabla.to_pandas(split_blocks=True)
+
+
+def catalogo(ciudad):
+    """Catálogo de columnas del dataset publicado de una ciudad.
+
+    Los datasets publicados antes de existir el catálogo lo generan la primera vez.
+    """
+    ruta = ruta_dataset(ciudad)
+    resultado = catalogos.cargar(ruta)
+    if resultado is None:
+        with _bloqueo(ruta):
+            resultado = catalogos.cargar(ruta)
+            if resultado is None:
+                resultado = catalogos.describir(abrir(ciudad))
+                catalogos.guardar(ruta, resultado)
+    return resultado
+
+
+def busqueda(ciudad):
+    """Índice de búsqueda de texto del dataset publicado de una ciudad.
+
+    Los datasets publicados antes de existir el índice lo generan la primera vez.
+    """
+    ruta = ruta_dataset(ciudad)
+    resultado = busquedas.cargar(ruta)
+    if resultado is None:
+        with _bloqueo(ruta):
+            resultado = busquedas.cargar(ruta)
+            if resultado is None:
+                resultado = busquedas.IndiceTexto.construir(abrir(ciudad))
+                busquedas.guardar(ruta, resultado)
+    return resultado
+
+
+def similitud(ciudad, amenidades=None):
+    """Firmas de amenidades del dataset publicado de una ciudad.
+
+    Los datasets publicados antes de existir las firmas las generan la primera
+    vez, con las listas de `amenidades` (`AmenidadesParseadas`) si se pasan.
+    """
+    ruta = ruta_dataset(ciudad)
+    resultado = similitudes.cargar(ruta)
+    if resultado is None:
+        with _bloqueo(ruta):
+            resultado = similitudes.cargar(ruta)
+            if resultado is None:
+                resultado = similitudes.IndiceSimilitud.construir(abrir(ciudad), amenidades)
+                similitudes.guardar(ruta, resultado)
+    return resultado
+
+
+def historico(ciudad):
+    """Histórico de instantáneas de una ciudad.
+
+    Los datasets publicados antes de existir el histórico se registran como
+    su primera versión.
+    """
+    ruta = ruta_dataset(ciudad)
+    resultado = historicos.abrir(ruta)
+    if len(resultado) == 0:
+        with _bloqueo(ruta):
+            if len(resultado) == 0:
+                resultado.registrar(abrir(ciudad))
+    return resultado
+
+
+def obtener(ciudad, origen, al_avanzar=None):
+    """Devuelve el dataset preparado, publicándolo antes si no existe o ha caducado.
+
+    Si hay que publicarlo, `al_avanzar(parte, total)` se llama con cada grupo de
+    filas ya preparado, a medida que se lee.
+    """
+    ruta = ruta_dataset(ciudad)
+    if not _vigente(ruta, origen):
+        os.makedirs(DIRECTORIO_CACHE, exist_ok=True)
+        with _bloqueo(ruta):
+            # Otro proceso puede haberlo publicado mientras esperábamos
+            if not _vigente(ruta, origen):
+                partes = []
+                for parte, total in leer_por_grupos(_ruta_local(ciudad, origen)):
+                    partes.append(parte)
+                    if al_avanzar is not None:
+                        al_avanzar(parte, total)
+                # Los atípicos se comparan con toda la ciudad, no con cada grupo de filas
+                publicar(ciudad, marcar_atipicos(pd.concat(partes, ignore_index=True)), origen)
+    return abrir(ciudad)
@@ -0,0 +1,265 @@
+"""Motores de consulta intercambiables para filtrar y agregar una ciudad.
+
+Las peticiones del panel se expresan igual para todos los motores: filas que
+cumplen los filtros del sidebar (con las claves de `filtros_por_defecto`),
+un agregado de una columna por grupo, recuentos de valores y recuentos por
+rangos con la semántica de `cortar_en_rangos`. Los resultados son siempre los
+mismos: posiciones de fila del dataset publicado y objetos de pandas.
+
+- "pandas": las operaciones de siempre sobre el DataFrame; es el motor por
+  defecto y el de reserva;
+- "duckdb": SQL vectorizado y multihilo sobre el fichero Arrow publicado
+  (ver panel/almacen.py), cargado una vez en una tabla propia de DuckDB:
+  filtrar el Arrow registrado directamente es varias veces más lento;
+- "polars": consultas perezosas multihilo sobre el mismo fichero.
+
+El motor se elige con AIRBNB_BACKEND; si su paquete no está instalado se usa
+pandas. En los motores columnares los NaN de las columnas float se tratan
+como nulos, igual que pandas los ignora al comparar y agregar.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from panel.preparacion import cortar_en_rangos, mascara_filtros
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+MOTOR = os.environ.get("AIRBNB_BACKEND", "pandas")
+AGREGACIONES = ["median", "mean", "sum", "min", "max"]
+
+
+def _leer_arrow(ruta):
+    # Columnas del mmap sin copia y la posición de cada fila para devolver resultados alineados
+    tabla = pa.ipc.open_file(pa.memory_map(ruta, "r")).read_all()
+    return tabla.append_column("_fila", pa.array(np.arange(tabla.num_rows, dtype=np.int64)))
+
+
+def cargar_tabla_duckdb(conexion, nombre, ruta):
+    """Crea (o sustituye) la tabla `nombre` de DuckDB con el Arrow publicado en `ruta`.
+
+    Los NaN de las columnas float pasan a ser nulos.
+    """
+    tabla = _leer_arrow(ruta)
+    conexion.register("_arrow", tabla)
+    try:
+        flotantes = [c.name for c in tabla.schema if pa.types.is_floating(c.type)]
+        reemplazos = ", ".join(f'CASE WHEN isnan("{c}") THEN NULL ELSE "{c}" END AS "{c}"' for c in flotantes)
+        conexion.execute(
+            f'CREATE OR REPLACE TABLE "{nombre}" AS SELECT * {f"REPLACE ({reemplazos})" if reemplazos else ""} FROM _arrow'
+        )
+    finally:
+        conexion.unregister("_arrow")
+
+
+def _etiquetas(bordes):
+    return [f"{bordes[i]}-{bordes[i + 1]}" for i in range(len(bordes) - 1)]
+
+
+class BackendPandas:
+    """Las operaciones de pandas sobre el DataFrame de la ciudad."""
+
+    nombre = "pandas"
+
+    def __init__(self, data, mascara=None):
+        self.data = data
+        # `mascara(filtros)` alternativa a `mascara_filtros`, p. ej. la de `IndiceFacetas`
+        self._mascara = mascara or (lambda filtros: mascara_filtros(self.data, **filtros).to_numpy())
+
+    def _filas(self, filtros):
+        return self.data[self._mascara(filtros)]
+
+    def posiciones(self, filtros):
+        """Posiciones ordenadas de las filas que cumplen `filtros`."""
+        return np.flatnonzero(self._mascara(filtros))
+
+    def agrupar(self, filtros, por, columna, agregacion="median"):
+        """DataFrame [por, columna, n] con el agregado de `columna` por grupo, ordenado por grupo."""
+        resultado = self._filas(filtros).groupby(por)[columna].agg([agregacion, "count"])
+        return resultado.set_axis([columna, "n"], axis=1).reset_index().sort_values(por, ignore_index=True)
+
+    def contar(self, filtros, columna):
+        """Series con el número de filas de cada valor de `columna`, de más a menos."""
+        return self._filas(filtros)[columna].value_counts()
+
+    def histograma(self, filtros, columna, bordes):
+        """Filas en cada rango de `bordes` (el primero incluye su límite inferior)."""
+        rangos = cortar_en_rangos(self._filas(filtros)[columna], bordes, _etiquetas(bordes))
+        return rangos.value_counts(sort=False).to_numpy()
+
+
+class BackendDuckDB:
+    """Consultas SQL de DuckDB sobre el Arrow publicado de la ciudad."""
+
+    nombre = "duckdb"
+
+    def __init__(self, ruta, hilos=None):
+        self._conexion = duckdb.connect()
+        if hilos:
+            self._conexion.execute(f"SET threads = {int(hilos)}")
+        cargar_tabla_duckdb(self._conexion, "alojamientos", ruta)
+        # Una conexión de DuckDB no admite consultas simultáneas; cada consulta ya usa varios hilos
+        self._bloqueo = threading.Lock()
+
+    def _consultar(self, sql, parametros=()):
+        with self._bloqueo:
+            resultado = self._conexion.execute(sql, list(parametros)).arrow()
+        # Las versiones recientes devuelven un lector por lotes en lugar de la tabla
+        return resultado.read_all() if isinstance(resultado, pa.RecordBatchReader) else resultado
+
+    @staticmethod
+    def _donde(filtros):
+        return (
+            "list_contains(?::VARCHAR[], neighbourhood_cleansed) AND list_contains(?::VARCHAR[], room_type) "
+            "AND price BETWEEN ? AND ? AND number_of_reviews >= ? AND minimum_nights BETWEEN ? AND ?"
+        ), [
+            list(filtros["neighborhoods"]), list(filtros["room_types"]),
+            filtros["price_range"][0], filtros["price_range"][1], filtros["min_reviews"],
+            filtros["min_nights_range"][0], filtros["min_nights_range"][1],
+        ]
+
+    def posiciones(self, filtros):
+        donde, parametros = self._donde(filtros)
+        tabla = self._consultar(f"SELECT _fila FROM alojamientos WHERE {donde}", parametros)
+        return np.sort(tabla.column("_fila").to_numpy())
+
+    def agrupar(self, filtros, por, columna, agregacion="median"):
+        if agregacion not in AGREGACIONES:
+            raise ValueError(f"Agregación no soportada: {agregacion}")
+        donde, parametros = self._donde(filtros)
+        tabla = self._consultar(
+            f'SELECT "{por}", {agregacion}("{columna}") AS "{columna}", count("{columna}") AS n '
+            f'FROM alojamientos WHERE {donde} AND "{por}" IS NOT NULL GROUP BY "{por}" ORDER BY "{por}"',
+            parametros,
+        )
+        return tabla.to_pandas()
+
+    def contar(self, filtros, columna):
+        donde, parametros = self._donde(filtros)
+        tabla = self._consultar(
+            f'SELECT "{columna}", count(*) AS n FROM alojamientos WHERE {donde} AND "{columna}" IS NOT NULL '
+            f'GROUP BY "{columna}" ORDER BY n DESC',
+            parametros,
+        )
+        return pd.Series(tabla.column("n").to_numpy(), index=tabla.column(columna).to_pylist(), name="count")
+
+    def histograma(self, filtros, columna, bordes):
+        donde, parametros = self._donde(filtros)
+        casos = [f'WHEN "{columna}" BETWEEN {float(bordes[0])!r} AND {float(bordes[1])!r} THEN 0']
+        casos += [
+            f'WHEN "{columna}" > {float(bordes[i])!r} AND "{columna}" <= {float(bordes[i + 1])!r} THEN {i}'
+            for i in range(1, len(bordes) - 1)
+        ]
+        tabla = self._consultar(
+            f"SELECT rango, count(*) AS n FROM (SELECT CASE {' '.join(casos)} END AS rango "
+            f"FROM alojamientos WHERE {donde}) WHERE rango IS NOT NULL GROUP BY rango",
+            parametros,
+        )
+        conteos = np.zeros(len(bordes) - 1, dtype=np.int64)
+        conteos[tabla.column("rango").to_numpy()] = tabla.column("n").to_numpy()
+        return conteos
+
+
+class BackendPolars:
+    """Consultas perezosas de Polars sobre el Arrow publicado de la ciudad."""
+
+    nombre = "polars"
+
+    def __init__(self, ruta):
+        marco = pl.from_arrow(_leer_arrow(ruta))
+        flotantes = [c for c, tipo in marco.schema.items() if tipo in (pl.Float32, pl.Float64)]
+        self._marco = marco.with_columns([pl.col(c).fill_nan(None) for c in flotantes])
+
+    def _filas(self, filtros):
+        precio, noches = filtros["price_range"], filtros["min_nights_range"]
+        return self._marco.lazy().filter(
+            pl.col("neighbourhood_cleansed").is_in(list(filtros["neighborhoods"]))
+            & pl.col("room_type").is_in(list(filtros["room_types"]))
+            & pl.col("price").is_between(precio[0], precio[1])
+            & (pl.col("number_of_reviews") >= filtros["min_reviews"])
+            & pl.col("minimum_nights").is_between(noches[0], noches[1])
+        )
+
+    def posiciones(self, filtros):
+        return np.sort(self._filas(filtros).select("_fila").collect().to_series().to_numpy())
+
+    def agrupar(self, filtros, por, columna, agregacion="median"):
+        if agregacion not in AGREGACIONES:
+            raise ValueError(f"Agregación no soportada: {agregacion}")
+        resultado = (
+            self._filas(filtros).filter(pl.col(por).is_not_null()).group_by(por)
+            .agg(getattr(pl.col(columna), agregacion)().alias(columna), pl.col(columna).count().alias("n"))
+            .sort(por).collect()
+        )
+        return resultado.to_pandas()
+
+    def contar(self, filtros, columna):
+        resultado = (
+            self._filas(filtros).filter(pl.col(columna).is_not_null()).group_by(columna)
+            .agg(pl.len().cast(pl.Int64).alias("n")).sort("n", descending=True).collect()
+        )
+        return pd.Series(resultado["n"].to_numpy(), index=resultado[columna].to_list(), name="count")
+
+    def histograma(self, filtros, columna, bordes):
+        valor = pl.col(columna)
+        rango = pl.when(valor.is_between(bordes[0], bordes[1])).then(0)
+        for i in range(1, len(bordes) - 1):
+            rango = rango.when((valor > bordes[i]) & (valor <= bordes[i + 1])).then(i)
+        resultado = (
+            self._filas(filtros).select(rango.alias("rango")).drop_nulls()
+            .group_by("rango").agg(pl.len().alias("n")).collect()
+        )
+        conteos = np.zeros(len(bordes) - 1, dtype=np.int64)
+        conteos[resultado["rango"].to_numpy()] = resultado["n"].to_numpy()
+        return conteos
+
+
+class Agregados:
+    """Agregados de las filas que cumplen `filtros`, pedidos a `backend`.
+
+    Es lo que reciben las pestañas para no agrupar ni contar `filtered_data`
+    con pandas; sin él (p. ej. con el motor de pandas, que ya tiene las filas
+    filtradas) las pestañas agregan con pandas como siempre.
+    """
+
+    def __init__(self, backend, filtros):
+        self.backend = backend
+        self.filtros = filtros
+
+    def agrupar(self, por, columna, agregacion="median"):
+        return self.backend.agrupar(self.filtros, por, columna, agregacion)
+
+    def contar(self, columna):
+        return self.backend.contar(self.filtros, columna)
+
+    def histograma(self, columna, bordes):
+        return self.backend.histograma(self.filtros, columna, bordes)
+
+
+def disponibles():
+    """Motores que se pueden usar en este entorno."""
+    return ["pandas"] + [nombre for nombre, modulo in (("duckdb", duckdb), ("polars", pl)) if modulo is not None]
+
+
+def crear(data, ruta, motor=MOTOR, hilos=None, mascara=None):
+    """Backend `motor` de la ciudad cuyo dataset es `data`, publicado en `ruta`.
+
+    Si el motor no está instalado o `ruta` no existe, devuelve el de pandas,
+    que filtra con `mascara` si se indica.
+    """
+    if motor == "duckdb" and duckdb is not None and os.path.exists(ruta):
+        return BackendDuckDB(ruta, hilos)
+    if motor == "polars" and pl is not None and os.path.exists(ruta):
+        return BackendPolars(ruta)
+    return BackendPandas(data, mascara)
@@ -0,0 +1,289 @@
+"""Polígonos de barrios para el modo coropletas del mapa.
+
+Los barrios se leen de un GeoJSON local (el `neighbourhoods.geojson` de
+InsideAirbnb). Una rejilla uniforme sobre las cajas de los polígonos reduce los
+candidatos de cada alojamiento a unos pocos barrios. Las celdas que no cruza
+ningún borde de un barrio quedan enteras dentro o fuera de él; solo los puntos
+de celdas frontera pasan por la regla par-impar, vectorizada sobre bloques de
+puntos y aristas. La unión se hace una sola vez por ciudad; en cada rerun solo
+se agregan los códigos.
+
+La geometría que se envía al navegador se simplifica con Douglas-Peucker a un
+píxel del nivel de zoom y se guarda por zoom.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+# Celdas por lado de la rejilla de candidatos
+CELDAS_REJILLA = 128
+# Tamaño de los bloques de la regla par-impar (puntos x aristas)
+PUNTOS_POR_BLOQUE = 8192
+ARISTAS_POR_BLOQUE = 256
+
+# Estado de una celda de la rejilla respecto a un barrio
+FUERA, DENTRO, FRONTERA = 0, 1, 2
+
+# Métrica de color de las coropletas: (columna, agregación)
+METRICAS_BARRIO = {
+    "Precio mediano": ("price", "mediana"),
+    "Alojamientos": (None, "conteo"),
+    "Puntuación media": ("review_scores_rating", "media"),
+}
+
+
+def _poligonos(geometria):
+    # Lista de polígonos; cada uno es la lista de sus anillos (exterior y huecos) en lon/lat
+    tipo = geometria.get("type")
+    if tipo == "Polygon":
+        coordenadas = [geometria["coordinates"]]
+    elif tipo == "MultiPolygon":
+        coordenadas = geometria["coordinates"]
+    else:
+        return []
+    poligonos = []
+    for poligono in coordenadas:
+        anillos = []
+        for anillo in poligono:
+            anillo = np.asarray(anillo, dtype=float)[:, :2]
+            if len(anillo) < 3:
+                continue
+            if not np.array_equal(anillo[0], anillo[-1]):
+                anillo = np.vstack([anillo, anillo[:1]])
+            anillos.append(anillo)
+        if anillos:
+            poligonos.append(anillos)
+    return poligonos
+
+
+def _dentro(x, y, aristas):
+    """Regla par-impar: True para los puntos (x, y) dentro de las aristas (m, 4)."""
+    dentro = np.zeros(len(x), dtype=bool)
+    for i in range(0, len(x), PUNTOS_POR_BLOQUE):
+        px = x[i:i + PUNTOS_POR_BLOQUE, None]
+        py = y[i:i + PUNTOS_POR_BLOQUE, None]
+        cruces = np.zeros(len(px), dtype=np.int64)
+        for j in range(0, len(aristas), ARISTAS_POR_BLOQUE):
+            x1, y1, x2, y2 = aristas[j:j + ARISTAS_POR_BLOQUE].T
+            cruza = (y1 > py) != (y2 > py)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                corte = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+            cruces += np.count_nonzero(cruza & (px < corte), axis=1)
+        dentro[i:i + PUNTOS_POR_BLOQUE] = cruces % 2 == 1
+    return dentro
+
+
+def simplificar_anillo(anillo, tolerancia):
+    """Douglas-Peucker sobre un anillo cerrado; nunca deja menos de cuatro vértices."""
+    n = len(anillo)
+    if n <= 4:
+        return anillo
+    conservar = np.zeros(n, dtype=bool)
+    conservar[0] = conservar[-1] = True
+    pendientes = [(0, n - 1)]
+    while pendientes:
+        a, b = pendientes.pop()
+        if b - a < 2:
+            continue
+        p, q = anillo[a], anillo[b]
+        tramo = anillo[a + 1:b]
+        dx, dy = q - p
+        norma = np.hypot(dx, dy)
+        if norma == 0:
+            distancias = np.hypot(tramo[:, 0] - p[0], tramo[:, 1] - p[1])
+        else:
+            distancias = np.abs(dx * (tramo[:, 1] - p[1]) - dy * (tramo[:, 0] - p[0])) / norma
+        k = int(np.argmax(distancias))
+        if distancias[k] > tolerancia:
+            m = a + 1 + k
+            conservar[m] = True
+            pendientes.extend([(a, m), (m, b)])
+    simplificado = anillo[conservar]
+    return simplificado if len(simplificado) >= 4 else anillo
+
+
+class IndiceBarrios:
+    """Polígonos de una ciudad con su rejilla de candidatos."""
+
+    def __init__(self, geojson, celdas=CELDAS_REJILLA):
+        self.nombres, self.poligonos, cajas = [], [], []
+        for feature in geojson.get("features", []):
+            poligonos = _poligonos(feature.get("geometry") or {})
+            if not poligonos:
+                continue
+            propiedades = feature.get("properties") or {}
+            self.nombres.append(str(propiedades.get("neighbourhood") or propiedades.get("name") or len(self.nombres)))
+            self.poligonos.append(poligonos)
+            vertices = np.concatenate([anillo for poligono in poligonos for anillo in poligono])
+            cajas.append([*vertices.min(axis=0), *vertices.max(axis=0)])
+        # lon_min, lat_min, lon_max, lat_max de cada barrio
+        self.cajas = np.array(cajas, dtype=float).reshape(-1, 4)
+        # Aristas (x1, y1, x2, y2) de todos los anillos de cada barrio
+        self.aristas = [
+            np.concatenate([np.hstack([anillo[:-1], anillo[1:]]) for poligono in poligonos for anillo in poligono])
+            for poligonos in self.poligonos
+        ]
+        self._simplificados = {}
+
+        # Rejilla uniforme: para cada celda, los barrios cuya caja la toca (formato CSR)
+        # y si la celda está entera dentro, entera fuera o en la frontera del barrio
+        self.celdas = celdas
+        if len(self):
+            self.extension = np.array([*self.cajas[:, :2].min(axis=0), *self.cajas[:, 2:].max(axis=0)])
+        else:
+            self.extension = np.array([0.0, 0.0, 1.0, 1.0])
+        celdas_barrio, estados_barrio = [], []
+        for b in range(len(self)):
+            celdas_b, estados_b = self._clasificar_celdas(b)
+            celdas_barrio.append(celdas_b)
+            estados_barrio.append(estados_b)
+        ids_celda = np.concatenate(celdas_barrio) if celdas_barrio else np.array([], dtype=np.int64)
+        ids_barrio = np.repeat(np.arange(len(self)), [len(c) for c in celdas_barrio])
+        estados = np.concatenate(estados_barrio) if estados_barrio else np.array([], dtype=np.int8)
+        orden = np.argsort(ids_celda, kind="stable")
+        self._barrios_celda = ids_barrio[orden]
+        self._estado_celda = estados[orden]
+        self._inicio_celda = np.searchsorted(ids_celda[orden], np.arange(celdas * celdas + 1))
+
+    @classmethod
+    def desde_fichero(cls, ruta):
+        with open(ruta, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def __len__(self):
+        return len(self.nombres)
+
+    def _clasificar_celdas(self, b):
+        # Celdas de la caja del barrio `b` y su estado: FUERA, DENTRO o FRONTERA
+        f0, c0 = self._celda(self.cajas[b, 0], self.cajas[b, 1])
+        f1, c1 = self._celda(self.cajas[b, 2], self.cajas[b, 3])
+        filas, columnas = np.meshgrid(np.arange(f0, f1 + 1), np.arange(c0, c1 + 1), indexing="ij")
+        ids = (filas * self.celdas + columnas).ravel()
+
+        # Celdas que toca la caja de cada arista (conservador para aristas largas)
+        x1, y1, x2, y2 = self.aristas[b].T
+        fa, ca = self._celda(np.minimum(x1, x2), np.minimum(y1, y2))
+        fb, cb = self._celda(np.maximum(x1, x2), np.maximum(y1, y2))
+        alto, ancho = fb - fa + 1, cb - ca + 1
+        n = alto * ancho
+        arista = np.repeat(np.arange(len(n)), n)
+        k = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+        frontera = np.zeros(self.celdas * self.celdas, dtype=bool)
+        frontera[(fa[arista] + k // ancho[arista]) * self.celdas + ca[arista] + k % ancho[arista]] = True
+
+        estados = np.full(len(ids), FRONTERA, dtype=np.int8)
+        interiores = ~frontera[ids]
+        if interiores.any():
+            # Sin bordes dentro de la celda, su centro decide por toda ella
+            lon_min, lat_min, lon_max, lat_max = self.extension
+            centro_x = lon_min + (columnas.ravel()[interiores] + 0.5) * (lon_max - lon_min) / self.celdas
+            centro_y = lat_min + (filas.ravel()[interiores] + 0.5) * (lat_max - lat_min) / self.celdas
+            estados[interiores] = np.where(_dentro(centro_x, centro_y, self.aristas[b]), DENTRO, FUERA)
+        return ids, estados
+
+    def _celda(self, longitud, latitud):
+        lon_min, lat_min, lon_max, lat_max = self.extension
+        fila = ((latitud - lat_min) / max(lat_max - lat_min, 1e-12) * self.celdas).astype(np.int64)
+        columna = ((longitud - lon_min) / max(lon_max - lon_min, 1e-12) * self.celdas).astype(np.int64)
+        return np.clip(fila, 0, self.celdas - 1), np.clip(columna, 0, self.celdas - 1)
+
+    def asignar(self, latitud, longitud):
+        """Código de barrio de cada punto (-1 si no cae en ninguno)."""
+        latitud = np.asarray(latitud, dtype=float)
+        longitud = np.asarray(longitud, dtype=float)
+        codigos = np.full(len(latitud), -1, dtype=np.int32)
+        lon_min, lat_min, lon_max, lat_max = self.extension
+        posiciones = np.flatnonzero(
+            (longitud >= lon_min) & (longitud <= lon_max) & (latitud >= lat_min) & (latitud <= lat_max)
+        )
+        if len(posiciones) == 0 or len(self) == 0:
+            return codigos
+        x, y = longitud[posiciones], latitud[posiciones]
+
+        # Pares (punto, barrio candidato) a partir de las celdas, sin bucles por punto
+        fila, columna = self._celda(x, y)
+        celda = fila * self.celdas + columna
+        inicio = self._inicio_celda[celda]
+        cuantos = self._inicio_celda[celda + 1] - inicio
+        total = int(cuantos.sum())
+        desplazamiento = np.repeat(inicio - (np.cumsum(cuantos) - cuantos), cuantos)
+        candidato = desplazamiento + np.arange(total)
+        barrio = self._barrios_celda[candidato]
+        estado = self._estado_celda[candidato]
+        punto = np.repeat(np.arange(len(posiciones)), cuantos)
+
+        # Las celdas enteras fuera de un barrio descartan el candidato sin más pruebas
+        utiles = estado != FUERA
+        punto, barrio, estado = punto[utiles], barrio[utiles], estado[utiles]
+
+        orden = np.argsort(barrio, kind="stable")
+        punto, barrio, estado = punto[orden], barrio[orden], estado[orden]
+        limites = np.searchsorted(barrio, np.arange(len(self) + 1))
+        for b in range(len(self)):
+            candidatos = punto[limites[b]:limites[b + 1]]
+            frontera = estado[limites[b]:limites[b + 1]] == FRONTERA
+            # Si los polígonos se solapan, gana el primer barrio del fichero
+            libres = codigos[posiciones[candidatos]] == -1
+            candidatos, frontera = candidatos[libres], frontera[libres]
+            if len(candidatos) == 0:
+                continue
+            dentro = ~frontera
+            if frontera.any():
+                dentro[frontera] = _dentro(x[candidatos[frontera]], y[candidatos[frontera]], self.aristas[b])
+            codigos[posiciones[candidatos[dentro]]] = b
+        return codigos
+
+    def agregar(self, codigos, data, metrica):
+        """Valor de `metrica` (clave de METRICAS_BARRIO) por barrio con datos.
+
+        Devuelve (códigos de barrio, valores, alojamientos por barrio).
+        """
+        columna, agregacion = METRICAS_BARRIO[metrica]
+        validos = codigos >= 0
+        conteo = np.bincount(codigos[validos], minlength=len(self))
+        presentes = np.flatnonzero(conteo)
+        if agregacion == "conteo":
+            return presentes, conteo[presentes].astype(float), conteo[presentes]
+        valores = data[columna].to_numpy(dtype=float)[validos] if columna in data.columns else np.full(int(validos.sum()), np.nan)
+        if agregacion == "mediana":
+            resultado = pd.Series(valores).groupby(codigos[validos]).median()
+        else:
+            resultado = pd.Series(valores).groupby(codigos[validos]).mean()
+        return presentes, resultado.reindex(presentes).to_numpy(), conteo[presentes]
+
+    def zoom_para(self, barrios, ancho_px=700, alto_px=500):
+        """Nivel de zoom entero que encuadra las cajas de `barrios`, y su centro."""
+        cajas = self.cajas[barrios] if len(barrios) else self.cajas
+        lon_min, lat_min = cajas[:, :2].min(axis=0)
+        lon_max, lat_max = cajas[:, 2:].max(axis=0)
+        centro = dict(lat=(lat_min + lat_max) / 2, lon=(lon_min + lon_max) / 2)
+        ancho = max(lon_max - lon_min, 1e-6)
+        alto = max((lat_max - lat_min) / np.cos(np.radians(centro["lat"])), 1e-6)
+        zoom = np.log2(min(360 * ancho_px / (256 * ancho), 360 * alto_px / (256 * alto)))
+        return int(np.clip(np.floor(zoom), 0, 18)), centro
+
+    def geojson(self, zoom, barrios=None):
+        """GeoJSON de `barrios` (todos por defecto) simplificado a un píxel del `zoom` dado.
+
+        La simplificación se calcula una vez por zoom para todos los barrios.
+        """
+        if zoom not in self._simplificados:
+            tolerancia = 360 / (256 * 2 ** zoom)
+            features = []
+            for b, poligonos in enumerate(self.poligonos):
+                coordenadas = [
+                    [np.round(simplificar_anillo(anillo, tolerancia), 5).tolist() for anillo in poligono]
+                    for poligono in poligonos
+                ]
+                features.append({
+                    "type": "Feature",
+                    "id": str(b),
+                    "properties": {"neighbourhood": self.nombres[b]},
+                    "geometry": {"type": "MultiPolygon", "coordinates": coordenadas},
+                })
+            self._simplificados[zoom] = features
+        features = self._simplificados[zoom]
+        if barrios is not None:
+            features = [features[b] for b in barrios]
+        return {"type": "FeatureCollection", "features": features}
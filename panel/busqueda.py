@@ -0,0 +1,154 @@
+"""Índice invertido para buscar alojamientos por el texto de su nombre y descripción.
+
+El texto se normaliza igual al indexar y al buscar: minúsculas, sin etiquetas
+HTML ni acentos (`àtic`, `ático` -> `atic...`), la ele geminada catalana
+(`l·l` -> `ll`) y los apóstrofos como separadores (`l'àtic` -> `l`, `atic`).
+Se descartan las palabras vacías de castellano, catalán e inglés y cada
+palabra se reduce a una raíz ligera sin plural ni vocal final, para que
+`terrazas` encuentre `terraza` y `ático` encuentre `àtic`.
+
+El índice se construye una vez al publicar la ciudad (ver panel/almacen.py)
+y se guarda junto al dataset en formato compacto: el vocabulario ordenado y,
+para cada raíz, sus filas como uint32 ordenados, todas en un único array
+(listas de posiciones en formato CSR). Una búsqueda es la intersección de
+las listas de sus palabras; una palabra sin coincidencia exacta se busca como
+prefijo (`pisc` -> `piscin...`).
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+COLUMNAS_TEXTO = ["name", "description"]
+
+PALABRAS_VACIAS = {
+    # castellano
+    "a", "al", "con", "de", "del", "el", "en", "la", "las", "lo", "los", "para", "por", "sin", "su",
+    "sus", "un", "una", "unos", "unas", "y", "o", "e", "que", "muy", "mas", "se", "es", "tu",
+    # catalán
+    "amb", "els", "i", "l", "d", "les", "per", "uns", "unes", "s", "n", "als", "dels",
+    # inglés
+    "an", "and", "at", "by", "for", "from", "in", "of", "on", "or", "the", "to", "with",
+}
+
+
+def ruta_para(ruta_dataset):
+    """Ruta del índice de un dataset publicado (`ciudad.arrow` -> `ciudad.busqueda.npz`)."""
+    return os.path.splitext(ruta_dataset)[0] + ".busqueda.npz"
+
+
+def _palabras(serie):
+    # Listas de palabras normalizadas de cada texto
+    texto = serie.fillna("").astype(str).str.lower()
+    texto = texto.str.replace(r"<[^>]*>", " ", regex=True).str.replace("l·l", "ll", regex=False)
+    texto = texto.str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+    return texto.str.findall(r"[a-z0-9]+")
+
+
+def raiz(palabra):
+    """Raíz ligera de una palabra normalizada; None si es una palabra vacía."""
+    if palabra in PALABRAS_VACIAS:
+        return None
+    if len(palabra) > 4 and palabra.endswith("es") and palabra[-3] not in "aeiou":
+        palabra = palabra[:-2]
+    elif len(palabra) > 3 and palabra.endswith("s"):
+        palabra = palabra[:-1]
+    if len(palabra) > 3 and palabra[-1] in "aeo":
+        palabra = palabra[:-1]
+    return palabra
+
+
+def raices_consulta(texto):
+    """Raíces de las palabras de una consulta, en orden y sin repetir."""
+    palabras = _palabras(pd.Series([texto])).iloc[0]
+    return list(dict.fromkeys(r for r in map(raiz, palabras) if r))
+
+
+class IndiceTexto:
+    """Vocabulario de raíces y, para cada una, las filas donde aparece."""
+
+    def __init__(self, vocabulario, inicios, filas, n_filas):
+        self.vocabulario = vocabulario
+        self.inicios = inicios
+        self.filas = filas
+        self.n_filas = n_filas
+
+    def __len__(self):
+        return self.n_filas
+
+    @classmethod
+    def construir(cls, data, columnas=COLUMNAS_TEXTO):
+        """Índice de las columnas de texto `columnas` presentes en `data`."""
+        partes = [_palabras(data[c]).set_axis(np.arange(len(data))) for c in columnas if c in data.columns]
+        if not partes:
+            return cls(np.array([], dtype="<U1"), np.zeros(1, dtype=np.int64), np.array([], dtype=np.uint32), len(data))
+        explotado = pd.concat(partes).explode().dropna()
+        # Raíces sobre las formas distintas, que son muchas menos que las apariciones
+        codigos, formas = pd.factorize(explotado.to_numpy())
+        raices = pd.Series([raiz(f) for f in formas], dtype=object)
+        codigos_raiz, vocabulario = pd.factorize(raices, sort=True)
+        ids = codigos_raiz[codigos]
+        filas = explotado.index.to_numpy(dtype=np.int64)
+        validos = ids >= 0
+        # Pares (raíz, fila) distintos, ordenados por raíz y después por fila
+        pares = np.unique(ids[validos].astype(np.int64) * len(data) + filas[validos])
+        ids, filas = pares // len(data), pares % len(data)
+        inicios = np.zeros(len(vocabulario) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(ids, minlength=len(vocabulario)), out=inicios[1:])
+        return cls(np.asarray(vocabulario, dtype=str), inicios, filas.astype(np.uint32), len(data))
+
+    def _lista(self, i):
+        return self.filas[self.inicios[i]:self.inicios[i + 1]]
+
+    def _posiciones(self, raiz_consulta):
+        # Filas de la raíz exacta o, si no está, de todas las que empiezan por ella
+        inicio = np.searchsorted(self.vocabulario, raiz_consulta)
+        if inicio < len(self.vocabulario) and self.vocabulario[inicio] == raiz_consulta:
+            return self._lista(inicio)
+        fin = np.searchsorted(self.vocabulario, raiz_consulta + "\uffff")
+        if fin == inicio:
+            return np.array([], dtype=np.uint32)
+        return np.unique(self.filas[self.inicios[inicio]:self.inicios[fin]])
+
+    def buscar(self, texto):
+        """Posiciones ordenadas de las filas con todas las palabras de `texto`.
+
+        Devuelve None si la consulta no tiene palabras que buscar.
+        """
+        raices = raices_consulta(texto)
+        if not raices:
+            return None
+        listas = sorted((self._posiciones(r) for r in raices), key=len)
+        resultado = listas[0]
+        for lista in listas[1:]:
+            if len(resultado) == 0:
+                break
+            resultado = np.intersect1d(resultado, lista, assume_unique=True)
+        return resultado.astype(np.int64)
+
+
+def guardar(ruta_dataset, indice):
+    """Guarda el índice junto a `ruta_dataset`, ligado a su fecha de modificación."""
+    ruta = ruta_para(ruta_dataset)
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+    np.savez(
+        temporal, vocabulario=indice.vocabulario, inicios=indice.inicios, filas=indice.filas,
+        n_filas=indice.n_filas, firma=os.path.getmtime(ruta_dataset),
+    )
+    os.replace(temporal, ruta)
+    return ruta
+
+
+def cargar(ruta_dataset):
+    """El índice de `ruta_dataset`, o None si no existe o es de otra versión del fichero."""
+    ruta = ruta_para(ruta_dataset)
+    if not os.path.exists(ruta) or not os.path.exists(ruta_dataset):
+        return None
+    try:
+        with np.load(ruta, allow_pickle=False) as f:
+            if float(f["firma"]) != os.path.getmtime(ruta_dataset):
+                return None
+            return IndiceTexto(f["vocabulario"], f["inicios"], f["filas"], int(f["n_filas"]))
+    except (OSError, ValueError, KeyError):
+        return None
@@ -0,0 +1,211 @@
+"""Agregados del calendario de InsideAirbnb para el análisis de temporada.
+
+El `calendar.csv.gz` tiene una fila por alojamiento y día (cientos de millones
+de filas sumando todas las ciudades). Se lee en streaming con el lector CSV de
+pyarrow, con solo las columnas necesarias y las fechas ya convertidas, y cada
+bloque se suma en dos rejillas compactas:
+
+- alojamiento x mes: días, días libres y suma/número de precios, alineada con
+  las filas del dataset publicado en el almacén;
+- barrio x semana: lo mismo por barrio y semana (de lunes a domingo).
+
+La memoria depende del número de alojamientos y periodos, no del tamaño del
+fichero. Los agregados se guardan en un `.npz` junto al dataset de la ciudad y
+se recalculan si cambia el calendario o el dataset.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pcsv
+
+from panel import almacen
+
+TIPOS_COLUMNAS = {"listing_id": pa.int64(), "date": pa.date32(), "available": pa.string(), "price": pa.string()}
+# Bytes de CSV sin comprimir por bloque (unas 800.000 filas)
+BYTES_POR_BLOQUE = 32 << 20
+# Las semanas empiezan en lunes: 1970-01-05 lo es
+LUNES_REFERENCIA = np.datetime64("1970-01-05", "D")
+CAMPOS = ["dias", "libres", "suma_precio", "precios"]
+
+
+class _Rejilla:
+    """Sumas por (fila, periodo) que se amplían con los periodos que aparecen."""
+
+    def __init__(self, filas):
+        self.filas = filas
+        self.inicio = 0
+        self.sumas = {campo: np.zeros((filas, 0), dtype=np.float32 if campo == "suma_precio" else np.int32)
+                      for campo in CAMPOS}
+
+    def _ampliar(self, primero, ultimo):
+        ancho = self.sumas["dias"].shape[1]
+        if ancho == 0:
+            self.inicio = primero
+            antes, despues = 0, ultimo - primero + 1
+        else:
+            antes = max(self.inicio - primero, 0)
+            despues = max(ultimo - (self.inicio + ancho - 1), 0)
+        if antes or despues:
+            for campo, suma in self.sumas.items():
+                self.sumas[campo] = np.pad(suma, ((0, 0), (antes, despues)))
+            self.inicio -= antes
+
+    def sumar(self, fila, periodo, **valores):
+        if len(fila) == 0:
+            return
+        self._ampliar(int(periodo.min()), int(periodo.max()))
+        ancho = self.sumas["dias"].shape[1]
+        # Claves planas únicas del bloque: el temporal no depende de filas x periodos
+        claves, inversa = np.unique(fila.astype(np.int64) * ancho + (periodo - self.inicio), return_inverse=True)
+        for campo, suma in self.sumas.items():
+            pesos = valores.get(campo)
+            parcial = np.bincount(inversa, weights=pesos, minlength=len(claves))
+            suma.reshape(-1)[claves] += parcial.astype(suma.dtype)
+
+
+def _precio(texto):
+    # "$1,234.00" -> 1234.0; vacío -> NaN
+    limpio = pc.replace_substring(pc.replace_substring(texto, "$", ""), ",", "")
+    limpio = pc.if_else(pc.equal(limpio, ""), None, limpio)
+    return pc.cast(limpio, pa.float64()).to_numpy(zero_copy_only=False)
+
+
+class Calendario:
+    """Agregados de calendario de una ciudad.
+
+    `mes` tiene forma (alojamientos, meses) y `semana` (barrios, semanas); cada
+    una es un dict con las sumas de CAMPOS.
+    """
+
+    def __init__(self, mes, primer_mes, semana, primera_semana, barrios):
+        self.mes = mes
+        self.primer_mes = primer_mes
+        self.semana = semana
+        self.primera_semana = primera_semana
+        self.barrios = list(barrios)
+
+    @property
+    def meses(self):
+        n = self.mes["dias"].shape[1]
+        return (np.arange(self.primer_mes, self.primer_mes + n).astype("datetime64[M]")).astype(str)
+
+    @property
+    def semanas(self):
+        n = self.semana["dias"].shape[1]
+        return (LUNES_REFERENCIA + 7 * np.arange(self.primera_semana, self.primera_semana + n)).astype(str)
+
+    @staticmethod
+    def _cocientes(sumas):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ocupacion = 1 - sumas["libres"] / sumas["dias"]
+            precio = sumas["suma_precio"] / sumas["precios"]
+        return ocupacion, precio
+
+    def por_barrio_semana(self):
+        """(ocupación, precio medio) por barrio y semana de toda la ciudad."""
+        return self._cocientes(self.semana)
+
+    def por_grupo_mes(self, posiciones, grupos, n_grupos):
+        """(ocupación, precio medio) por grupo y mes de los alojamientos en `posiciones`.
+
+        `grupos` es el código de grupo (0..n_grupos-1) de cada posición.
+        """
+        sumas = {}
+        for campo, matriz in self.mes.items():
+            total = np.zeros((n_grupos, matriz.shape[1]), dtype=np.float64)
+            np.add.at(total, grupos, matriz[posiciones])
+            sumas[campo] = total
+        return self._cocientes(sumas)
+
+    def guardar(self, ruta, firma):
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez(
+            temporal,
+            firma=np.array(firma),
+            primer_mes=self.primer_mes,
+            primera_semana=self.primera_semana,
+            barrios=np.array(self.barrios, dtype=str),
+            **{f"mes_{c}": v for c, v in self.mes.items()},
+            **{f"semana_{c}": v for c, v in self.semana.items()},
+        )
+        os.replace(temporal, ruta)
+
+    @classmethod
+    def cargar(cls, ruta, firma):
+        """El calendario guardado en `ruta`, o None si no existe o su firma no coincide."""
+        if not os.path.exists(ruta):
+            return None
+        try:
+            with np.load(ruta, allow_pickle=False) as npz:
+                if str(npz["firma"]) != firma:
+                    return None
+                return cls(
+                    {c: npz[f"mes_{c}"] for c in CAMPOS}, int(npz["primer_mes"]),
+                    {c: npz[f"semana_{c}"] for c in CAMPOS}, int(npz["primera_semana"]),
+                    npz["barrios"].tolist(),
+                )
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def agregar(ruta, data, bytes_por_bloque=BYTES_POR_BLOQUE):
+    """Lee el calendario en `ruta` por bloques y devuelve su `Calendario`.
+
+    Los días de alojamientos que no están en `data` se ignoran.
+    """
+    ids = data["id"].to_numpy()
+    orden = np.argsort(ids, kind="stable")
+    ids_ordenados = ids[orden]
+    codigos_barrio, barrios = pd.factorize(data["neighbourhood_cleansed"])
+
+    por_mes = _Rejilla(len(data))
+    por_semana = _Rejilla(len(barrios) + 1)  # la última fila recoge los alojamientos sin barrio
+    lector = pcsv.open_csv(
+        ruta,
+        read_options=pcsv.ReadOptions(block_size=bytes_por_bloque),
+        convert_options=pcsv.ConvertOptions(include_columns=list(TIPOS_COLUMNAS), column_types=TIPOS_COLUMNAS),
+    )
+    for bloque in lector:
+        listing = bloque.column("listing_id").to_numpy(zero_copy_only=False)
+        indice = np.minimum(np.searchsorted(ids_ordenados, listing), len(ids_ordenados) - 1)
+        conocidos = ids_ordenados[indice] == listing
+        fechas = bloque.column("date").to_numpy(zero_copy_only=False)
+        conocidos &= ~np.isnat(fechas)
+        posicion = orden[indice[conocidos]]
+        fechas = fechas[conocidos].astype("datetime64[D]")
+        libre = pc.fill_null(pc.equal(bloque.column("available"), "t"), False)
+        libre = libre.to_numpy(zero_copy_only=False)[conocidos].astype(float)
+        precio = _precio(bloque.column("price"))[conocidos]
+        con_precio = ~np.isnan(precio)
+        valores = dict(libres=libre, suma_precio=np.where(con_precio, precio, 0.0), precios=con_precio.astype(float))
+
+        mes = fechas.astype("datetime64[M]").astype(np.int64)
+        semana = (fechas - LUNES_REFERENCIA).astype(np.int64) // 7
+        barrio = np.where(codigos_barrio[posicion] >= 0, codigos_barrio[posicion], len(barrios))
+        por_mes.sumar(posicion, mes, **valores)
+        por_semana.sumar(barrio, semana, **valores)
+
+    return Calendario(por_mes.sumas, por_mes.inicio, por_semana.sumas, por_semana.inicio, barrios)
+
+
+def obtener(ciudad, ruta, data):
+    """Calendario de `ciudad` desde su `.npz` si está al día, si no lo agrega y lo guarda.
+
+    Devuelve None si no hay calendario o el dataset no tiene la columna `id`.
+    """
+    if ruta is None or "id" not in data.columns or len(data) == 0:
+        return None
+    dataset = almacen.ruta_dataset(ciudad)
+    # Las filas de la rejilla son posiciones del dataset publicado: depende de ambos ficheros
+    firma = f"{os.path.abspath(ruta)}@{os.path.getmtime(ruta)}|{os.path.getmtime(dataset) if os.path.exists(dataset) else ''}"
+    destino = os.path.join(almacen.DIRECTORIO_CACHE, f"{ciudad.lower()}_calendario.npz")
+    calendario = Calendario.cargar(destino, firma)
+    if calendario is None:
+        calendario = agregar(ruta, data)
+        os.makedirs(almacen.DIRECTORIO_CACHE, exist_ok=True)
+        calendario.guardar(destino, firma)
+    return calendario
@@ -0,0 +1,125 @@
+"""Carga progresiva de una ciudad con vista previa de las métricas.
+
+Mientras el almacén lee el parquet grupo a grupo, se actualizan agregados
+acumulados (las cinco "Métricas Clave", el conteo por vecindario y el
+histograma de precios) y se redibujan en un contenedor de streamlit. Los
+gráficos pesados se dibujan después, cuando el dataset completo está publicado.
+"""
+import time
+from collections import Counter
+
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+
+from panel import almacen
+from panel.graficos import tarjetas_metricas
+
+# Segundos mínimos entre dos redibujados de la vista previa
+INTERVALO_REDIBUJO = 0.3
+
+
+class AgregadosParciales:
+    """Agregados de toda la ciudad que se actualizan con cada grupo de filas."""
+
+    def __init__(self, precio_maximo=1000):
+        self.alojamientos = 0
+        self.precio_maximo = precio_maximo
+        # Conteo por euro entero; el último cubo acumula los precios superiores
+        self.conteo_precios = np.zeros(precio_maximo + 1, dtype=np.int64)
+        self.sumas = {"review_scores_rating": [0.0, 0], "occupancy_rate": [0.0, 0], "host_age_years": [0.0, 0]}
+        self.vecindarios = Counter()
+
+    def añadir(self, parte):
+        self.alojamientos += len(parte)
+        precios = parte["price"].to_numpy(dtype=float)
+        precios = precios[~np.isnan(precios)]
+        cubos = np.clip(precios, 0, self.precio_maximo).astype(np.int64)
+        self.conteo_precios += np.bincount(cubos, minlength=len(self.conteo_precios))
+        for col, acumulado in self.sumas.items():
+            if col in parte.columns:
+                valores = parte[col].to_numpy(dtype=float)
+                validos = ~np.isnan(valores)
+                acumulado[0] += valores[validos].sum()
+                acumulado[1] += int(validos.sum())
+        self.vecindarios.update(parte["neighbourhood_cleansed"].dropna().to_numpy())
+
+    def _media(self, col):
+        suma, n = self.sumas[col]
+        return suma / n if n else 0
+
+    def cuantil_precio(self, q):
+        acumulado = np.cumsum(self.conteo_precios)
+        if acumulado[-1] == 0:
+            return float("nan")
+        return float(np.searchsorted(acumulado, q * acumulado[-1]))
+
+    def metricas(self):
+        return dict(
+            precio_mediano=self.cuantil_precio(0.5),
+            alojamientos=self.alojamientos,
+            puntuacion_media=self._media("review_scores_rating"),
+            ocupacion_media=self._media("occupancy_rate"),
+            antiguedad_media=self._media("host_age_years"),
+        )
+
+    def figura_vecindarios(self):
+        top = self.vecindarios.most_common(10)
+        fig = px.bar(
+            x=[n for _, n in top],
+            y=[v for v, _ in top],
+            orientation="h",
+            labels={"x": "Número de Alojamientos", "y": "Vecindario"},
+            color=[n for _, n in top],
+            color_continuous_scale=px.colors.sequential.Viridis,
+        )
+        fig.update_layout(
+            yaxis={"categoryorder": "total ascending"},
+            title=dict(text="Distribución por Vecindario", font=dict(color="white"), x=0.5)
+        )
+        return fig
+
+    def figura_precios(self, ancho=10):
+        # Histograma en cubos de `ancho` euros hasta el percentil 95, como la pestaña de precios;
+        # un solo cubo vacío mientras no haya llegado ningún precio válido
+        techo = self.cuantil_precio(0.95)
+        limite = ancho if np.isnan(techo) else int(techo) + 1
+        conteos = np.add.reduceat(self.conteo_precios[:limite], np.arange(0, limite, ancho))
+        fig = go.Figure(go.Bar(
+            x=np.arange(0, limite, ancho) + ancho / 2,
+            y=conteos,
+            width=ancho,
+            marker_color="#FF5A5F",
+        ))
+        fig.update_layout(
+            xaxis_title="Precio (€)",
+            yaxis_title="Alojamientos",
+            title=dict(text="Distribución de Precios", font=dict(color="white"), x=0.5),
+        )
+        return fig
+
+
+def dibujar_vista_previa(contenedor, ciudad, agregados, total):
+    bloque = contenedor.container()
+    progreso = min(agregados.alojamientos / total, 1.0) if total else 1.0
+    bloque.progress(progreso, text=f"Cargando {ciudad}: {agregados.alojamientos} de {total} alojamientos (toda la ciudad, sin filtros)")
+    tarjetas_metricas(bloque, **agregados.metricas())
+    col1, col2 = bloque.columns([1, 1])
+    col1.plotly_chart(agregados.figura_precios(), use_container_width=True)
+    col2.plotly_chart(agregados.figura_vecindarios(), use_container_width=True)
+
+
+def cargar_con_vista_previa(ciudad, origen, contenedor):
+    """Publica el dataset de `ciudad` mostrando agregados parciales en `contenedor` (un `st.empty`)."""
+    agregados = AgregadosParciales()
+    ultimo_dibujo = [0.0]
+
+    def al_avanzar(parte, total):
+        agregados.añadir(parte)
+        ahora = time.perf_counter()
+        if ahora - ultimo_dibujo[0] >= INTERVALO_REDIBUJO or agregados.alojamientos >= total:
+            ultimo_dibujo[0] = ahora
+            dibujar_vista_previa(contenedor, ciudad, agregados, total)
+
+    almacen.obtener(ciudad, origen, al_avanzar=al_avanzar)
+    contenedor.empty()
@@ -0,0 +1,115 @@
+"""Catálogo de columnas de un dataset publicado.
+
+Al publicar una ciudad se calcula, para cada columna, su tipo, número de
+nulos, mínimo y máximo, número de valores distintos, los propios valores si
+es categórica y un histograma pequeño si es numérica. Se guarda como JSON
+junto al fichero Arrow, de modo que configurar el sidebar (límites de los
+deslizadores, opciones de los selectores) es leer un dict y no recorrer el
+dataset en cada rerun.
+"""
+import json
+import math
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Valores distintos que se guardan como máximo por columna categórica
+MAX_VALORES = 1000
+CUBETAS = 40
+# Las colas largas (precios de lujo, estancias de un año) se acumulan en "cola"
+CUANTIL_HISTOGRAMA = 0.99
+
+
+def ruta_para(ruta_dataset):
+    """Ruta del catálogo de un dataset publicado (`ciudad.arrow` -> `ciudad.catalogo.json`)."""
+    return os.path.splitext(ruta_dataset)[0] + ".catalogo.json"
+
+
+def _escalar(valor):
+    # Tipos de numpy/pandas a JSON; NaN y NaT como None
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return None
+    if isinstance(valor, (np.integer, np.bool_)):
+        return valor.item()
+    if isinstance(valor, (float, np.floating)):
+        return float(valor)
+    if isinstance(valor, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(valor).isoformat()
+    return valor
+
+
+def _histograma(valores):
+    lo, hi = float(valores.min()), float(np.quantile(valores, CUANTIL_HISTOGRAMA))
+    if np.array_equal(valores, np.round(valores)):
+        # Cubetas de ancho entero para que cada valor caiga en una sola
+        ancho = max(1, math.ceil((hi - lo + 1) / CUBETAS))
+        bordes = lo + ancho * np.arange(math.ceil((hi - lo + 1) / ancho) + 1)
+    elif hi > lo:
+        bordes = np.linspace(lo, hi, CUBETAS + 1)
+    else:
+        bordes = np.array([lo, lo + 1])
+    conteos, _ = np.histogram(valores[valores <= bordes[-1]], bins=bordes)
+    return {"bordes": bordes.tolist(), "conteos": conteos.tolist(), "cola": int((valores > bordes[-1]).sum())}
+
+
+def _describir_columna(serie):
+    entrada = {"tipo": str(serie.dtype), "nulos": int(serie.isna().sum())}
+    validos = serie.dropna()
+    if serie.dtype.kind in "iuf":
+        valores = validos.to_numpy(dtype=float)
+        valores = valores[np.isfinite(valores)]
+        entrada["min"] = _escalar(valores.min()) if len(valores) else None
+        entrada["max"] = _escalar(valores.max()) if len(valores) else None
+        entrada["distintos"] = int(len(np.unique(valores)))
+        entrada["histograma"] = _histograma(valores) if len(valores) else None
+        return entrada
+    if serie.dtype.kind == "M":
+        entrada["min"] = _escalar(validos.min()) if len(validos) else None
+        entrada["max"] = _escalar(validos.max()) if len(validos) else None
+        entrada["distintos"] = int(validos.nunique())
+        return entrada
+    try:
+        # En orden de aparición, como `unique()`
+        distintos = pd.unique(validos)
+    except TypeError:
+        # Listas u otros valores no hashables: solo nulos y tipo
+        return entrada
+    entrada["distintos"] = int(len(distintos))
+    entrada["valores"] = [_escalar(v) for v in distintos] if len(distintos) <= MAX_VALORES else None
+    return entrada
+
+
+def describir(data):
+    """Catálogo de `data`: {"filas": n, "columnas": {columna: entrada}}."""
+    return {
+        "filas": int(len(data)),
+        "columnas": {str(col): _describir_columna(data[col]) for col in data.columns},
+    }
+
+
+def guardar(ruta_dataset, catalogo):
+    """Guarda el catálogo junto a `ruta_dataset`, ligado a su fecha de modificación."""
+    ruta = ruta_para(ruta_dataset)
+    contenido = dict(catalogo, firma=os.path.getmtime(ruta_dataset))
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(contenido, f, ensure_ascii=False, default=str)
+    os.replace(temporal, ruta)
+    return ruta
+
+
+def cargar(ruta_dataset):
+    """El catálogo de `ruta_dataset`, o None si no existe o es de otra versión del fichero."""
+    ruta = ruta_para(ruta_dataset)
+    if not os.path.exists(ruta) or not os.path.exists(ruta_dataset):
+        return None
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            catalogo = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if catalogo.get("firma") != os.path.getmtime(ruta_dataset):
+        return None
+    return catalogo
@@ -0,0 +1,76 @@
+"""Estimación de densidad por núcleos (KDE) agrupada con FFT.
+
+Los valores de todos los grupos se reparten de una vez sobre una rejilla común
+con binning lineal (`np.bincount`, cada valor entre sus dos nodos vecinos) y
+cada fila de la matriz grupos x rejilla se convoluciona con su núcleo gaussiano
+en el dominio de la frecuencia: la transformada del núcleo es analítica, así
+que todas las curvas salen de un `rfft` y un `irfft` sobre la matriz. El coste
+es lineal en el número de valores más O(grupos x rejilla log rejilla), y a la
+figura solo llegan las curvas.
+
+El ancho de banda de cada grupo es el de la regla de Silverman.
+"""
+import numpy as np
+import pandas as pd
+
+# Nodos de la rejilla de las curvas
+PUNTOS = 256
+
+
+def ancho_silverman(n, desviacion, iqr):
+    """Ancho de banda de la regla de Silverman, elemento a elemento."""
+    escala = np.minimum(desviacion, iqr / 1.349)
+    escala = np.where(escala > 0, escala, desviacion)
+    return 0.9 * escala * np.power(np.maximum(n, 1), -0.2)
+
+
+def kde(valores, grupos=None, n_grupos=None, limites=None, puntos=PUNTOS, anchos=None):
+    """Densidades de `valores` por grupo sobre una rejilla común.
+
+    `grupos` son códigos enteros de 0 a `n_grupos` - 1 (None: un solo grupo).
+    La rejilla va de `limites` (por defecto, el mínimo y el máximo); los
+    valores fuera de ella no se dibujan pero cuentan en el total del grupo,
+    así que cada curva integra la fracción del grupo que cae dentro.
+    Devuelve la rejilla (puntos,) y las densidades (n_grupos, puntos).
+    """
+    valores = np.asarray(valores, dtype=float)
+    grupos = np.zeros(len(valores), dtype=np.int64) if grupos is None else np.asarray(grupos, dtype=np.int64)
+    validos = ~np.isnan(valores) & (grupos >= 0)
+    valores, grupos = valores[validos], grupos[validos]
+    n_grupos = int(grupos.max()) + 1 if n_grupos is None and len(grupos) else (n_grupos or 1)
+    if limites is None:
+        limites = (valores.min(), valores.max()) if len(valores) else (0.0, 1.0)
+    minimo, maximo = float(limites[0]), float(limites[1])
+    if maximo <= minimo:
+        maximo = minimo + 1.0
+    rejilla = np.linspace(minimo, maximo, puntos)
+    paso = rejilla[1] - rejilla[0]
+
+    n = np.bincount(grupos, minlength=n_grupos).astype(float)
+    if anchos is None:
+        serie = pd.Series(valores).groupby(grupos)
+        desviacion = serie.std().reindex(range(n_grupos)).fillna(0).to_numpy()
+        cuartiles = serie.quantile([0.25, 0.75]).unstack().reindex(range(n_grupos)).fillna(0).to_numpy()
+        anchos = ancho_silverman(n, desviacion, cuartiles[:, 1] - cuartiles[:, 0])
+    # En nodos de la rejilla; al menos medio nodo para que los grupos constantes no sean un pico
+    sigma = np.maximum(np.broadcast_to(np.asarray(anchos, dtype=float), (n_grupos,)) / paso, 0.5)
+
+    # Binning lineal de todos los grupos a la vez
+    dentro = (valores >= minimo) & (valores <= maximo)
+    posicion = (valores[dentro] - minimo) / paso
+    nodo = np.minimum(np.floor(posicion).astype(np.int64), puntos - 2)
+    fraccion = posicion - nodo
+    celda = grupos[dentro] * puntos + nodo
+    conteos = (
+        np.bincount(celda, weights=1 - fraccion, minlength=n_grupos * puntos)
+        + np.bincount(celda + 1, weights=fraccion, minlength=n_grupos * puntos)
+    ).reshape(n_grupos, puntos)
+
+    # Relleno con ceros para que la convolución circular no mezcle los extremos
+    longitud = 1 << int(np.ceil(np.log2(puntos + 8 * np.ceil(sigma.max()))))
+    frecuencias = np.fft.rfftfreq(longitud)
+    nucleo = np.exp(-2 * (np.pi * sigma[:, None] * frecuencias[None, :]) ** 2)
+    densidad = np.fft.irfft(np.fft.rfft(conteos, longitud, axis=1) * nucleo, longitud, axis=1)[:, :puntos]
+    densidad = np.clip(densidad, 0, None)
+    np.divide(densidad, n[:, None] * paso, out=densidad, where=n[:, None] > 0)
+    return rejilla, densidad
@@ -0,0 +1,114 @@
+"""Descarga de los alojamientos filtrados en CSV o Parquet.
+
+Las filas se escriben por bloques de FILAS_POR_BLOQUE a un fichero temporal:
+cada bloque es una copia solo de sus filas y de las columnas elegidas, así que
+la memoria extra no depende del número de alojamientos y nunca se construye
+el fichero entero en memoria (como haría `filtered_data.to_csv()`). El
+Parquet va comprimido con zstd.
+
+Se exportan las columnas de `filtered_data`, incluidas las derivadas
+(`occupancy_rate`, `price_per_person`...) y las `has_<amenidad>`. Las
+amenidades se escriben con el texto original de la ciudad, no como listas.
+
+El botón de descarga de Streamlit sí lee el fichero entero en la memoria del
+servidor, así que el panel solo lo ofrece hasta MAX_MB_BOTON megas
+(configurable con AIRBNB_DESCARGA_MAX_MB).
+"""
+import glob
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
+
+from panel import almacen
+
+FORMATOS = {"CSV": ("csv", "text/csv"), "Parquet": ("parquet", "application/vnd.apache.parquet")}
+FILAS_POR_BLOQUE = 50000
+DIRECTORIO = os.path.join(tempfile.gettempdir(), "airbnb_descargas")
+# Los ficheros de más de estas horas se borran al preparar otro
+HORAS_CADUCIDAD = 1
+# Tamaño máximo (MB) de los ficheros que se ofrecen con `st.download_button`
+MAX_MB_BOTON = float(os.environ.get("AIRBNB_DESCARGA_MAX_MB", "200"))
+
+
+def bloques(data, filtered_data, columnas, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Genera DataFrames de `columnas` de `filtered_data` de `filas_por_bloque` filas.
+
+    `data` es la ciudad completa, de la que se toma el texto de `amenities`.
+    """
+    posiciones = filtered_data.index.to_numpy()
+    for inicio in range(0, len(filtered_data), filas_por_bloque):
+        bloque = filtered_data.iloc[inicio:inicio + filas_por_bloque][columnas]
+        if "amenities" in columnas and "amenities" in data.columns:
+            textos = data["amenities"].to_numpy(dtype=object)[posiciones[inicio:inicio + filas_por_bloque]]
+            bloque = bloque.assign(amenities=textos)
+        yield bloque
+
+
+def _esquema(muestra):
+    # Las columnas de texto sin valores en la muestra serían de tipo nulo en todos los bloques
+    esquema = pa.Schema.from_pandas(muestra, preserve_index=False)
+    for i, campo in enumerate(esquema):
+        if pa.types.is_null(campo.type):
+            esquema = esquema.set(i, pa.field(campo.name, pa.string()))
+    return esquema
+
+
+def escribir(ruta, partes, formato):
+    """Escribe los DataFrames de `partes` en `ruta` en el formato de FORMATOS.
+
+    Cada bloque pasa a Arrow con el esquema del primero y lo escribe el
+    escritor de CSV o de Parquet de pyarrow, sin pasar por texto en Python.
+    """
+    escritor = None
+    try:
+        for parte in partes:
+            if escritor is None:
+                esquema = _esquema(parte)
+                escritor = (pcsv.CSVWriter(ruta, esquema) if formato == "CSV"
+                            else pq.ParquetWriter(ruta, esquema, compression="zstd"))
+            escritor.write_table(pa.Table.from_pandas(parte, schema=esquema, preserve_index=False))
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+def clave(filtered_data, columnas, formato, ciudad=""):
+    """Identificador de una descarga: dataset publicado de la ciudad, filas, columnas y formato."""
+    dataset = almacen.ruta_dataset(ciudad) if ciudad else ""
+    publicado = os.path.getmtime(dataset) if dataset and os.path.exists(dataset) else None
+    resumen = hashlib.blake2b(digest_size=12)
+    resumen.update(np.ascontiguousarray(filtered_data.index.to_numpy()).tobytes())
+    resumen.update(repr((ciudad, publicado, list(columnas), formato)).encode())
+    return resumen.hexdigest()
+
+
+def _limpiar():
+    limite = time.time() - HORAS_CADUCIDAD * 3600
+    for ruta in glob.glob(os.path.join(DIRECTORIO, "*")):
+        try:
+            if os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+        except OSError:
+            pass
+
+
+def preparar(data, filtered_data, columnas, formato, ciudad=""):
+    """Escribe la descarga en un fichero temporal y devuelve su ruta.
+
+    Si otra sesión ya ha preparado la misma descarga, se reutiliza.
+    """
+    os.makedirs(DIRECTORIO, exist_ok=True)
+    _limpiar()
+    ruta = os.path.join(DIRECTORIO, f"{clave(filtered_data, columnas, formato, ciudad)}.{FORMATOS[formato][0]}")
+    if not os.path.exists(ruta):
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        escribir(temporal, bloques(data, filtered_data, columnas), formato)
+        os.replace(temporal, ruta)
+    return ruta
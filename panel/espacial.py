@@ -0,0 +1,75 @@
+"""Índice espacial de los alojamientos de una ciudad.
+
+Las coordenadas se proyectan a kilómetros (equirectangular alrededor del centro
+de la ciudad, suficiente a escala urbana) y se indexan en un KD-tree de scipy,
+que responde a consultas por radio y de k vecinos en milisegundos.
+"""
+import numpy as np
+from scipy.spatial import cKDTree
+
+RADIO_TIERRA_KM = 6371.0
+
+
+class IndiceEspacial:
+    """KD-tree de una ciudad; las consultas devuelven posiciones de fila del dataset."""
+
+    def __init__(self, data):
+        latitud = data["latitude"].to_numpy(dtype=float)
+        longitud = data["longitude"].to_numpy(dtype=float)
+        validos = ~(np.isnan(latitud) | np.isnan(longitud))
+        self.posiciones = np.flatnonzero(validos)
+        self.latitud_media = float(latitud[validos].mean()) if validos.any() else 0.0
+        self.longitud_media = float(longitud[validos].mean()) if validos.any() else 0.0
+        self._cos_lat = np.cos(np.radians(self.latitud_media))
+        self.arbol = cKDTree(self._proyectar(latitud[validos], longitud[validos]))
+
+        # Atributos para filtrar comparables sin volver al DataFrame
+        self.room_type = data["room_type"].astype(str).to_numpy()
+        self.accommodates = (
+            data["accommodates"].to_numpy(dtype=float) if "accommodates" in data.columns
+            else np.full(len(data), np.nan)
+        )
+
+    def _proyectar(self, latitud, longitud):
+        x = RADIO_TIERRA_KM * np.radians(np.asarray(longitud, dtype=float)) * self._cos_lat
+        y = RADIO_TIERRA_KM * np.radians(np.asarray(latitud, dtype=float))
+        return np.column_stack([x, y])
+
+    def __len__(self):
+        return len(self.posiciones)
+
+    def en_radio(self, latitud, longitud, km):
+        """Posiciones de los alojamientos a menos de `km` del punto, ordenadas."""
+        punto = self._proyectar([latitud], [longitud])[0]
+        return np.sort(self.posiciones[self.arbol.query_ball_point(punto, km)])
+
+    def vecinos(self, latitud, longitud, k):
+        """Posiciones y distancias (km) de los `k` alojamientos más cercanos."""
+        k = min(k, len(self))
+        if k == 0:
+            return np.array([], dtype=np.int64), np.array([])
+        punto = self._proyectar([latitud], [longitud])[0]
+        distancias, indices = self.arbol.query(punto, k=k)
+        return self.posiciones[np.atleast_1d(indices)], np.atleast_1d(distancias)
+
+    def comparables(self, latitud, longitud, k, room_type=None, accommodates=None,
+                    tolerancia_plazas=1, excluir=None):
+        """Los `k` alojamientos más cercanos con el mismo tipo y capacidad similar.
+
+        Pide vecinos en tandas crecientes hasta reunir `k` que cumplan las
+        condiciones, de modo que el coste depende de `k` y no del tamaño de la
+        ciudad. Devuelve (posiciones, distancias en km).
+        """
+        pedir = max(4 * k, 32)
+        while True:
+            posiciones, distancias = self.vecinos(latitud, longitud, pedir)
+            validos = np.ones(len(posiciones), dtype=bool)
+            if room_type is not None:
+                validos &= self.room_type[posiciones] == room_type
+            if accommodates is not None and not np.isnan(accommodates):
+                validos &= np.abs(self.accommodates[posiciones] - accommodates) <= tolerancia_plazas
+            if excluir is not None:
+                validos &= posiciones != excluir
+            if validos.sum() >= k or pedir >= len(self):
+                return posiciones[validos][:k], distancias[validos][:k]
+            pedir = min(pedir * 4, len(self))
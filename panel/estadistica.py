@@ -0,0 +1,278 @@
+"""Intervalos de confianza bootstrap y contrastes no paramétricos por grupo.
+
+Intervalos de las medianas
+--------------------------
+
+En lugar de remuestrear filas, cada remuestreo de un grupo de tamaño n se
+representa por la posición de su mediana. Remuestrear con reposición n valores
+de un grupo ordenado equivale a tomar n uniformes y mirar sus posiciones
+(floor(n*U)), y el estadístico de orden m de n uniformes sigue una Beta(m, n-m+1).
+Así la matriz de remuestreos (grupos x remuestreos) se genera de una vez con
+NumPy y el coste no depende del número de alojamientos, solo de grupos y
+remuestreos. La distribución bootstrap es la misma que remuestreando filas.
+
+Contrastes
+----------
+Kruskal-Wallis, Mann-Whitney y Spearman solo necesitan rangos. Cada columna se
+ordena una vez (`RangosColumna`) y los rangos de cualquier subconjunto de filas
+se obtienen de ese orden en tiempo lineal, sin volver a ordenar; los p-valores
+salen de las distribuciones de `scipy.stats`.
+
+Los resultados se guardan por contenido (valores y grupos), que en el panel
+equivale a guardarlos por estado de los filtros.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+REMUESTREOS = 2000
+NIVEL = 0.95
+MAX_ENTRADAS_CACHE = 256
+
+_cache = OrderedDict()
+# Las pestañas pueden calcularse en varios hilos a la vez (ver panel/planificador.py)
+_bloqueo_cache = threading.Lock()
+
+
+def _clave(*partes):
+    resumen = hashlib.blake2b(digest_size=16)
+    for parte in partes:
+        if isinstance(parte, np.ndarray):
+            resumen.update(str(parte.dtype).encode())
+            resumen.update(np.ascontiguousarray(parte).tobytes())
+        else:
+            resumen.update(repr(parte).encode())
+    return resumen.hexdigest()
+
+
+def _leer(clave):
+    with _bloqueo_cache:
+        if clave not in _cache:
+            return None
+        _cache.move_to_end(clave)
+        return _cache[clave]
+
+
+def _guardar(clave, resultado):
+    with _bloqueo_cache:
+        _cache[clave] = resultado
+        if len(_cache) > MAX_ENTRADAS_CACHE:
+            _cache.popitem(last=False)
+    return resultado
+
+
+def _remuestrear_medianas(ordenados, inicio, tamano, remuestreos, rng):
+    # Posiciones de los dos estadísticos centrales de cada remuestreo (grupos x remuestreos)
+    n = tamano[:, None].astype(float)
+    m = (tamano[:, None] + 1) // 2
+    u_m = rng.beta(m, n - m + 1, size=(len(tamano), remuestreos))
+    # Con n par la mediana promedia también el siguiente: el mínimo de los n-m restantes
+    pares = (tamano % 2 == 0)[:, None]
+    siguiente = u_m + (1 - u_m) * rng.beta(1, np.maximum(n - m, 1), size=u_m.shape)
+    u_siguiente = np.where(pares, siguiente, u_m)
+    base = inicio[:, None]
+    bajo = ordenados[base + np.minimum((n * u_m).astype(np.int64), tamano[:, None] - 1)]
+    alto = ordenados[base + np.minimum((n * u_siguiente).astype(np.int64), tamano[:, None] - 1)]
+    return (bajo + alto) / 2
+
+
+def intervalos_mediana(valores, grupos, n_grupos, remuestreos=REMUESTREOS, nivel=NIVEL, semilla=0):
+    """Mediana e intervalo bootstrap percentil de `valores` en cada grupo.
+
+    `grupos` tiene el código (0..n_grupos-1) de cada valor; los códigos negativos
+    y los valores NaN se ignoran. Devuelve tres arrays de longitud `n_grupos`
+    (mediana, inferior, superior), con NaN en los grupos vacíos.
+    """
+    valores = np.asarray(valores, dtype=float)
+    grupos = np.asarray(grupos, dtype=np.int64)
+    clave = _clave(valores, grupos, n_grupos, remuestreos, nivel, semilla)
+    cacheado = _leer(clave)
+    if cacheado is not None:
+        return cacheado
+
+    validos = (grupos >= 0) & ~np.isnan(valores)
+    valores, grupos = valores[validos], grupos[validos]
+    orden = np.lexsort((valores, grupos))
+    ordenados, grupos = valores[orden], grupos[orden]
+    tamano = np.bincount(grupos, minlength=n_grupos)
+    inicio = np.concatenate([[0], np.cumsum(tamano)[:-1]])
+
+    mediana = np.full(n_grupos, np.nan)
+    inferior = np.full(n_grupos, np.nan)
+    superior = np.full(n_grupos, np.nan)
+    presentes = np.flatnonzero(tamano)
+    if len(presentes):
+        t, i = tamano[presentes], inicio[presentes]
+        mediana[presentes] = (ordenados[i + (t - 1) // 2] + ordenados[i + t // 2]) / 2
+        rng = np.random.default_rng(semilla)
+        medianas = _remuestrear_medianas(ordenados, i, t, remuestreos, rng)
+        alfa = (1 - nivel) / 2
+        inferior[presentes], superior[presentes] = np.quantile(medianas, [alfa, 1 - alfa], axis=1)
+
+    return _guardar(clave, (mediana, inferior, superior))
+
+
+def intervalos_por_grupo(valores, grupos, **kwargs):
+    """DataFrame con mediana, inferior y superior de `valores` por cada etiqueta de `grupos`."""
+    codigos, etiquetas = pd.factorize(grupos, sort=True)
+    mediana, inferior, superior = intervalos_mediana(valores.to_numpy(dtype=float), codigos, len(etiquetas), **kwargs)
+    return pd.DataFrame({"mediana": mediana, "inferior": inferior, "superior": superior}, index=etiquetas)
+
+
+def barras_error(intervalos, etiquetas, medianas):
+    """Argumentos `error_y`/`error_x` de plotly para las `etiquetas` y sus medianas."""
+    ic = intervalos.reindex(etiquetas)
+    return dict(
+        type="data",
+        symmetric=False,
+        array=(ic["superior"].to_numpy() - np.asarray(medianas, dtype=float)).clip(min=0),
+        arrayminus=(np.asarray(medianas, dtype=float) - ic["inferior"].to_numpy()).clip(min=0),
+        thickness=1.5,
+        width=4,
+    )
+
+
+class RangosColumna:
+    """Orden de una columna, calculado una vez, para obtener rangos de subconjuntos.
+
+    Los empates reciben el rango medio, como en `scipy.stats.rankdata`.
+    """
+
+    def __init__(self, valores):
+        self.valores = np.asarray(valores, dtype=float)
+        self.orden = np.argsort(self.valores, kind="stable")
+        self.ordenados = self.valores[self.orden]
+        self._por_mascara = {}
+
+    def rangos(self, mascara=None):
+        """(rangos, término de empates sum(t^3 - t), n) de las filas de `mascara` sin NaN.
+
+        `rangos` tiene la longitud de la columna, con NaN fuera del subconjunto.
+        """
+        clave = None if mascara is None else hashlib.blake2b(np.packbits(mascara).tobytes(), digest_size=16).digest()
+        if clave not in self._por_mascara:
+            seleccion = ~np.isnan(self.ordenados)
+            if mascara is not None:
+                seleccion &= mascara[self.orden]
+            posiciones, valores = self.orden[seleccion], self.ordenados[seleccion]
+            n = len(valores)
+            inicio = np.flatnonzero(np.r_[True, valores[1:] != valores[:-1]]) if n else np.array([], dtype=np.int64)
+            tamano = np.diff(np.r_[inicio, n])
+            rangos = np.full(len(self.valores), np.nan)
+            rangos[posiciones] = np.repeat(inicio + (tamano + 1) / 2, tamano)
+            self._por_mascara[clave] = (rangos, float((tamano.astype(float) ** 3 - tamano).sum()), n)
+        return self._por_mascara[clave]
+
+
+def kruskal_wallis(rangos_columna, codigos, n_grupos):
+    """Kruskal-Wallis de la columna entre los grupos de `codigos` (negativos fuera).
+
+    Devuelve (H corregido por empates, p-valor, épsilon cuadrado, n).
+    """
+    rangos, empates, n = rangos_columna.rangos(codigos >= 0)
+    validos = ~np.isnan(rangos)
+    tamano = np.bincount(codigos[validos], minlength=n_grupos)
+    suma = np.bincount(codigos[validos], weights=rangos[validos], minlength=n_grupos)
+    presentes = tamano > 0
+    k = int(presentes.sum())
+    if k < 2 or n < 3:
+        return np.nan, np.nan, np.nan, n
+    h = 12 / (n * (n + 1)) * (suma[presentes] ** 2 / tamano[presentes]).sum() - 3 * (n + 1)
+    correccion = 1 - empates / (n ** 3 - n)
+    h = h / correccion if correccion > 0 else np.nan
+    return h, float(stats.chi2.sf(h, k - 1)), h / (n - 1), n
+
+
+def mann_whitney(rangos_columna, codigos, a, b):
+    """Mann-Whitney bilateral (aproximación normal con corrección de continuidad) entre los grupos `a` y `b`.
+
+    Devuelve (U de `a`, p-valor, correlación biserial de rangos, n de `a`, n de `b`).
+    """
+    rangos, empates, n = rangos_columna.rangos((codigos == a) | (codigos == b))
+    en_a = (codigos == a) & ~np.isnan(rangos)
+    n_a = int(en_a.sum())
+    n_b = n - n_a
+    if n_a == 0 or n_b == 0:
+        return np.nan, np.nan, np.nan, n_a, n_b
+    u = rangos[en_a].sum() - n_a * (n_a + 1) / 2
+    media = n_a * n_b / 2
+    varianza = n_a * n_b / 12 * ((n + 1) - empates / (n * (n - 1)))
+    if varianza <= 0:
+        return u, 1.0, 0.0, n_a, n_b
+    z = (abs(u - media) - 0.5) / np.sqrt(varianza)
+    return u, float(min(1.0, 2 * stats.norm.sf(z))), 2 * u / (n_a * n_b) - 1, n_a, n_b
+
+
+def holm(p_valores):
+    """p-valores ajustados por Holm-Bonferroni."""
+    p = np.asarray(p_valores, dtype=float)
+    ajustados = np.full(len(p), np.nan)
+    validos = np.flatnonzero(~np.isnan(p))
+    orden = validos[np.argsort(p[validos])]
+    m = len(orden)
+    ajustados[orden] = np.minimum(1, np.maximum.accumulate(p[orden] * (m - np.arange(m))))
+    return ajustados
+
+
+def spearman(columnas):
+    """Matriz de correlación de Spearman (casos completos por pares) de un dict de arrays."""
+    nombres = list(columnas)
+    clave = _clave("spearman", repr(nombres), *columnas.values())
+    cacheado = _leer(clave)
+    if cacheado is not None:
+        return cacheado
+    rangos_columnas = {c: RangosColumna(v) for c, v in columnas.items()}
+    validos = {c: ~np.isnan(rangos_columnas[c].valores) for c in nombres}
+    matriz = np.eye(len(nombres))
+    for i, j in combinations(range(len(nombres)), 2):
+        x, y = nombres[i], nombres[j]
+        # Muchas parejas comparten máscara (p. ej. las puntuaciones): sus rangos se reutilizan
+        mascara = validos[x] & validos[y]
+        rx = rangos_columnas[x].rangos(mascara)[0][mascara]
+        ry = rangos_columnas[y].rangos(mascara)[0][mascara]
+        if len(rx) < 3 or rx.std() == 0 or ry.std() == 0:
+            matriz[i, j] = matriz[j, i] = np.nan
+            continue
+        matriz[i, j] = matriz[j, i] = np.corrcoef(rx, ry)[0, 1]
+    return _guardar(clave, pd.DataFrame(matriz, index=nombres, columns=nombres))
+
+
+def contrastes_precio(valores, factores, pares):
+    """Contrastes del precio entre los grupos de cada factor.
+
+    `factores` es un dict {nombre: serie de grupos} y `pares` un dict
+    {nombre: [(grupo_a, grupo_b), ...]} con las comparaciones de Mann-Whitney.
+    El precio se ordena una sola vez para todos los contrastes. Devuelve dos
+    DataFrames: Kruskal-Wallis por factor y Mann-Whitney por par, con los
+    p-valores de esta última ajustados por Holm.
+    """
+    codificados = {nombre: pd.factorize(serie, sort=True) for nombre, serie in factores.items()}
+    clave = _clave(
+        "contrastes", np.asarray(valores, dtype=float),
+        *[codigos for codigos, _ in codificados.values()], repr(pares),
+    )
+    cacheado = _leer(clave)
+    if cacheado is not None:
+        return cacheado
+
+    precio = RangosColumna(valores)
+    filas_kw, filas_mw = [], []
+    for nombre, (codigos, etiquetas) in codificados.items():
+        h, p, epsilon2, n = kruskal_wallis(precio, codigos, len(etiquetas))
+        filas_kw.append({"Factor": nombre, "Grupos": len(etiquetas), "n": n, "H": h, "p-valor": p, "ε²": epsilon2})
+        posicion = {etiqueta: k for k, etiqueta in enumerate(etiquetas)}
+        for a, b in pares.get(nombre, []):
+            if a not in posicion or b not in posicion:
+                continue
+            u, p, r, n_a, n_b = mann_whitney(precio, codigos, posicion[a], posicion[b])
+            filas_mw.append({"Factor": nombre, "Grupo A": str(a), "Grupo B": str(b), "n A": n_a, "n B": n_b,
+                             "U": u, "p-valor": p, "r biserial": r})
+    kw = pd.DataFrame(filas_kw)
+    mw = pd.DataFrame(filas_mw, columns=["Factor", "Grupo A", "Grupo B", "n A", "n B", "U", "p-valor", "r biserial"])
+    mw["p ajustado (Holm)"] = holm(mw["p-valor"]) if len(mw) else []
+    return _guardar(clave, (kw, mw))
@@ -0,0 +1,138 @@
+"""Consultas SQL de solo lectura sobre los datasets publicados de las ciudades.
+
+Cada ciudad publicada (ver panel/almacen.py) es una tabla de DuckDB con el
+nombre de la ciudad en minúsculas (`barcelona`, `madrid`...), que se carga la
+primera vez que una consulta la nombra y se recarga si se vuelve a publicar.
+
+- solo se admite una sentencia SELECT (o WITH ... SELECT) y la conexión no
+  puede leer ni escribir ficheros;
+- el resultado se corta en `limite` filas;
+- una consulta que tarda más de `tiempo_maximo` s se interrumpe;
+- los resultados se guardan (LRU) por texto de la consulta, límite y versión
+  de las tablas que usa.
+
+Los resultados son tablas de Arrow, que Streamlit dibuja sin pasar por pandas.
+Necesita el paquete `duckdb`.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from panel import almacen
+from panel.backends import cargar_tabla_duckdb
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+MAX_FILAS = 10000
+TIEMPO_MAXIMO = 10
+# Resultados de consultas que se conservan para reutilizarlos
+MAX_RESULTADOS = 32
+
+
+class ConsultaNoPermitida(ValueError):
+    """La consulta no es una única sentencia SELECT."""
+
+
+class TiempoAgotado(Exception):
+    """La consulta se ha interrumpido por superar el tiempo máximo."""
+
+
+def nombre_tabla(ciudad):
+    return re.sub(r"\W+", "_", ciudad.lower()).strip("_")
+
+
+class Explorador:
+    """Conexión de DuckDB con las ciudades publicadas como tablas."""
+
+    def __init__(self, ciudades, tiempo_maximo=TIEMPO_MAXIMO):
+        self.tiempo_maximo = tiempo_maximo
+        # tabla -> ciudad de cada tabla que se puede consultar
+        self._ciudades = {nombre_tabla(ciudad): ciudad for ciudad in ciudades}
+        self._conexion = duckdb.connect()
+        self._conexion.execute("SET enable_external_access = false")
+        # Las consultas no pueden volver a activar el acceso a ficheros
+        self._conexion.execute("SET lock_configuration = true")
+        # tabla -> firma (mtime) del fichero con el que se cargó
+        self._cargadas = {}
+        self._resultados = OrderedDict()
+        self._bloqueo = threading.Lock()
+
+    def tablas(self):
+        """Tablas disponibles: las de las ciudades ya publicadas, con su ciudad."""
+        return {tabla: ciudad for tabla, ciudad in self._ciudades.items()
+                if os.path.exists(almacen.ruta_dataset(ciudad))}
+
+    def _preparar(self, tablas):
+        # Carga o recarga las tablas nombradas y devuelve su versión
+        firmas = []
+        with self._bloqueo:
+            for tabla in sorted(tablas):
+                ciudad = self._ciudades.get(tabla)
+                if ciudad is None or not os.path.exists(almacen.ruta_dataset(ciudad)):
+                    continue
+                ruta = almacen.ruta_dataset(ciudad)
+                firma = os.path.getmtime(ruta)
+                if self._cargadas.get(tabla) != firma:
+                    cargar_tabla_duckdb(self._conexion, tabla, ruta)
+                    self._cargadas[tabla] = firma
+                firmas.append((tabla, firma))
+        return tuple(firmas)
+
+    def _sentencia(self, sql):
+        # Se llama con el bloqueo tomado
+        try:
+            sentencias = self._conexion.extract_statements(sql)
+        except duckdb.Error as e:
+            raise ConsultaNoPermitida(str(e)) from e
+        if len(sentencias) != 1 or sentencias[0].type != duckdb.StatementType.SELECT:
+            raise ConsultaNoPermitida("Solo se admite una única consulta SELECT.")
+        return sentencias[0].query.strip().rstrip(";")
+
+    def consultar(self, sql, limite=MAX_FILAS):
+        """Ejecuta `sql` y devuelve un dict con la tabla de Arrow del resultado.
+
+        Claves: "tabla", "truncada" (había más de `limite` filas), "segundos"
+        y "cacheado". Lanza `ConsultaNoPermitida`, `TiempoAgotado` o el error
+        de DuckDB de la consulta.
+        """
+        # La conexión compartida no admite llamadas concurrentes: se usa con el bloqueo
+        with self._bloqueo:
+            sentencia = self._sentencia(sql)
+            tablas = self._conexion.get_table_names(sentencia)
+        firmas = self._preparar(tablas)
+        clave = (sentencia, limite, firmas)
+        with self._bloqueo:
+            resultado = self._resultados.get(clave)
+            if resultado is not None:
+                self._resultados.move_to_end(clave)
+                return dict(resultado, cacheado=True)
+
+        # Cada consulta usa su propio cursor para poder interrumpirla sin afectar a las demás
+        with self._bloqueo:
+            cursor = self._conexion.cursor()
+        temporizador = threading.Timer(self.tiempo_maximo, cursor.interrupt)
+        inicio = time.perf_counter()
+        temporizador.start()
+        try:
+            tabla = cursor.execute(f"SELECT * FROM ({sentencia}) AS consulta LIMIT {int(limite) + 1}").arrow()
+            # Las versiones recientes devuelven un lector por lotes en lugar de la tabla
+            tabla = tabla.read_all() if hasattr(tabla, "read_all") else tabla
+        except duckdb.InterruptException as e:
+            raise TiempoAgotado(f"La consulta ha superado {self.tiempo_maximo} s.") from e
+        finally:
+            temporizador.cancel()
+            cursor.close()
+        resultado = {
+            "tabla": tabla.slice(0, limite), "truncada": tabla.num_rows > limite,
+            "segundos": time.perf_counter() - inicio, "cacheado": False,
+        }
+        with self._bloqueo:
+            self._resultados[clave] = resultado
+            if len(self._resultados) > MAX_RESULTADOS:
+                self._resultados.popitem(last=False)
+        return resultado
@@ -0,0 +1,197 @@
+"""Exportación sin interfaz de todas las pestañas a HTML y JSON.
+
+Usa las mismas funciones `tab_*` que el panel, con un `Recolector` en lugar de
+streamlit. Cada ciudad se procesa en un proceso del pool: su dataset preparado
+se obtiene una vez del almacén compartido y se reutiliza para todos los presets
+de filtros.
+
+    python -m panel.exportar --salida exportacion
+    python -m panel.exportar --ciudades Madrid Sevilla --presets por_defecto economico --formatos html
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import plotly.io as pio
+
+from panel import almacen, calendario
+from panel.fuentes import ciudades_urls, ruta_calendario
+from panel.graficos import PESTANAS, Recolector, tab_alojamiento, tab_temporal
+from panel.preparacion import (
+    filtros_por_defecto, limites_filtros, mascara_filtros, opciones_categoricas, procesar_amenidades
+)
+
+# Cada preset modifica los filtros por defecto del sidebar
+PRESETS = {
+    "por_defecto": {},
+    "toda_la_ciudad": {"todos_los_vecindarios": True, "price_range": (0, 1000), "min_nights_range": (1, 30)},
+    "economico": {"todos_los_vecindarios": True, "price_range": (0, 100)},
+    "gama_alta": {"todos_los_vecindarios": True, "price_range": (300, 1000)},
+    "estancias_largas": {"todos_los_vecindarios": True, "min_nights_range": (7, 30)},
+}
+
+PLANTILLA_HTML = """<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>{titulo}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2rem; color: #484848; }}
+h1 {{ color: #FF5A5F; }}
+h2 {{ border-bottom: 2px solid #FF5A5F; padding-bottom: 0.3rem; }}
+.aviso {{ background: #F7F7F7; border-left: 5px solid #FF5A5F; padding: 0.5rem 1rem; }}
+</style>
+</head>
+<body>
+<h1>{titulo}</h1>
+<p>{descripcion}</p>
+{contenido}
+</body>
+</html>
+"""
+
+
+def _nombre_fichero(texto):
+    return re.sub(r"[^a-z0-9]+", "_", texto.lower()).strip("_")
+
+
+def filtros_preset(limites, neighborhoods_options, room_type_options, preset):
+    filtros = filtros_por_defecto(limites, neighborhoods_options, room_type_options)
+    cambios = dict(PRESETS[preset])
+    if cambios.pop("todos_los_vecindarios", False):
+        filtros["neighborhoods"] = neighborhoods_options
+    filtros.update(cambios)
+    return filtros
+
+
+def construir_pestanas(data, filtros, calendario_ciudad=None):
+    """Devuelve [(titulo, elementos)] de cada pestaña, o None si el filtro no deja datos."""
+    filtered_data = data[mascara_filtros(data, **filtros)].copy()
+    if len(filtered_data) == 0:
+        return None
+    conteo_amenidades, common_amenities = None, []
+    if "amenities" in filtered_data.columns:
+        conteo_amenidades, common_amenities = procesar_amenidades(filtered_data)
+
+    pestanas = []
+    for titulo, tab in PESTANAS:
+        recolector = Recolector()
+        if tab is tab_alojamiento:
+            tab(recolector, filtered_data, conteo_amenidades, common_amenities)
+        elif tab is tab_temporal:
+            tab(recolector, filtered_data, calendario_ciudad)
+        else:
+            tab(recolector, filtered_data)
+        pestanas.append((titulo, recolector.elementos))
+    return pestanas
+
+
+def _escribir_html(ruta, titulo, descripcion, pestanas, plotlyjs):
+    partes = []
+    incluir_js = plotlyjs
+    for titulo_pestana, elementos in pestanas:
+        partes.append(f"<h2>{titulo_pestana}</h2>")
+        for tipo, contenido in elementos:
+            if tipo == "figura":
+                # plotly.js se incrusta una sola vez por documento
+                partes.append(pio.to_html(contenido, full_html=False, include_plotlyjs=incluir_js))
+                if incluir_js is True:
+                    incluir_js = False
+            elif tipo == "tabla":
+                partes.append(contenido.to_html(index=False, na_rep="-"))
+            elif tipo == "texto":
+                partes.append(f"<div>{contenido}</div>")
+            else:
+                partes.append(f'<p class="aviso">{contenido}</p>')
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write(PLANTILLA_HTML.format(titulo=titulo, descripcion=descripcion, contenido="\n".join(partes)))
+
+
+def _escribir_json(ruta, ciudad, preset, filtros, pestanas):
+    documento = {
+        "ciudad": ciudad,
+        "preset": preset,
+        "filtros": {k: list(v) if isinstance(v, (list, tuple)) else v for k, v in filtros.items()},
+        "pestanas": [
+            {
+                "titulo": titulo,
+                "elementos": [
+                    {"tipo": tipo, "figura": json.loads(pio.to_json(contenido))} if tipo == "figura"
+                    else {"tipo": tipo, "filas": json.loads(contenido.to_json(orient="records", force_ascii=False))} if tipo == "tabla"
+                    else {"tipo": tipo, "texto": contenido}
+                    for tipo, contenido in elementos
+                ],
+            }
+            for titulo, elementos in pestanas
+        ],
+    }
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(documento, f, ensure_ascii=False)
+
+
+def exportar_ciudad(ciudad, origen, directorio, presets, formatos, plotlyjs=True):
+    """Exporta todos los presets de una ciudad; devuelve la lista de ficheros escritos."""
+    # El mismo dataset preparado que usa el panel (ver panel.almacen)
+    data = almacen.obtener(ciudad, origen)
+    calendario_ciudad = calendario.obtener(ciudad, ruta_calendario(ciudad), data)
+    catalogo = almacen.catalogo(ciudad)
+    limites = limites_filtros(catalogo)
+    neighborhoods_options, room_type_options = opciones_categoricas(catalogo)
+    directorio_ciudad = os.path.join(directorio, _nombre_fichero(ciudad))
+    os.makedirs(directorio_ciudad, exist_ok=True)
+
+    ficheros = []
+    for preset in presets:
+        filtros = filtros_preset(limites, neighborhoods_options, room_type_options, preset)
+        pestanas = construir_pestanas(data, filtros, calendario_ciudad)
+        if pestanas is None:
+            print(f"{ciudad}/{preset}: no hay datos que cumplan los filtros, se omite", file=sys.stderr)
+            continue
+        base = os.path.join(directorio_ciudad, preset)
+        if "html" in formatos:
+            descripcion = f"Preset «{preset}»: " + ", ".join(f"{k} = {v}" for k, v in filtros.items())
+            _escribir_html(base + ".html", f"Airbnb {ciudad}: {preset}", descripcion, pestanas, plotlyjs)
+            ficheros.append(base + ".html")
+        if "json" in formatos:
+            _escribir_json(base + ".json", ciudad, preset, filtros, pestanas)
+            ficheros.append(base + ".json")
+    return ficheros
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--salida", default="exportacion", help="Directorio de salida")
+    parser.add_argument("--ciudades", nargs="*", choices=list(ciudades_urls), help="Por defecto, todas")
+    parser.add_argument("--presets", nargs="*", choices=list(PRESETS), help="Por defecto, todos")
+    parser.add_argument("--formatos", nargs="*", choices=["html", "json"], default=["html", "json"])
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos del pool (por defecto, uno por CPU)")
+    parser.add_argument("--plotlyjs", choices=["incrustado", "cdn"], default="incrustado",
+                        help="Incrustar plotly.js en cada HTML o cargarlo desde la CDN")
+    args = parser.parse_args()
+
+    ciudades = args.ciudades or list(ciudades_urls)
+    presets = args.presets or list(PRESETS)
+    plotlyjs = True if args.plotlyjs == "incrustado" else "cdn"
+
+    errores = 0
+    with ProcessPoolExecutor(max_workers=args.procesos) as pool:
+        futuros = {
+            pool.submit(exportar_ciudad, ciudad, ciudades_urls[ciudad], args.salida, presets, args.formatos, plotlyjs): ciudad
+            for ciudad in ciudades
+        }
+        for futuro in as_completed(futuros):
+            ciudad = futuros[futuro]
+            try:
+                for fichero in futuro.result():
+                    print(fichero)
+            except Exception as e:
+                errores += 1
+                print(f"Error al exportar {ciudad}: {e}", file=sys.stderr)
+    sys.exit(1 if errores else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Recuentos de facetas para los filtros del sidebar.
+
+Cada filtro se precalcula una vez por ciudad como un array compacto: códigos
+enteros para vecindario y tipo de habitación y float para los deslizadores.
+En cada rerun se construye una máscara por filtro y, para cada faceta, el
+AND de las demás (con productos prefijo/sufijo, sin repetir trabajo); los
+recuentos por opción salen de un único `bincount`. Todo son operaciones
+vectoriales sobre arrays de una ciudad, mucho más baratas que el rerun.
+"""
+import numpy as np
+import pandas as pd
+
+FACETAS = ["neighborhoods", "room_types", "price_range", "min_reviews", "min_nights_range"]
+
+
+def _codigos(serie, opciones):
+    # Posición de cada valor en `opciones`; -1 si no está (nulos incluidos)
+    return pd.Categorical(serie, categories=opciones).codes.astype(np.int32)
+
+
+class IndiceFacetas:
+    """Arrays de los filtros del sidebar de una ciudad, alineados con sus filas."""
+
+    def __init__(self, data, neighborhoods_options, room_type_options):
+        self.neighborhoods_options = list(neighborhoods_options)
+        self.room_type_options = list(room_type_options)
+        self.barrio = _codigos(data["neighbourhood_cleansed"], self.neighborhoods_options)
+        self.tipo = _codigos(data["room_type"], self.room_type_options)
+        self.precio = data["price"].to_numpy(dtype=float)
+        self.resenas = data["number_of_reviews"].to_numpy(dtype=float)
+        self.noches = data["minimum_nights"].to_numpy(dtype=float)
+
+    def __len__(self):
+        return len(self.precio)
+
+    @staticmethod
+    def _seleccion(codigos, opciones, elegidas):
+        # Tabla de pertenencia indexada por código; la última posición es el -1
+        tabla = np.zeros(len(opciones) + 1, dtype=bool)
+        posicion = {opcion: i for i, opcion in enumerate(opciones)}
+        tabla[[posicion[e] for e in elegidas if e in posicion]] = True
+        return tabla[codigos]
+
+    def mascaras(self, filtros):
+        """Máscara de cada filtro por separado, en el orden de FACETAS.
+
+        `filtros` tiene las claves de `filtros_por_defecto`; la combinación
+        equivale a `mascara_filtros`.
+        """
+        precio, noches = filtros["price_range"], filtros["min_nights_range"]
+        return [
+            self._seleccion(self.barrio, self.neighborhoods_options, filtros["neighborhoods"]),
+            self._seleccion(self.tipo, self.room_type_options, filtros["room_types"]),
+            (self.precio >= precio[0]) & (self.precio <= precio[1]),
+            self.resenas >= filtros["min_reviews"],
+            (self.noches >= noches[0]) & (self.noches <= noches[1]),
+        ]
+
+    def mascara(self, filtros):
+        """Máscara combinada de todos los filtros."""
+        return np.logical_and.reduce(self.mascaras(filtros))
+
+    def conteos(self, filtros, restriccion=None):
+        """Recuentos de cada faceta con el resto de filtros activos.
+
+        `restriccion` es una máscara que se aplica siempre, además de los
+        filtros (p. ej., los resultados de una búsqueda de texto).
+
+        Devuelve un dict con:
+        - "total": alojamientos con todos los filtros;
+        - "neighborhoods" / "room_types": Series con el recuento de cada opción;
+        - "price_range", "min_reviews", "min_nights_range": alojamientos que
+          cumplen los demás filtros con ese deslizador sin restringir.
+        """
+        mascaras = self.mascaras(filtros)
+        n = len(mascaras)
+        # resto[i] = AND de todas las máscaras menos la i-ésima
+        prefijo = [np.ones(len(self), dtype=bool) if restriccion is None else restriccion]
+        for mascara in mascaras[:-1]:
+            prefijo.append(prefijo[-1] & mascara)
+        resto = [None] * n
+        sufijo = prefijo[0].copy()
+        for i in range(n - 1, -1, -1):
+            resto[i] = prefijo[i] & sufijo
+            sufijo = sufijo & mascaras[i]
+
+        conteos = {"total": int(sufijo.sum())}
+        for faceta, codigos, opciones, i in (
+            ("neighborhoods", self.barrio, self.neighborhoods_options, 0),
+            ("room_types", self.tipo, self.room_type_options, 1),
+        ):
+            elegidos = codigos[resto[i]]
+            por_opcion = np.bincount(elegidos[elegidos >= 0], minlength=len(opciones))
+            conteos[faceta] = pd.Series(por_opcion, index=opciones)
+        for faceta, i in (("price_range", 2), ("min_reviews", 3), ("min_nights_range", 4)):
+            conteos[faceta] = int(resto[i].sum())
+        return conteos
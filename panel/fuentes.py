@@ -0,0 +1,50 @@
+"""Origen de los datos de cada ciudad."""
+import os
+
+# Diccionario de ciudades y URLs
+ciudades_urls = {
+    "Barcelona": "https://raw.githubusercontent.com/asotogarc/TFG-UOC-CienciaDeDatos-062025/main/datasets/inmuebles_barcelona.parquet",
+    "Euskadi": "https://raw.githubusercontent.com/asotogarc/TFG-UOC-CienciaDeDatos-062025/main/datasets/inmuebles_euskadi.parquet",
+    "Girona": "https://raw.githubusercontent.com/asotogarc/TFG-UOC-CienciaDeDatos-062025/main/datasets/inmuebles_girona.parquet",
+    "Madrid": "https://raw.githubusercontent.com/asotogarc/TFG-UOC-CienciaDeDatos-062025/main/datasets/inmuebles_madrid.parquet",
+    "Mallorca": "https://raw.githubusercontent.com/asotogarc/TFG-UOC-CienciaDeDatos-062025/main/datasets/inmuebles_mallorca.parquet",
+    "Menorca": "https://raw.githubusercontent.com/asotogarc/TFG-UOC-CienciaDeDatos-062025/main/datasets/inmuebles_menorca.parquet",
+    "Sevilla": "https://raw.githubusercontent.com/asotogarc/TFG-UOC-CienciaDeDatos-062025/main/datasets/inmuebles_sevilla.parquet",
+    "Valencia": "https://raw.githubusercontent.com/asotogarc/TFG-UOC-CienciaDeDatos-062025/main/datasets/inmuebles_valencia.parquet"
+}
+
+# Directorio local opcional con los mismos ficheros (benchmarks, uso sin conexión)
+directorio_datos = os.environ.get("AIRBNB_DATA_DIR")
+if directorio_datos:
+    ciudades_urls = {
+        ciudad: os.path.join(directorio_datos, os.path.basename(url))
+        for ciudad, url in ciudades_urls.items()
+    }
+
+
+
+def _fichero_local(variable, nombre):
+    # Ficheros auxiliares opcionales: en el directorio de `variable` o en AIRBNB_DATA_DIR
+    directorio = os.environ.get(variable, directorio_datos)
+    if not directorio:
+        return None
+    ruta = os.path.join(directorio, nombre)
+    return ruta if os.path.exists(ruta) else None
+
+
+def ruta_barrios(ciudad):
+    """GeoJSON local de los barrios de `ciudad` (`neighbourhoods.geojson` de InsideAirbnb).
+
+    Se busca como `barrios_<ciudad>.geojson` en AIRBNB_BARRIOS_DIR o, si no está
+    definido, en AIRBNB_DATA_DIR. Devuelve None si no existe.
+    """
+    return _fichero_local("AIRBNB_BARRIOS_DIR", f"barrios_{ciudad.lower()}.geojson")
+
+
+def ruta_calendario(ciudad):
+    """Calendario local de `ciudad` (`calendar.csv.gz` de InsideAirbnb).
+
+    Se busca como `calendario_<ciudad>.csv.gz` en AIRBNB_CALENDARIO_DIR o, si no
+    está definido, en AIRBNB_DATA_DIR. Devuelve None si no existe.
+    """
+    return _fichero_local("AIRBNB_CALENDARIO_DIR", f"calendario_{ciudad.lower()}.csv.gz")
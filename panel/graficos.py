@@ -0,0 +1,2163 @@
+"""Construcción de las pestañas del panel.
+
+Cada función `tab_*` dibuja una pestaña sobre `salida`, que puede ser el propio
+módulo `streamlit` o un `Recolector` que guarda las figuras y los mensajes para
+exportarlos sin interfaz (ver panel/exportar.py).
+"""
+import os
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from panel import descarga
+from panel.densidad import kde
+from panel.estadistica import barras_error, contrastes_precio, intervalos_por_grupo, spearman
+from panel.explorar import MAX_FILAS, ConsultaNoPermitida, TiempoAgotado, nombre_tabla
+from panel.historico import METRICAS
+from panel.listado import FILAS_POR_PAGINA
+from panel.preparacion import cortar_en_rangos, numeric_columns, techo_precio
+from panel.raster import METRICAS_CALOR, capa_calor, zoom_para
+
+# plotly >= 5.24 dibuja los mapas con MapLibre (`Scattermap`, layout `map`) y
+# plotly 7 ya no tiene las trazas de Mapbox; las versiones anteriores solo esas
+if hasattr(go, "Scattermap"):
+    TrazaMapa, CoropletaMapa, DensidadMapa, CAPA_MAPA = go.Scattermap, go.Choroplethmap, go.Densitymap, "map"
+else:
+    TrazaMapa, CoropletaMapa, DensidadMapa, CAPA_MAPA = go.Scattermapbox, go.Choroplethmapbox, go.Densitymapbox, "mapbox"
+
+# A partir de estos alojamientos el mapa dibuja la densidad en lugar de un punto por alojamiento
+UMBRAL_DENSIDAD = 20000
+
+
+class Recolector:
+    """Sustituto de `streamlit` que guarda lo que dibujaría cada pestaña.
+
+    Los elementos son tuplas `(tipo, contenido)` con tipo "figura", "tabla"
+    (un DataFrame), "texto", "info", "warning" o "error".
+    """
+
+    def __init__(self):
+        self.elementos = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def columns(self, spec):
+        n = spec if isinstance(spec, int) else len(spec)
+        return [self] * n
+
+    def plotly_chart(self, fig, **kwargs):
+        self.elementos.append(("figura", fig))
+
+    def dataframe(self, tabla, **kwargs):
+        self.elementos.append(("tabla", tabla))
+
+    def markdown(self, texto, **kwargs):
+        self.elementos.append(("texto", texto))
+
+    def write(self, *args, **kwargs):
+        self.elementos.append(("texto", " ".join(str(a) for a in args)))
+
+    def info(self, texto, **kwargs):
+        self.elementos.append(("info", texto))
+
+    def warning(self, texto, **kwargs):
+        self.elementos.append(("warning", texto))
+
+    def error(self, texto, **kwargs):
+        self.elementos.append(("error", texto))
+
+
+class Grabacion:
+    """Sustituto de `streamlit` que graba las llamadas de una pestaña para repetirlas.
+
+    Permite construir las figuras fuera del hilo del script (ver
+    panel/planificador.py) y dibujarlas después con `reproducir`. Conserva las
+    columnas: lo que se dibuja dentro de `with columna:` queda en esa columna.
+    Cada llamada es un punto de control del `testigo` de cancelación, si lo hay.
+    """
+
+    METODOS = {"plotly_chart", "dataframe", "markdown", "write", "caption", "info", "warning", "error"}
+
+    def __init__(self, testigo=None, raiz=None):
+        # Lista de (método, args, kwargs, grabaciones de las columnas o None)
+        self.llamadas = []
+        self.testigo = testigo
+        self._raiz = raiz if raiz is not None else self
+        self._pila = [self]
+
+    def __enter__(self):
+        self._raiz._pila.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        self._raiz._pila.pop()
+        return False
+
+    def _destino(self):
+        if self._raiz.testigo is not None:
+            self._raiz.testigo.comprobar()
+        # `salida.x()` dentro de `with columna:` va a la columna
+        return self._raiz._pila[-1] if self is self._raiz else self
+
+    def columns(self, spec, **kwargs):
+        n = spec if isinstance(spec, int) else len(spec)
+        columnas = [Grabacion(raiz=self._raiz) for _ in range(n)]
+        self._destino().llamadas.append(("columns", (spec,), kwargs, columnas))
+        return columnas
+
+    def __getattr__(self, nombre):
+        if nombre not in Grabacion.METODOS:
+            raise AttributeError(nombre)
+
+        def grabar(*args, **kwargs):
+            self._destino().llamadas.append((nombre, args, kwargs, None))
+        return grabar
+
+    def reproducir(self, salida):
+        """Repite sobre `salida` (normalmente `streamlit`) las llamadas grabadas."""
+        for nombre, args, kwargs, columnas in self.llamadas:
+            if nombre == "columns":
+                # Dentro de `with columna` como al grabar: `columna.write` no admite varios argumentos
+                for destino, grabacion in zip(salida.columns(*args, **kwargs), columnas):
+                    with destino:
+                        grabacion.reproducir(salida)
+            else:
+                getattr(salida, nombre)(*args, **kwargs)
+
+
+def tarjetas_metricas(salida, precio_mediano, alojamientos, puntuacion_media, ocupacion_media, antiguedad_media):
+    """Las cinco tarjetas de "Métricas Clave"."""
+    tarjetas = [
+        (f"€{precio_mediano:.2f}", "Precio Mediano"),
+        (f"{alojamientos}", "Alojamientos"),
+        (f"{puntuacion_media:.1f}", "Puntuación Media"),
+        (f"{ocupacion_media:.1%}", "Ocupación Media"),
+        (f"{antiguedad_media:.1f}", "Años de Anfitrión"),
+    ]
+    for columna, (valor, etiqueta) in zip(salida.columns(5), tarjetas):
+        columna.markdown(f"""
+        <div class="metric-card">
+            <div class="metric-value">{valor}</div>
+            <div class="metric-label">{etiqueta}</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+
+def histograma_filtro(salida, histograma, seleccion, limites, key=None):
+    """Histograma mínimo de una columna bajo su deslizador, con la selección resaltada.
+
+    `histograma` es el del catálogo del dataset (ver panel/catalogo.py).
+    """
+    if not histograma:
+        return
+    bordes = np.asarray(histograma["bordes"], dtype=float)
+    conteos = np.asarray(histograma["conteos"])
+    izquierda, derecha = bordes[:-1], bordes[1:]
+    visibles = (derecha > limites[0]) & (izquierda <= limites[1])
+    if not visibles.any():
+        return
+    centro = (izquierda + derecha) / 2
+    dentro = (centro >= seleccion[0]) & (centro <= seleccion[1])
+    fig = go.Figure(go.Bar(
+        x=centro[visibles], y=conteos[visibles], width=(derecha - izquierda)[visibles],
+        marker_color=np.where(dentro[visibles], "#FF5A5F", "#DDDDDD"), hoverinfo="skip",
+    ))
+    fig.update_layout(
+        height=50, margin=dict(l=0, r=0, t=0, b=0), bargap=0.05, showlegend=False,
+        xaxis=dict(visible=False, range=[limites[0], limites[1]]), yaxis=dict(visible=False),
+        plot_bgcolor="rgba(0,0,0,0)", paper_bgcolor="rgba(0,0,0,0)",
+    )
+    salida.plotly_chart(fig, use_container_width=True, config={"staticPlot": True}, key=key)
+
+
+def mapa_coropletas(salida, filtered_data, barrios, codigos_barrio, metrica):
+    """Coropletas de `metrica` por barrio; `codigos_barrio` son los códigos de toda la ciudad."""
+    codigos = codigos_barrio[filtered_data.index.to_numpy()]
+    presentes, valores, conteo = barrios.agregar(codigos, filtered_data, metrica)
+    if len(presentes) == 0:
+        salida.warning("Ningún alojamiento filtrado cae dentro de los barrios del GeoJSON.")
+        return
+    zoom, centro = barrios.zoom_para(presentes)
+    fig = go.Figure(CoropletaMapa(
+        geojson=barrios.geojson(zoom, presentes),
+        locations=[str(b) for b in presentes],
+        z=valores,
+        colorscale="Viridis",
+        marker_opacity=0.7,
+        marker_line_width=0.5,
+        colorbar=dict(title=metrica),
+        customdata=np.column_stack([[barrios.nombres[b] for b in presentes], conteo]),
+        hovertemplate="%{customdata[0]}<br>" + metrica + ": %{z:.2f}<br>Alojamientos: %{customdata[1]}<extra></extra>",
+    ))
+    fig.update_layout(
+        **{CAPA_MAPA: dict(style="open-street-map", center=centro, zoom=zoom)},
+        margin={"r": 0, "t": 0, "l": 0, "b": 0},
+        height=500,
+    )
+    salida.plotly_chart(fig, use_container_width=True)
+    fuera = int((codigos < 0).sum())
+    if fuera:
+        salida.info(f"{fuera} alojamientos filtrados no caen dentro de ningún barrio del GeoJSON.")
+
+
+def _coordenadas(filtered_data):
+    # Coordenadas y precio válidos como float32: la mitad de bytes hacia el navegador
+    lat, lon, precio = (filtered_data[c].to_numpy(dtype=np.float32, na_value=np.nan) for c in ("latitude", "longitude", "price"))
+    validos = ~(np.isnan(lat) | np.isnan(lon) | np.isnan(precio))
+    return validos, lat[validos], lon[validos], precio[validos]
+
+
+def mapa_puntos(salida, filtered_data, umbral=UMBRAL_DENSIDAD):
+    """Mapa de todos los alojamientos filtrados, o de su densidad si son más de `umbral`.
+
+    Los datos van como arrays tipados (customdata y hovertemplate en lugar de
+    un texto por punto), con una traza por tipo de habitación.
+    """
+    validos, lat, lon, precio = _coordenadas(filtered_data)
+    if len(lat) == 0:
+        salida.warning("No hay suficientes datos válidos para mostrar el mapa.")
+        return
+    fig = go.Figure()
+    if len(lat) > umbral:
+        fig.add_trace(DensidadMapa(
+            lat=lat, lon=lon, radius=6, colorscale="Viridis", hoverinfo="skip",
+            colorbar=dict(title="Densidad"),
+        ))
+    else:
+        puntuacion = (
+            filtered_data["review_scores_rating"].to_numpy(dtype=np.float32, na_value=np.nan)[validos]
+            if "review_scores_rating" in filtered_data.columns else np.full(len(lat), np.nan, dtype=np.float32)
+        )
+        tipos = filtered_data["room_type"].to_numpy(dtype=object)[validos] if "room_type" in filtered_data.columns else np.full(len(lat), "N/A", dtype=object)
+        limites_color = (float(precio.min()), float(precio.max()))
+        for i, tipo in enumerate(pd.unique(tipos)):
+            en_tipo = tipos == tipo
+            fig.add_trace(TrazaMapa(
+                lat=lat[en_tipo], lon=lon[en_tipo], mode="markers", name=str(tipo),
+                marker=dict(
+                    size=10, color=precio[en_tipo], colorscale="Viridis", opacity=0.7,
+                    cmin=limites_color[0], cmax=limites_color[1],
+                    showscale=i == 0, colorbar=dict(title="Precio (€)"),
+                ),
+                customdata=np.column_stack([precio[en_tipo], puntuacion[en_tipo]]),
+                hovertemplate=(
+                    "Precio: €%{customdata[0]:.2f}<br>"
+                    f"Tipo: {tipo}<br>"
+                    "Puntuación: %{customdata[1]:.1f}<extra></extra>"
+                ),
+            ))
+    fig.update_layout(
+        **{CAPA_MAPA: dict(
+            style="open-street-map", center=dict(lat=float(lat.mean()), lon=float(lon.mean())), zoom=11
+        )},
+        margin={"r": 0, "t": 0, "l": 0, "b": 0},
+        height=500,
+        showlegend=False,
+        title=dict(text="Distribución Geográfica de Alojamientos", font=dict(color="white"), x=0.5),
+    )
+    salida.plotly_chart(fig, use_container_width=True)
+    if len(lat) > umbral:
+        salida.info(f"{len(lat):,} alojamientos: se muestra su densidad en lugar de cada punto.")
+
+
+def mapa_calor(salida, filtered_data, metrica="Alojamientos"):
+    """Mapa de calor de los alojamientos filtrados como una imagen rasterizada (ver panel/raster.py)."""
+    validos, lat, lon, precio = _coordenadas(filtered_data)
+    if len(lat) == 0:
+        salida.warning("No hay suficientes datos válidos para mostrar el mapa.")
+        return
+    metrica = metrica if metrica in METRICAS_CALOR else "Alojamientos"
+    columna = METRICAS_CALOR[metrica]
+    pesos = None if columna is None else precio if columna == "price" else filtered_data[columna].to_numpy(dtype=np.float32, na_value=np.nan)[validos]
+    capa = capa_calor(lat, lon, pesos)
+    zoom, centro = zoom_para(capa["encuadre"])
+    # Un punto invisible para que el mapa tenga traza y para la barra de color
+    fig = go.Figure(TrazaMapa(
+        lat=[centro["lat"]], lon=[centro["lon"]], mode="markers", hoverinfo="skip",
+        marker=dict(
+            size=0, opacity=0, color=[capa["rango"][0]], colorscale="Viridis",
+            cmin=capa["rango"][0], cmax=capa["rango"][1], showscale=True,
+            colorbar=dict(title="Alojamientos por píxel" if columna is None else metrica),
+        ),
+    ))
+    fig.update_layout(
+        **{CAPA_MAPA: dict(
+            style="open-street-map", center=centro, zoom=zoom,
+            layers=[dict(sourcetype="image", source=capa["fuente"], coordinates=capa["coordenadas"])],
+        )},
+        margin={"r": 0, "t": 0, "l": 0, "b": 0},
+        height=500,
+        showlegend=False,
+    )
+    salida.plotly_chart(fig, use_container_width=True)
+
+
+def dispersion_puntos(salida, filtered_data):
+    """Dispersión WebGL de longitud y latitud coloreada por precio, sin mapa de fondo."""
+    _, lat, lon, precio = _coordenadas(filtered_data)
+    if len(lat) == 0:
+        return
+    fig = go.Figure(go.Scattergl(
+        x=lon, y=lat, mode="markers",
+        marker=dict(size=4, color=precio, colorscale="Viridis", colorbar=dict(title="Precio (€)"), opacity=0.7),
+        customdata=precio,
+        hovertemplate="Precio: €%{customdata:.2f}<extra></extra>",
+    ))
+    fig.update_layout(
+        xaxis_title="longitude", yaxis_title="latitude",
+        title=dict(text="Distribución de Alojamientos", font=dict(color="white"), x=0.5),
+    )
+    salida.plotly_chart(fig, use_container_width=True)
+
+
+def _contar(filtered_data, columna, agregados=None):
+    # Filas de cada valor de `columna`, de más a menos, con el motor de consultas si lo hay
+    if agregados is not None:
+        return agregados.contar(columna)
+    return filtered_data[columna].value_counts()
+
+
+def tab_geografica(salida, filtered_data, barrios=None, codigos_barrio=None, modo_mapa="Puntos", metrica="Precio mediano",
+                   agregados=None):
+    """Pestaña "Distribución Geográfica".
+
+    Con `barrios` (un `IndiceBarrios`) y `modo_mapa="Coropletas"` el mapa colorea
+    cada barrio por `metrica` en lugar de dibujar los alojamientos; con
+    `modo_mapa="Calor"` dibuja un mapa de calor de `metrica` (una de
+    `METRICAS_CALOR`). Con `agregados` (un `backends.Agregados`) los recuentos
+    se piden al motor de consultas en lugar de calcularse con pandas.
+    """
+#    salida.markdown('<div class="section-header">Distribución Geográfica de Alojamientos</div>', unsafe_allow_html=True)
+    col1, col2 = salida.columns([2, 1])
+    with col1:
+        if barrios is not None and modo_mapa == "Coropletas":
+            mapa_coropletas(salida, filtered_data, barrios, codigos_barrio, metrica)
+        elif (len(filtered_data) > 0 and
+            "latitude" in filtered_data.columns and
+            "longitude" in filtered_data.columns and
+            "price" in filtered_data.columns and
+            not filtered_data[["latitude", "longitude", "price"]].isna().all().any()):
+            try:
+                if modo_mapa == "Calor":
+                    mapa_calor(salida, filtered_data, metrica)
+                else:
+                    mapa_puntos(salida, filtered_data)
+            except Exception as e:
+                salida.error(f"Error al generar el mapa: {e}")
+                dispersion_puntos(salida, filtered_data)
+        else:
+            salida.warning("Faltan datos de latitud, longitud o precio para mostrar el mapa.")
+
+    with col2:
+        if "neighbourhood_cleansed" in filtered_data.columns:
+            neighbourhood_counts = _contar(filtered_data, "neighbourhood_cleansed", agregados).head(10)
+            fig = px.bar(
+                x=neighbourhood_counts.values,
+                y=neighbourhood_counts.index,
+                orientation="h",
+                labels={"x": "Número de Alojamientos", "y": "Vecindario"},
+                color=neighbourhood_counts.values,
+                color_continuous_scale=px.colors.sequential.Viridis,
+                title="Distribución por Vecindario"
+            )
+            fig.update_layout(
+                yaxis={"categoryorder": "total ascending"},
+                title=dict(text="Distribución por Vecindario", font=dict(color="white"), x=0.5)
+            )
+            salida.plotly_chart(fig, use_container_width=True)
+        else:
+            salida.info("La columna 'neighbourhood_cleansed' no está disponible.")
+
+
+def histograma_kde(valores, bins, color, nombre):
+    """Trazas de un histograma ya agrupado y de su curva de densidad, en recuentos."""
+    valores = valores[~np.isnan(valores)]
+    if len(valores) == 0:
+        return []
+    conteos, bordes = np.histogram(valores, bins=bins)
+    anchura = bordes[1] - bordes[0]
+    rejilla, densidad = kde(valores, limites=(bordes[0], bordes[-1]))
+    return [
+        go.Bar(x=(bordes[:-1] + bordes[1:]) / 2, y=conteos, width=anchura, marker_color=color, name=nombre),
+        go.Scatter(x=rejilla, y=densidad[0] * len(valores) * anchura, mode="lines",
+                   line=dict(color="white", width=1.5), name=f"{nombre} (densidad)", hoverinfo="skip"),
+    ]
+
+
+def violines_kde(posiciones, valores, limites, color="#FF5A5F", anchura=0.8):
+    """Trazas de violines con caja de `valores` agrupados por el valor de `posiciones`.
+
+    Cada violín es la curva de densidad del grupo en el intervalo `limites`,
+    todos con la misma anchura máxima, con su rango intercuartílico y mediana.
+    """
+    grupos, codigos = np.unique(posiciones, return_inverse=True)
+    rejilla, densidad = kde(valores, codigos, len(grupos), limites=limites)
+    cuartiles = pd.Series(valores).groupby(codigos).quantile([0.25, 0.5, 0.75]).unstack().to_numpy()
+    trazas = []
+    for i, x in enumerate(grupos):
+        mitad = densidad[i] / max(densidad[i].max(), 1e-12) * anchura / 2
+        trazas.append(go.Scatter(
+            x=np.concatenate([x - mitad, (x + mitad)[::-1]]), y=np.concatenate([rejilla, rejilla[::-1]]),
+            fill="toself", fillcolor="rgba(255, 90, 95, 0.2)", line=dict(color=color, width=2),
+            mode="lines", hoverinfo="skip", name=str(x),
+        ))
+        q1, mediana, q3 = cuartiles[i]
+        trazas.append(go.Scatter(
+            x=[x, x], y=[q1, q3], mode="lines", line=dict(color=color, width=8), name=str(x),
+            hovertemplate=f"Q1: {q1:.2f}<br>Q3: {q3:.2f}<extra>{x:g}</extra>",
+        ))
+        trazas.append(go.Scatter(
+            x=[x], y=[mediana], mode="markers", marker=dict(color="white", size=7), name=str(x),
+            hovertemplate=f"Mediana: {mediana:.2f}<extra>{x:g}</extra>",
+        ))
+    return trazas
+
+
+def _techo_precio(filtered_data):
+    # Límite de los ejes de precio: calculado una vez al filtrar (ver `filtrar` en main.py) o aquí
+    techo = filtered_data.attrs.get("techo_precio")
+    return techo if techo is not None else techo_precio(filtered_data)
+
+
+def tab_precios(salida, filtered_data, agregados=None):
+    """Pestaña "Análisis de Precios". Ver `tab_geografica` para `agregados`."""
+    techo = _techo_precio(filtered_data)
+    col1, col2 = salida.columns([1, 1])
+    with col1:
+        if "price" in filtered_data.columns:
+            fig = make_subplots(
+                rows=2, cols=1,
+                subplot_titles=("Distribución Original", "Distribución Log-transformada")
+            )
+            precio = filtered_data["price"].to_numpy(dtype=float, na_value=np.nan)
+            for fila, valores, color, nombre in (
+                (1, np.minimum(precio, techo), "#FF5A5F", "Precio Original"),
+                (2, filtered_data["log_price"].to_numpy(dtype=float, na_value=np.nan), "#00A699", "Log-Precio"),
+            ):
+                for traza in histograma_kde(valores, 30, color, nombre):
+                    fig.add_trace(traza, row=fila, col=1)
+            fig.update_layout(
+                height=500,
+                showlegend=False,
+                title=dict(text="Distribución de Precios de Alojamientos", font=dict(color="white"), x=0.5)
+            )
+            salida.plotly_chart(fig, use_container_width=True)
+        else:
+            salida.info("La columna 'price' no está disponible.")
+
+
+        if "availability_365" in filtered_data.columns and "price" in filtered_data.columns:
+            plot_data = filtered_data.dropna(subset=["availability_365", "price"]).copy()
+            if len(plot_data) > 0:
+                # Crear rangos de disponibilidad (intervalos de 50 días)
+                bins = [0, 50, 100, 150, 200, 250, 300, 365]
+                labels = ['0-50', '51-100', '101-150', '151-200', '201-250', '251-300', '301-365']
+                plot_data['availability_range'] = cortar_en_rangos(plot_data['availability_365'], bins, labels)
+
+                # Filtrar rangos con suficientes datos (mínimo 5 puntos por rango)
+                min_points = 5
+                category_counts = plot_data['availability_range'].value_counts()
+                valid_categories = category_counts[category_counts >= min_points].index.tolist()
+                plot_data_filtered = plot_data[plot_data['availability_range'].isin(valid_categories)]
+
+                if len(plot_data_filtered) > 0 and len(valid_categories) > 0:
+                    try:
+                        # Crear gráfico de caja
+                        fig = px.box(
+                            plot_data_filtered,
+                            x='availability_range',
+                            y='price',
+                            labels={'availability_range': 'Disponibilidad Anual (días)', 'price': 'Precio (€)'},
+                            title='Distribución de Precios por Rango de Disponibilidad Anual',
+                            category_orders={'availability_range': labels}  # Mantener el orden de los rangos
+                        )
+                        fig.update_layout(
+                            xaxis_title='Disponibilidad Anual (días)',
+                            yaxis_title='Precio (€)',
+                            title=dict(text='Distribución de Precios por Rango de Disponibilidad Anual', font=dict(color='white'), x=0.5),
+                            showlegend=False
+                        )
+                        # Limitar el eje Y para evitar valores extremos (opcional)
+                        fig.update_yaxes(range=[0, techo])
+                        salida.plotly_chart(fig, use_container_width=True)
+                    except Exception as e:
+                        salida.error(f"Error al generar el gráfico de caja: {e}")
+                        salida.write("Valores únicos en 'availability_range':", plot_data_filtered['availability_range'].unique())
+                else:
+                    salida.warning("No hay rangos de disponibilidad con suficientes datos para mostrar el gráfico.")
+            else:
+                salida.warning("No hay datos suficientes para mostrar el gráfico.")
+        else:
+            salida.info("Faltan las columnas 'availability_365' o 'price'.")
+
+
+
+
+    with col2:
+        if "neighbourhood_cleansed" in filtered_data.columns and "price" in filtered_data.columns:
+            if agregados is not None:
+                price_by_neighbourhood = agregados.agrupar("neighbourhood_cleansed", "price").set_index("neighbourhood_cleansed")["price"]
+            else:
+                price_by_neighbourhood = filtered_data.groupby("neighbourhood_cleansed")["price"].median()
+            price_by_neighbourhood = price_by_neighbourhood.sort_values(ascending=False).head(10)
+            intervalos = intervalos_por_grupo(filtered_data["price"], filtered_data["neighbourhood_cleansed"])
+            fig = px.bar(
+                x=price_by_neighbourhood.values,
+                y=price_by_neighbourhood.index,
+                orientation="h",
+                labels={"x": "Precio Mediano (€)", "y": "Vecindario"},
+                color=price_by_neighbourhood.values,
+                color_continuous_scale=px.colors.sequential.Plasma,
+                title="Precios Medios por Vecindario"
+            )
+            fig.update_traces(error_x=barras_error(intervalos, price_by_neighbourhood.index, price_by_neighbourhood.values))
+            fig.update_layout(
+                yaxis={"categoryorder": "total ascending"},
+                title=dict(text="Precios Medios por Vecindario", font=dict(color="white"), x=0.5)
+            )
+            salida.plotly_chart(fig, use_container_width=True)
+        else:
+            salida.info("Faltan las columnas 'neighbourhood_cleansed' o 'price'.")
+
+
+def tab_alojamiento(salida, filtered_data, conteo_amenidades=None, common_amenities=(), agregados=None):
+    """Pestaña "Características del Alojamiento". Ver `tab_geografica` para `agregados`."""
+    techo = _techo_precio(filtered_data)
+    col1, col2 = salida.columns([1, 1])
+    with col1:
+
+        if "property_type" in filtered_data.columns:
+            property_counts = _contar(filtered_data, "property_type", agregados).head(10)
+            fig = px.bar(
+                x=property_counts.index,
+                y=property_counts.values,
+                labels={"x": "Tipo de Propiedad", "y": "Número de Alojamientos"},
+                color=property_counts.values,
+                color_continuous_scale=px.colors.sequential.Viridis,
+                title="Tipos de Propiedad Más Comunes"
+            )
+            fig.update_layout(title=dict(text="Tipos de Propiedad Más Comunes", font=dict(color="white"), x=0.5))
+            salida.plotly_chart(fig, use_container_width=True)
+        else:
+            salida.info("La columna 'property_type' no está disponible.")
+
+
+
+        if "amenities" in filtered_data.columns and len(common_amenities) > 0:
+            amenities_df = pd.DataFrame(conteo_amenidades.most_common(15), columns=["amenity", "count"])
+            fig = px.bar(
+                amenities_df,
+                x="count",
+                y="amenity",
+                orientation="h",
+                color="count",
+                color_continuous_scale=px.colors.sequential.Viridis,
+                title="Amenidades Más Frecuentes en Alojamientos"
+            )
+            fig.update_layout(
+                yaxis={"categoryorder": "total ascending"},
+                title=dict(text="Amenidades Más Frecuentes en Alojamientos", font=dict(color="white"), x=0.5)
+            )
+            salida.plotly_chart(fig, use_container_width=True)
+        else:
+            salida.info("No hay datos de amenidades disponibles.")
+
+
+
+        salida.markdown('<div class="section-header">Distribución de Precios según Número de Habitaciones</div>', unsafe_allow_html=True)
+        if "bedrooms" in filtered_data.columns and "price" in filtered_data.columns:
+            plot_data = filtered_data.dropna(subset=["bedrooms", "price"])
+            if len(plot_data) > 0:
+                min_points = 1
+                category_counts = plot_data["bedrooms"].value_counts()
+                valid_categories = category_counts[category_counts >= min_points].index.tolist()
+                if valid_categories:
+                    plot_data_filtered = plot_data[plot_data["bedrooms"].isin(valid_categories)]
+                    try:
+                        fig = px.box(
+                            plot_data_filtered,
+                            x="bedrooms",
+                            y="price",
+                            labels={"bedrooms": "Número de Habitaciones", "price": "Precio (€)"},
+                            title="Distribución de Precios según Número de Habitaciones"
+                        )
+                        fig.update_layout(title=dict(text="Distribución de Precios según Número de Habitaciones", font=dict(color="white"), x=0.5))
+                        salida.plotly_chart(fig, use_container_width=True)
+                    except Exception as e:
+                        salida.error(f"Error al generar el gráfico de caja: {e}")
+                        salida.write("Valores únicos en 'bedrooms':", plot_data_filtered["bedrooms"].unique())
+                else:
+                    salida.warning("No hay números de habitaciones con suficientes datos para mostrar el gráfico.")
+            else:
+                salida.warning("No hay datos suficientes para mostrar el gráfico.")
+        else:
+            salida.info("Faltan las columnas 'bedrooms' o 'price'.")
+
+    with col2:
+
+        if "accommodates" in filtered_data.columns and "price" in filtered_data.columns:
+            plot_data = filtered_data.dropna(subset=["accommodates", "price"]).copy()
+            if len(plot_data) > 0:
+                # Filtrar capacidades con suficientes datos (mínimo 5 puntos)
+                min_points = 5
+                category_counts = plot_data["accommodates"].value_counts()
+                valid_categories = category_counts[category_counts >= min_points].index.tolist()
+                plot_data_filtered = plot_data[plot_data["accommodates"].isin(valid_categories)]
+
+                if len(plot_data_filtered) > 0 and len(valid_categories) > 0:
+                    try:
+                        # Crear gráfico de caja
+                        fig = px.box(
+                            plot_data_filtered,
+                            x="accommodates",
+                            y="price",
+                            labels={"accommodates": "Capacidad (Personas)", "price": "Precio (€)"},
+                            title="Distribución de Precios por Capacidad de Alojamiento",
+                            category_orders={"accommodates": sorted(valid_categories)}  # Ordenar capacidades
+                        )
+                        fig.update_layout(
+                            xaxis_title="Capacidad (Personas)",
+                            yaxis_title="Precio (€)",
+                            title=dict(text="Distribución de Precios por Capacidad de Alojamiento", font=dict(color="white"), x=0.5),
+                            showlegend=False
+                        )
+                        # Limitar el eje Y para evitar valores extremos
+                        fig.update_yaxes(range=[0, techo])
+                        salida.plotly_chart(fig, use_container_width=True)
+                    except Exception as e:
+                        salida.error(f"Error al generar el gráfico de caja: {e}")
+                        salida.write("Valores únicos en 'accommodates':", plot_data_filtered["accommodates"].unique())
+                else:
+                    salida.warning("No hay valores de capacidad con suficientes datos para mostrar el gráfico.")
+            else:
+                salida.warning("No hay datos suficientes para mostrar el gráfico.")
+        else:
+            salida.info("Faltan las columnas 'accommodates' o 'price'.")        
+
+
+        if "beds" in filtered_data.columns and "price" in filtered_data.columns:
+            plot_data = filtered_data.dropna(subset=["beds", "price"]).copy()
+            if len(plot_data) > 0:
+                # Limitar el número de camas a un máximo razonable (por ejemplo, 10) y agrupar valores mayores
+                plot_data["beds"] = plot_data["beds"].clip(upper=10)
+                # Filtrar valores con suficientes datos (mínimo 5 puntos)
+                min_points = 5
+                category_counts = plot_data["beds"].value_counts()
+                valid_beds = category_counts[category_counts >= min_points].index.tolist()
+                plot_data_filtered = plot_data[plot_data["beds"].isin(valid_beds)]
+
+                if len(plot_data_filtered) > 0 and len(valid_beds) > 0:
+                    try:
+                        # Violines con la densidad calculada aquí (ver panel/densidad.py)
+                        fig = go.Figure(violines_kde(
+                            plot_data_filtered["beds"].to_numpy(dtype=float),
+                            plot_data_filtered["price"].to_numpy(dtype=float),
+                            limites=(0, techo),
+                        ))
+                        fig.update_layout(
+                            xaxis_title="Número de Camas",
+                            yaxis_title="Precio (€)",
+                            title=dict(text="Distribución de Precios por Número de Camas", font=dict(color="white"), x=0.5),
+                            xaxis=dict(tickmode="linear", dtick=1),  # Asegurar etiquetas enteras
+                            yaxis=dict(range=[0, techo]),  # Limitar eje Y
+                            showlegend=False
+                        )
+                        salida.plotly_chart(fig, use_container_width=True)
+                    except Exception as e:
+                        salida.error(f"Error al generar el gráfico de violín: {e}")
+                        salida.write("Valores únicos en 'beds':", plot_data_filtered["beds"].unique())
+                else:
+                    salida.warning("No hay valores de número de camas con suficientes datos para mostrar el gráfico.")
+            else:
+                salida.warning("No hay datos suficientes para mostrar el gráfico.")
+        else:
+            salida.info("Faltan las columnas 'beds' o 'price'.")
+
+
+
+        if "bathrooms" in filtered_data.columns:
+            plot_data = filtered_data.dropna(subset=["bathrooms"]).copy()
+            if len(plot_data) > 0:
+                # Limitar el número de baños a un máximo razonable (por ejemplo, 5) y agrupar valores mayores
+                plot_data["bathrooms"] = plot_data["bathrooms"].clip(upper=5)
+                # Filtrar valores con suficientes datos (mínimo 5 puntos)
+                min_points = 5
+                category_counts = plot_data["bathrooms"].value_counts()
+                valid_bathrooms = category_counts[category_counts >= min_points].index.tolist()
+                plot_data_filtered = plot_data[plot_data["bathrooms"].isin(valid_bathrooms)]
+
+                if len(plot_data_filtered) > 0 and len(valid_bathrooms) > 0:
+                    try:
+                        # Recalcular conteos después de filtrar
+                        bathrooms_counts = plot_data_filtered["bathrooms"].value_counts().sort_index()
+                        # Preparar datos para el gráfico de donut
+                        donut_data = pd.DataFrame({
+                            "Número de Baños": bathrooms_counts.index,
+                            "Conteo": bathrooms_counts.values
+                        })
+                        # Crear gráfico de donut
+                        fig = px.pie(
+                            donut_data,
+                            names="Número de Baños",
+                            values="Conteo",
+                            title="Proporción de Alojamientos por Número de Baños",
+                            hole=0.4,  # Crear el hueco para el efecto donut
+                            color_discrete_sequence=px.colors.sequential.Viridis
+                        )
+                        fig.update_traces(
+                            textinfo="percent+label",
+                            textposition="inside",
+                            showlegend=True
+                        )
+                        fig.update_layout(
+                            title=dict(text="Proporción de Alojamientos por Número de Baños", font=dict(color="white"), x=0.5),
+                            showlegend=True,
+                            margin=dict(t=100, b=50, l=50, r=50)
+                        )
+                        salida.plotly_chart(fig, use_container_width=True)
+                    except Exception as e:
+                        salida.error(f"Error al generar el gráfico de donut: {e}")
+                        salida.write("Valores únicos en 'bathrooms':", plot_data_filtered["bathrooms"].unique())
+                else:
+                    salida.warning("No hay valores de número de baños con suficientes datos para mostrar el gráfico.")
+            else:
+                salida.warning("No hay datos suficientes para mostrar el gráfico.")
+        else:
+            salida.info("La columna 'bathrooms' no está disponible.")
+
+
+def tab_anfitrion(salida, filtered_data, agregados=None):
+    """Pestaña "Características del Anfitrión". Ver `tab_geografica` para `agregados`."""
+    col1, col2 = salida.columns([1, 1])
+    with col1:
+        if "host_response_rate" in filtered_data.columns:
+            plot_data = filtered_data.dropna(subset=["host_response_rate"]).copy()
+            if len(plot_data) > 0:
+                try:
+                    # Convertir tasa de respuesta a porcentaje (si no está en 0-100)
+                    if plot_data["host_response_rate"].max() <= 1:
+                        plot_data["host_response_rate"] = plot_data["host_response_rate"] * 100
+                    # Crear rangos de tasa de respuesta
+                    bins = [0, 50, 80, 95, 100]
+                    labels = ["0-50%", "50-80%", "80-95%", "95-100%"]
+                    plot_data["response_range"] = cortar_en_rangos(plot_data["host_response_rate"], bins, labels)
+                    # Contar alojamientos por rango
+                    response_counts = plot_data["response_range"].value_counts().sort_index()
+                    # Filtrar rangos con suficientes datos (mínimo 5 puntos)
+                    min_points = 5
+                    valid_ranges = response_counts[response_counts >= min_points].index.tolist()
+                    plot_data_filtered = plot_data[plot_data["response_range"].isin(valid_ranges)]
+
+                    if len(plot_data_filtered) > 0 and len(valid_ranges) > 0:
+                        # Recalcular conteos
+                        response_counts_filtered = plot_data_filtered["response_range"].value_counts().sort_index()
+                        # Preparar datos para gráfico de dona
+                        donut_data = pd.DataFrame({
+                            "Rango": response_counts_filtered.index,
+                            "Conteo": response_counts_filtered.values
+                        })
+                        # Crear gráfico de dona
+                        fig = px.pie(
+                            donut_data,
+                            names="Rango",
+                            values="Conteo",
+                            title="Proporción de Anfitriones por Tasa de Respuesta",
+                            hole=0.4,  # Efecto dona
+                            color_discrete_sequence=["#FF5A5F", "#00A699", "#484848", "#767676"]
+                        )
+                        fig.update_traces(
+                            textinfo="percent+label",
+                            textposition="inside",
+                            textfont=dict(color="white"),
+                            hovertemplate="%{label}: %{value} anfitriones (%{percent})"
+                        )
+                        fig.update_layout(
+                            title=dict(text="Proporción de Anfitriones por Tasa de Respuesta", font=dict(color="white"), x=0.5),
+                            showlegend=True,
+                            height=500,
+                            plot_bgcolor="rgba(0,0,0,0)",
+                            paper_bgcolor="rgba(0,0,0,0)",
+                            margin=dict(t=100, b=50, l=50, r=50)
+                        )
+                        salida.plotly_chart(fig, use_container_width=True)
+                    else:
+                        salida.warning("No hay rangos de tasa de respuesta con suficientes datos (mínimo 5 puntos por rango).")
+                except Exception as e:
+                    salida.error(f"Error al generar el gráfico de dona: {str(e)}")
+                    salida.write("Estadísticas de 'host_response_rate':", plot_data["host_response_rate"].describe())
+            else:
+                salida.warning("No hay datos suficientes para mostrar el gráfico.")
+        else:
+            salida.info("La columna 'host_response_rate' no está disponible.")
+
+
+        if "host_response_time" in filtered_data.columns:
+            response_time_counts = _contar(filtered_data, "host_response_time", agregados)
+            fig = px.bar(
+                x=response_time_counts.index,
+                y=response_time_counts.values,
+                labels={"x": "Tiempo de Respuesta", "y": "Número de Anfitriones"},
+                color=response_time_counts.values,
+                color_continuous_scale=px.colors.sequential.Viridis,
+                title="Tiempo de Respuesta del Anfitrión"
+            )
+            fig.update_layout(title=dict(text="Tiempo de Respuesta del Anfitrión", font=dict(color="white"), x=0.5))
+            salida.plotly_chart(fig, use_container_width=True)
+        else:
+            salida.info("La columna 'host_response_time' no está disponible.")
+
+
+
+        if "host_age_years" in filtered_data.columns:
+            plot_data = filtered_data.dropna(subset=["host_age_years"]).copy()
+            if len(plot_data) > 0:
+                try:
+                    # Crear rangos de antigüedad
+                    bins = [0, 2, 5, 10, float("inf")]
+                    labels = ["0-2 años", "2-5 años", "5-10 años", ">10 años"]
+                    plot_data["age_range"] = cortar_en_rangos(plot_data["host_age_years"], bins, labels)
+                    # Contar alojamientos por rango
+                    age_counts = plot_data["age_range"].value_counts().sort_index()
+                    # Filtrar rangos con suficientes datos (mínimo 5 puntos)
+                    min_points = 5
+                    valid_ranges = age_counts[age_counts >= min_points].index.tolist()
+                    plot_data_filtered = plot_data[plot_data["age_range"].isin(valid_ranges)]
+
+                    if len(plot_data_filtered) > 0 and len(valid_ranges) > 0:
+                        # Recalcular conteos
+                        age_counts_filtered = plot_data_filtered["age_range"].value_counts().sort_index()
+                        # Preparar datos para gráfico de anillos
+                        ring_data = pd.DataFrame({
+                            "Rango de Antigüedad": age_counts_filtered.index,
+                            "Conteo": age_counts_filtered.values
+                        })
+                        # Crear gráfico de anillos
+                        fig = px.pie(
+                            ring_data,
+                            names="Rango de Antigüedad",
+                            values="Conteo",
+                            title="Proporción de Alojamientos por Antigüedad del Anfitrión",
+                            hole=0.5,  # Crear efecto de anillo
+                            color_discrete_sequence=["#FF5A5F", "#00A699", "#484848", "#767676"]
+                        )
+                        fig.update_traces(
+                            textinfo="percent+label",
+                            textposition="inside",
+                            textfont=dict(color="white"),
+                            hovertemplate="%{label}: %{value} alojamientos (%{percent})"
+                        )
+                        fig.update_layout(
+                            title=dict(text="Proporción de Alojamientos por Antigüedad del Anfitrión", font=dict(color="white"), x=0.5),
+                            showlegend=True,
+                            height=500,
+                            plot_bgcolor="rgba(0,0,0,0)",
+                            paper_bgcolor="rgba(0,0,0,0)",
+                            margin=dict(t=100, b=50, l=50, r=50)
+                        )
+                        salida.plotly_chart(fig, use_container_width=True)
+                    else:
+                        salida.warning("No hay rangos de antigüedad con suficientes datos para mostrar el gráfico.")
+                except Exception as e:
+                    salida.error(f"Error al generar el gráfico de anillos: {e}")
+                    salida.write("Valores únicos en 'host_age_years':", plot_data["host_age_years"].describe())
+            else:
+                salida.warning("No hay datos suficientes para mostrar el gráfico.")
+        else:
+            salida.info("La columna 'host_age_years' no está disponible.")
+
+    with col2:
+
+        if "host_acceptance_rate" in filtered_data.columns and "price" in filtered_data.columns:
+            plot_data = filtered_data.dropna(subset=["host_acceptance_rate", "price"]).copy()
+            if len(plot_data) > 0:
+                try:
+                    # Convertir tasa de aceptación a porcentaje (si no está en 0-100)
+                    if plot_data["host_acceptance_rate"].max() <= 1:
+                        plot_data["host_acceptance_rate"] = plot_data["host_acceptance_rate"] * 100
+                    # Crear rangos de tasa de aceptación
+                    bins = [0, 50, 80, 100]
+                    labels = ["0-50%", "50-80%", "80-100%"]
+                    plot_data["acceptance_range"] = cortar_en_rangos(plot_data["host_acceptance_rate"], bins, labels)
+                    # Filtrar rangos con suficientes datos (mínimo 5 puntos)
+                    min_points = 5
+                    category_counts = plot_data["acceptance_range"].value_counts()
+                    valid_ranges = category_counts[category_counts >= min_points].index.tolist()
+                    plot_data_filtered = plot_data[plot_data["acceptance_range"].isin(valid_ranges)]
+
+                    if len(plot_data_filtered) > 0 and len(valid_ranges) > 0:
+                        # Calcular mediana de precios y conteo por rango
+                        bubble_data = plot_data_filtered.groupby("acceptance_range").agg(
+                            median_price=("price", "median"),
+                            count=("price", "count")
+                        ).reset_index()
+                        # Intervalo de confianza bootstrap (95%) de cada mediana
+                        intervalos = intervalos_por_grupo(plot_data_filtered["price"], plot_data_filtered["acceptance_range"])
+                        # Normalizar tamaños de burbujas
+                        max_size = 50
+                        min_size = 10
+                        bubble_data["size"] = min_size + (bubble_data["count"] / bubble_data["count"].max()) * (max_size - min_size)
+                        # Crear gráfico de burbujas
+                        fig = go.Figure()
+                        for i, row in bubble_data.iterrows():
+                            fig.add_trace(
+                                go.Scatter(
+                                    x=[row["acceptance_range"]],
+                                    y=[row["median_price"]],
+                                    mode="markers",
+                                    marker=dict(
+                                        size=row["size"],
+                                        color=["#FF5A5F", "#00A699", "#484848"][i % 3],
+                                        opacity=0.8,
+                                        line=dict(width=1, color="#FFFFFF")
+                                    ),
+                                    error_y=barras_error(intervalos, [row["acceptance_range"]], [row["median_price"]]),
+                                    text=f"{row['acceptance_range']}: {int(row['count'])} alojamientos, Precio mediano: €{row['median_price']:.0f}"
+                                         f" (IC 95%: €{intervalos.loc[row['acceptance_range'], 'inferior']:.0f}-€{intervalos.loc[row['acceptance_range'], 'superior']:.0f})",
+                                    hoverinfo="text",
+                                    name=row["acceptance_range"]
+                                )
+                            )
+                        # Actualizar diseño
+                        fig.update_layout(
+                            xaxis_title="Tasa de Aceptación",
+                            yaxis_title="Precio Mediano (€)",
+                            title=dict(text="Relación entre Tasa de Aceptación y Precio", font=dict(color="white"), x=0.5),
+                            yaxis=dict(range=[0, max(bubble_data["median_price"].quantile(0.95) * 1.2, intervalos["superior"].max() * 1.05)]),
+                            showlegend=True,
+                            height=500,
+                            plot_bgcolor="rgba(0,0,0,0)",
+                            paper_bgcolor="rgba(0,0,0,0)",
+                            margin=dict(t=100, b=50, l=50, r=50),
+                            xaxis=dict(tickangle=0)
+                        )
+                        salida.plotly_chart(fig, use_container_width=True)
+                    else:
+                        salida.warning("No hay rangos de tasa de aceptación con suficientes datos (mínimo 5 puntos por rango).")
+                except Exception as e:
+                    salida.error(f"Error al generar el gráfico de burbujas: {str(e)}")
+                    salida.write("Estadísticas de 'host_acceptance_rate':", plot_data["host_acceptance_rate"].describe())
+                    salida.write("Estadísticas de 'price':", plot_data["price"].describe())
+            else:
+                salida.warning("No hay datos suficientes para mostrar el gráfico.")
+        else:
+            salida.info("Faltan las columnas 'host_acceptance_rate' o 'price'.")
+
+
+        if "host_listings_count" in filtered_data.columns and "price" in filtered_data.columns:
+            plot_data = filtered_data.dropna(subset=["host_listings_count", "price"]).copy()
+            if len(plot_data) > 0:
+                try:
+                    # Limitar número de listados a un máximo razonable (por ejemplo, 10)
+                    plot_data["host_listings_count"] = plot_data["host_listings_count"].clip(upper=10)
+                    # Filtrar valores con suficientes datos (mínimo 5 puntos)
+                    min_points = 5
+                    category_counts = plot_data["host_listings_count"].value_counts()
+                    valid_listings = sorted(category_counts[category_counts >= min_points].index.tolist())
+                    plot_data_filtered = plot_data[plot_data["host_listings_count"].isin(valid_listings)]
+
+                    if len(plot_data_filtered) > 0 and len(valid_listings) > 0:
+                        # Calcular mediana de precios y conteo por número de listados
+                        tile_data = plot_data_filtered.groupby("host_listings_count").agg(
+                            median_price=("price", "median"),
+                            count=("price", "count")
+                        ).reset_index()
+                        # El eje Y no es de precio: el intervalo bootstrap va en el texto emergente
+                        intervalos = intervalos_por_grupo(plot_data_filtered["price"], plot_data_filtered["host_listings_count"])
+                        # Normalizar valores para tamaños y colores
+                        tile_data["size"] = np.sqrt(tile_data["count"] / tile_data["count"].max()) * 80  # Escala ajustada
+                        # Asignar colores manualmente según precio mediano
+                        max_price = tile_data["median_price"].max()
+                        min_price = tile_data["median_price"].min()
+                        tile_data["color"] = tile_data["median_price"].apply(
+                            lambda x: (
+                                "#00A699" if x <= min_price + (max_price - min_price) / 3 else
+                                "#484848" if x <= min_price + 2 * (max_price - min_price) / 3 else
+                                "#FF5A5F"
+                            )
+                        )
+                        # Ajustar posiciones Y para evitar superposición
+                        tile_data["y_pos"] = 1 + (tile_data.index % 2) * 0.2 - 0.1  # Alternar posiciones Y
+                        # Crear gráfico de mosaico
+                        fig = go.Figure()
+                        for i, row in tile_data.iterrows():
+                            # Formato compacto del texto
+                            text = f"€{row['median_price']:.0f} ({int(row['count'])})"
+                            # Ajustar tamaño de fuente según tamaño de burbuja
+                            font_size = min(12, max(8, row['size'] / 5))
+                            fig.add_trace(
+                                go.Scatter(
+                                    x=[row["host_listings_count"]],
+                                    y=[row["y_pos"]],
+                                    mode="markers+text",
+                                    marker=dict(
+                                        size=row["size"],
+                                        color=row["color"],
+                                        opacity=0.9,
+                                        line=dict(width=1, color="#FFFFFF"),
+                                        showscale=False  # Eliminar barra de color
+                                    ),
+                                    text=[text],
+                                    textposition="middle center",
+                                    textfont=dict(color="white", size=font_size),
+                                    hoverinfo="text",
+                                    hovertext=f"{int(row['host_listings_count'])} listados: €{row['median_price']:.0f}"
+                                              f" (IC 95%: €{intervalos.loc[row['host_listings_count'], 'inferior']:.0f}-€{intervalos.loc[row['host_listings_count'], 'superior']:.0f}),"
+                                              f" {int(row['count'])} alojamientos",
+                                    showlegend=False  # Eliminar leyenda
+                                )
+                            )
+                        # Actualizar diseño
+                        fig.update_layout(
+                            xaxis_title="Número de Listados",
+                            yaxis=dict(showticklabels=False, showgrid=False, zeroline=False, range=[0.5, 1.5]),
+                            title=dict(text="Precios (mediana) por Número de Listados", font=dict(color="white"), x=0.5),
+                            xaxis=dict(
+                                tickmode="linear",
+                                dtick=1,
+                                range=[min(valid_listings)-0.7, max(valid_listings)+0.7]  # Más espacio
+                            ),
+                            height=500,
+                            plot_bgcolor="rgba(0,0,0,0)",
+                            paper_bgcolor="rgba(0,0,0,0)",
+                            margin=dict(t=100, b=50, l=50, r=50)
+                        )
+                        salida.plotly_chart(fig, use_container_width=True)
+                    else:
+                        salida.warning("No hay valores de número de listados con suficientes datos (mínimo 5 puntos por categoría).")
+                except Exception as e:
+                    salida.error(f"Error al generar el gráfico de mosaico: {str(e)}")
+                    salida.write("Estadísticas de 'host_listings_count':", plot_data["host_listings_count"].describe())
+                    salida.write("Estadísticas de 'price':", plot_data["price"].describe())
+            else:
+                salida.warning("No hay datos suficientes para mostrar el gráfico.")
+        else:
+            salida.info("Faltan las columnas 'host_listings_count' o 'price'.")
+
+
+def tab_puntuaciones(salida, filtered_data):
+    """Pestaña "Puntuación, Limpieza y Ubicación"."""
+    col1, col2 = salida.columns([1, 1])
+    with col1:
+        if "number_of_reviews" in filtered_data.columns:
+            plot_data = filtered_data.dropna(subset=["number_of_reviews"]).copy()
+            if len(plot_data) > 0:
+                try:
+                    # Crear rangos de número de reseñas
+                    bins = [0, 10, 50, 100, float("inf")]
+                    labels = ["0-10", "10-50", "50-100", ">100"]
+                    plot_data["reviews_range"] = cortar_en_rangos(plot_data["number_of_reviews"], bins, labels)
+                    # Contar alojamientos por rango
+                    reviews_counts = plot_data["reviews_range"].value_counts().sort_index()
+                    # Filtrar rangos con suficientes datos (mínimo 5 puntos)
+                    min_points = 5
+                    valid_ranges = reviews_counts[reviews_counts >= min_points].index.tolist()
+                    plot_data_filtered = plot_data[plot_data["reviews_range"].isin(valid_ranges)]
+
+                    if len(plot_data_filtered) > 0 and len(valid_ranges) > 0:
+                        # Recalcular conteos
+                        reviews_counts_filtered = plot_data_filtered["reviews_range"].value_counts().sort_index()
+                        # Preparar datos para gráfico de dona
+                        donut_data = pd.DataFrame({
+                            "Rango": reviews_counts_filtered.index,
+                            "Conteo": reviews_counts_filtered.values
+                        })
+                        # Crear gráfico de dona
+                        fig = px.pie(
+                            donut_data,
+                            names="Rango",
+                            values="Conteo",
+                            title="Proporción de Alojamientos por Número de Reseñas",
+                            hole=0.4,
+                            color_discrete_sequence=["#FF5A5F", "#00A699", "#484848", "#767676"]
+                        )
+                        fig.update_traces(
+                            textinfo="percent+label",
+                            textposition="inside",
+                            textfont=dict(color="white"),
+                            hovertemplate="%{label}: %{value} alojamientos (%{percent})"
+                        )
+                        fig.update_layout(
+                            title=dict(text="Proporción de Alojamientos por Número de Reseñas", font=dict(color="white"), x=0.5),
+                            showlegend=True,
+                            height=500,
+                            plot_bgcolor="rgba(0,0,0,0)",
+                            paper_bgcolor="rgba(0,0,0,0)",
+                            margin=dict(t=100, b=50, l=50, r=50)
+                        )
+                        salida.plotly_chart(fig, use_container_width=True)
+                    else:
+                        salida.warning("No hay rangos de número de reseñas con suficientes datos (mínimo 5 puntos por rango).")
+                except Exception as e:
+                    salida.error(f"Error al generar el gráfico de dona: {str(e)}")
+                    salida.write("Estadísticas de 'number_of_reviews':", plot_data["number_of_reviews"].describe())
+            else:
+                salida.warning("No hay datos suficientes para mostrar el gráfico.")
+        else:
+            salida.info("La columna 'number_of_reviews' no está disponible.")        
+
+
+
+        if "review_scores_rating" in filtered_data.columns and "price" in filtered_data.columns:
+            plot_data = filtered_data.dropna(subset=["review_scores_rating", "price"]).copy()
+            if len(plot_data) > 0:
+                try:
+                    # Normalizar puntuaciones si están en escala 0-5 o 0-10
+                    max_score = plot_data["review_scores_rating"].max()
+                    if max_score <= 5:
+                        plot_data["review_scores_rating"] = plot_data["review_scores_rating"] * 20
+                    elif max_score <= 10:
+                        plot_data["review_scores_rating"] = plot_data["review_scores_rating"] * 10
+                    # Crear rangos de puntuación general
+                    bins = [0, 80, 90, 100]
+                    labels = ["0-80", "80-90", "90-100"]
+                    plot_data["rating_range"] = cortar_en_rangos(plot_data["review_scores_rating"], bins, labels)
+                    # Filtrar rangos con suficientes datos (mínimo 5 puntos)
+                    min_points = 5
+                    category_counts = plot_data["rating_range"].value_counts()
+                    valid_ranges = category_counts[category_counts >= min_points].index.tolist()
+                    plot_data_filtered = plot_data[plot_data["rating_range"].isin(valid_ranges)]
+
+                    if len(plot_data_filtered) > 0 and len(valid_ranges) > 0:
+                        # Calcular mediana de precios y conteo por rango
+                        bubble_data = plot_data_filtered.groupby("rating_range").agg(
+                            median_price=("price", "median"),
+                            count=("price", "count")
+                        ).reset_index()
+                        # Intervalo de confianza bootstrap (95%) de cada mediana
+                        intervalos = intervalos_por_grupo(plot_data_filtered["price"], plot_data_filtered["rating_range"])
+                        # Normalizar tamaños de burbujas
+                        max_size = 50
+                        min_size = 10
+                        bubble_data["size"] = min_size + (bubble_data["count"] / bubble_data["count"].max()) * (max_size - min_size)
+                        # Crear gráfico de burbujas
+                        fig = go.Figure()
+                        for i, row in bubble_data.iterrows():
+                            fig.add_trace(
+                                go.Scatter(
+                                    x=[row["rating_range"]],
+                                    y=[row["median_price"]],
+                                    mode="markers",
+                                    marker=dict(
+                                        size=row["size"],
+                                        color=["#FF5A5F", "#00A699", "#484848"][i % 3],
+                                        opacity=0.8,
+                                        line=dict(width=1, color="#FFFFFF")
+                                    ),
+                                    error_y=barras_error(intervalos, [row["rating_range"]], [row["median_price"]]),
+                                    text=f"{row['rating_range']}: {int(row['count'])} alojamientos, €{row['median_price']:.0f}"
+                                         f" (IC 95%: €{intervalos.loc[row['rating_range'], 'inferior']:.0f}-€{intervalos.loc[row['rating_range'], 'superior']:.0f})",
+                                    hoverinfo="text",
+                                    showlegend=False
+                                )
+                            )
+                        # Actualizar diseño
+                        fig.update_layout(
+                            xaxis_title="Puntuación General",
+                            yaxis_title="Precio Mediano (€)",
+                            title=dict(text="Relación entre Puntuación General y Precio", font=dict(color="white"), x=0.5),
+                            yaxis=dict(range=[0, max(bubble_data["median_price"].quantile(0.95) * 1.2, intervalos["superior"].max() * 1.05)]),
+                            height=500,
+                            plot_bgcolor="rgba(0,0,0,0)",
+                            paper_bgcolor="rgba(0,0,0,0)",
+                            margin=dict(t=100, b=50, l=50, r=50)
+                        )
+                        salida.plotly_chart(fig, use_container_width=True)
+                    else:
+                        salida.warning("No hay rangos de puntuación general con suficientes datos (mínimo 5 puntos por rango).")
+                except Exception as e:
+                    salida.error(f"Error al generar el gráfico de burbujas: {str(e)}")
+                    salida.write("Estadísticas de 'review_scores_rating':", plot_data["review_scores_rating"].describe())
+            else:
+                salida.warning("No hay datos suficientes para mostrar el gráfico.")
+        else:
+            salida.info("Faltan las columnas 'review_scores_rating' o 'price'.")
+
+
+
+
+
+
+    with col2:
+
+        # Posibles nombres alternativos para las columnas
+        location_columns = [
+            "review_scores_location", "location_score", "review_location", 
+            "location_rating", "review_scores_location_score"
+        ]
+        neighbourhood_columns = ["neighbourhood", "neighborhood", "neighbourhood_cleansed", "neighborhood_cleansed"]
+
+        # Buscar columnas válidas
+        location_col = next((col for col in location_columns if col in filtered_data.columns), None)
+        neighbourhood_col = next((col for col in neighbourhood_columns if col in filtered_data.columns), None)
+
+        if location_col and neighbourhood_col:
+            plot_data = filtered_data.dropna(subset=[location_col, neighbourhood_col]).copy()
+            if len(plot_data) > 0:
+                try:
+                    # Normalizar puntuaciones si están en escala 0-5 o 0-10
+                    max_score = plot_data[location_col].max()
+                    if max_score <= 5:
+                        plot_data[location_col] = plot_data[location_col] * 20
+                    elif max_score <= 10:
+                        plot_data[location_col] = plot_data[location_col] * 10
+                    # Calcular puntuación promedio por vecindario
+                    location_scores = plot_data.groupby(neighbourhood_col)[location_col].agg(
+                        mean="mean",
+                        count="count"
+                    ).reset_index()
+                    # Filtrar vecindarios con suficientes datos (mínimo 5 puntos)
+                    min_points = 5
+                    location_scores = location_scores[location_scores["count"] >= min_points]
+                    # Ordenar por puntuación descendente y limitar a top 10
+                    location_scores = location_scores.sort_values("mean", ascending=False).head(10)
+
+                    if len(location_scores) > 0:
+                        # Crear gráfico de barras horizontales
+                        fig = px.bar(
+                            location_scores,
+                            y=neighbourhood_col,
+                            x="mean",
+                            labels={neighbourhood_col: "Vecindario", "mean": "Puntuación Promedio de Ubicación (0-100)"},
+                            title="Puntuación de Ubicación por Vecindario",
+                            color="mean",
+                            color_continuous_scale=["#00A699", "#FF5A5F"]
+                        )
+                        fig.update_layout(
+                            xaxis_title="Puntuación Promedio de Ubicación (0-100)",
+                            yaxis_title="Vecindario",
+                            title=dict(text="Puntuación de Ubicación por Vecindario", font=dict(color="white"), x=0.5),
+                            xaxis=dict(range=[0, 100]),
+                            yaxis=dict(autorange="reversed"),  # Ordenar de mayor a menor
+                            showlegend=False,
+                            height=500,
+                            plot_bgcolor="rgba(0,0,0,0)",
+                            paper_bgcolor="rgba(0,0,0,0)",
+                            margin=dict(t=100, b=50, l=50, r=50)
+                        )
+                        fig.update_traces(
+                            text=location_scores["mean"].round(1),
+                            textposition="auto",
+                            textfont=dict(color="white")
+                        )
+                        salida.plotly_chart(fig, use_container_width=True)
+                    else:
+                        salida.warning("No hay vecindarios con suficientes datos (mínimo 5 puntos por vecindario).")
+                except Exception as e:
+                    salida.error(f"Error al generar el gráfico de barras: {str(e)}")
+                    salida.write(f"Estadísticas de '{location_col}':", plot_data[location_col].describe())
+                    salida.write("Vecindarios únicos:", plot_data[neighbourhood_col].unique())
+            else:
+                salida.warning("No hay datos suficientes para mostrar el gráfico.")
+        else:
+            missing_cols = []
+            if not location_col:
+                missing_cols.append("columna de puntuación de ubicación (se intentó: " + ", ".join(location_columns) + ")")
+            if not neighbourhood_col:
+                missing_cols.append("columna de vecindario (se intentó: " + ", ".join(neighbourhood_columns) + ")")
+            salida.info(f"Faltan las siguientes columnas: {', '.join(missing_cols)}.")
+
+
+
+
+        if "review_scores_communication" in filtered_data.columns and "price" in filtered_data.columns:
+            plot_data = filtered_data.dropna(subset=["review_scores_communication", "price"]).copy()
+            if len(plot_data) > 0:
+                try:
+                    # Normalizar puntuaciones si están en escala 0-5 o 0-10
+                    max_score = plot_data["review_scores_communication"].max()
+                    if max_score <= 5:
+                        plot_data["review_scores_communication"] = plot_data["review_scores_communication"] * 20
+                    elif max_score <= 10:
+                        plot_data["review_scores_communication"] = plot_data["review_scores_communication"] * 10
+                    # Crear rangos de puntuación de comunicación
+                    bins = [0, 80, 90, 100]
+                    labels = ["0-80", "80-90", "90-100"]
+                    plot_data["comm_range"] = cortar_en_rangos(plot_data["review_scores_communication"], bins, labels)
+                    # Filtrar rangos con suficientes datos (mínimo 5 puntos)
+                    min_points = 5
+                    category_counts = plot_data["comm_range"].value_counts()
+                    valid_ranges = category_counts[category_counts >= min_points].index.tolist()
+                    plot_data_filtered = plot_data[plot_data["comm_range"].isin(valid_ranges)]
+
+                    if len(plot_data_filtered) > 0 and len(valid_ranges) > 0:
+                        # Calcular mediana de precios por rango
+                        line_data = plot_data_filtered.groupby("comm_range")["price"].median().reset_index()
+                        # Intervalo de confianza bootstrap (95%) de cada mediana
+                        intervalos = intervalos_por_grupo(plot_data_filtered["price"], plot_data_filtered["comm_range"])
+                        # Crear gráfico de líneas suavizadas
+                        fig = go.Figure()
+                        fig.add_trace(
+                            go.Scatter(
+                                x=line_data["comm_range"],
+                                y=line_data["price"],
+                                mode="lines+markers",
+                                line=dict(color="#FF5A5F", width=3, shape="spline"),
+                                marker=dict(size=10, color="#00A699", line=dict(width=1, color="#FFFFFF")),
+                                error_y=barras_error(intervalos, line_data["comm_range"], line_data["price"]),
+                                name="Precio Mediano"
+                            )
+                        )
+                        # Actualizar diseño
+                        fig.update_layout(
+                            xaxis_title="Puntuación de Comunicación",
+                            yaxis_title="Precio Mediano (€)",
+                            title=dict(text="Relación entre Puntuación de Comunicación y Precio", font=dict(color="white"), x=0.5),
+                            yaxis=dict(range=[0, max(line_data["price"].quantile(0.95) * 1.2, intervalos["superior"].max() * 1.05)]),
+                            showlegend=False,
+                            height=500,
+                            plot_bgcolor="rgba(0,0,0,0)",
+                            paper_bgcolor="rgba(0,0,0,0)",
+                            margin=dict(t=100, b=50, l=50, r=50)
+                        )
+                        salida.plotly_chart(fig, use_container_width=True)
+                    else:
+                        salida.warning("No hay rangos de puntuación de comunicación con suficientes datos (mínimo 5 puntos por rango).")
+                except Exception as e:
+                    salida.error(f"Error al generar el gráfico de líneas: {str(e)}")
+                    salida.write("Estadísticas de 'review_scores_communication':", plot_data["review_scores_communication"].describe())
+            else:
+                salida.warning("No hay datos suficientes para mostrar el gráfico.")
+        else:
+            salida.info("Faltan las columnas 'review_scores_communication' o 'price'.")        
+
+
+        if "review_scores_checkin" in filtered_data.columns:
+            plot_data = filtered_data.dropna(subset=["review_scores_checkin"]).copy()
+            if len(plot_data) > 0:
+                try:
+                    # Normalizar puntuaciones si están en escala 0-5 o 0-10
+                    max_score = plot_data["review_scores_checkin"].max()
+                    if max_score <= 5:
+                        plot_data["review_scores_checkin"] = plot_data["review_scores_checkin"] * 20
+                    elif max_score <= 10:
+                        plot_data["review_scores_checkin"] = plot_data["review_scores_checkin"] * 10
+                    # Crear rangos de puntuación de check-in
+                    bins = [0, 80, 90, 100]
+                    labels = ["0-80", "80-90", "90-100"]
+                    plot_data["checkin_range"] = cortar_en_rangos(plot_data["review_scores_checkin"], bins, labels)
+                    # Contar alojamientos por rango
+                    checkin_counts = plot_data["checkin_range"].value_counts().sort_index()
+                    # Filtrar rangos con suficientes datos (mínimo 5 puntos)
+                    min_points = 5
+                    valid_ranges = checkin_counts[checkin_counts >= min_points].index.tolist()
+                    plot_data_filtered = plot_data[plot_data["checkin_range"].isin(valid_ranges)]
+
+                    if len(plot_data_filtered) > 0 and len(valid_ranges) > 0:
+                        # Recalcular conteos
+                        checkin_counts_filtered = plot_data_filtered["checkin_range"].value_counts().sort_index()
+                        # Preparar datos para gráfico de dona
+                        donut_data = pd.DataFrame({
+                            "Rango": checkin_counts_filtered.index,
+                            "Conteo": checkin_counts_filtered.values
+                        })
+                        # Crear gráfico de dona
+                        fig = px.pie(
+                            donut_data,
+                            names="Rango",
+                            values="Conteo",
+                            title="Proporción de Alojamientos por Puntuación de Check-in",
+                            hole=0.4,
+                            color_discrete_sequence=["#FF5A5F", "#00A699", "#484848"]
+                        )
+                        fig.update_traces(
+                            textinfo="percent+label",
+                            textposition="inside",
+                            textfont=dict(color="white", size=14),
+                            hovertemplate="%{label}: %{value} alojamientos (%{percent})"
+                        )
+                        fig.update_layout(
+                            title=dict(text="Proporción de Alojamientos por Puntuación de Check-in", font=dict(color="white"), x=0.5),
+                            showlegend=True,
+                            height=500,
+                            plot_bgcolor="rgba(0,0,0,0)",
+                            paper_bgcolor="rgba(0,0,0,0)",
+                            margin=dict(t=100, b=50, l=50, r=50)
+                        )
+                        salida.plotly_chart(fig, use_container_width=True)
+                    else:
+                        salida.warning("No hay rangos de puntuación de check-in con suficientes datos (mínimo 5 puntos por rango).")
+                except Exception as e:
+                    salida.error(f"Error al generar el gráfico de dona: {str(e)}")
+                    salida.write("Estadísticas de 'review_scores_checkin':", plot_data["review_scores_checkin"].describe())
+            else:
+                salida.warning("No hay datos suficientes para mostrar el gráfico.")
+        else:
+            salida.info("La columna 'review_scores_checkin' no está disponible.")
+
+
+def mapas_temporada(salida, filtered_data, calendario):
+    """Mapas de calor de ocupación y precio por barrio y mes/semana a partir del calendario."""
+    codigos, vecindarios = pd.factorize(filtered_data["neighbourhood_cleansed"])
+    con_barrio = codigos >= 0
+    if not con_barrio.any():
+        salida.info("No hay alojamientos con barrio para el análisis de temporada.")
+        return
+    posiciones = filtered_data.index.to_numpy()[con_barrio]
+    ocupacion, precio = calendario.por_grupo_mes(posiciones, codigos[con_barrio], len(vecindarios))
+
+    col1, col2 = salida.columns([1, 1])
+    for col, valores, titulo, escala, formato in [
+        (col1, ocupacion * 100, "Ocupación por Barrio y Mes (%)", "Viridis", ".0f"),
+        (col2, precio, "Precio Medio por Barrio y Mes (€)", "Reds", ".0f"),
+    ]:
+        fig = go.Figure(go.Heatmap(
+            z=valores,
+            x=calendario.meses,
+            y=list(vecindarios),
+            colorscale=escala,
+            hovertemplate="%{y}<br>%{x}: %{z:" + formato + "}<extra></extra>",
+        ))
+        fig.update_layout(
+            title=dict(text=titulo, font=dict(color="white"), x=0.5),
+            height=max(400, 18 * len(vecindarios)),
+            xaxis=dict(tickangle=45),
+        )
+        col.plotly_chart(fig, use_container_width=True)
+
+    # Semanas de toda la ciudad (no dependen de los demás filtros), para los barrios filtrados
+    filas = [calendario.barrios.index(v) for v in vecindarios if v in calendario.barrios]
+    if filas:
+        ocupacion_semana, _ = calendario.por_barrio_semana()
+        fig = go.Figure(go.Heatmap(
+            z=ocupacion_semana[filas] * 100,
+            x=calendario.semanas,
+            y=[calendario.barrios[f] for f in filas],
+            colorscale="Viridis",
+            hovertemplate="%{y}<br>Semana del %{x}: %{z:.0f}%<extra></extra>",
+        ))
+        fig.update_layout(
+            title=dict(text="Ocupación Semanal por Barrio (toda la ciudad, %)", font=dict(color="white"), x=0.5),
+            height=max(400, 18 * len(filas)),
+        )
+        salida.plotly_chart(fig, use_container_width=True)
+
+
+def tab_temporal(salida, filtered_data, calendario=None):
+    """Pestaña "Características temporales".
+
+    Con un `Calendario` (ver panel/calendario.py) añade los mapas de temporada.
+    """
+    if "minimum_nights" in filtered_data.columns:
+        plot_data = filtered_data.dropna(subset=["minimum_nights"]).copy()
+        if len(plot_data) > 0:
+            try:
+                # Filtrar valores extremos (>365 noches)
+                plot_data = plot_data[plot_data["minimum_nights"] <= 365]
+                if len(plot_data) > 0:
+                    # Calcular mediana y moda
+                    median_nights = plot_data["minimum_nights"].median()
+                    mode_nights = plot_data["minimum_nights"].mode()[0]
+                    # Crear rangos de noches mínimas
+                    bins = [0, 2, 7, 365]
+                    labels = ["1-2 noches", "3-7 noches", ">7 noches"]
+                    plot_data["min_nights_range"] = cortar_en_rangos(plot_data["minimum_nights"], bins, labels)
+                    # Calcular porcentajes
+                    percentages = plot_data["min_nights_range"].value_counts(normalize=True) * 100
+                    # Generar output textual
+                    text_output = (
+                        f"**Distribución de Noches Mínimas Requeridas**\n\n"
+                        f"- **Mediana**: {median_nights:.0f} noches\n"
+                        f"- **Moda**: {mode_nights:.0f} noches\n"
+                        f"- **Distribución**:\n"
+                        f"  - 1-2 noches: {percentages.get('1-2 noches', 0):.1f}%\n"
+                        f"  - 3-7 noches: {percentages.get('3-7 noches', 0):.1f}%\n"
+                        f"  - >7 noches: {percentages.get('>7 noches', 0):.1f}%"
+                    )
+                    salida.markdown(text_output)
+                else:
+                    salida.warning("No hay datos válidos de noches mínimas después de filtrar valores extremos.")
+            except Exception as e:
+                salida.error(f"Error al generar el resumen: {str(e)}")
+                salida.write("Estadísticas de 'minimum_nights':", plot_data["minimum_nights"].describe())
+        else:
+            salida.warning("No hay datos suficientes para mostrar el resumen.")
+    else:
+        salida.info("La columna 'minimum_nights' no está disponible.")
+
+    if "maximum_nights" in filtered_data.columns:
+        plot_data = filtered_data.dropna(subset=["maximum_nights"]).copy()
+        if len(plot_data) > 0:
+            try:
+                # Tratar valores extremos (>1125 como "sin límite")
+                plot_data["maximum_nights"] = plot_data["maximum_nights"].clip(upper=1125)
+                # Calcular mediana y moda
+                median_nights = plot_data["maximum_nights"].median()
+                mode_nights = plot_data["maximum_nights"].mode()[0]
+                # Crear rangos de noches máximas
+                bins = [0, 30, 365, 1125]
+                labels = ["≤30 noches", "31-365 noches", ">365 noches"]
+                plot_data["max_nights_range"] = cortar_en_rangos(plot_data["maximum_nights"], bins, labels)
+                # Calcular porcentajes
+                percentages = plot_data["max_nights_range"].value_counts(normalize=True) * 100
+                # Generar output textual
+                text_output = (
+                    f"**Distribución de Noches Máximas Permitidas**\n\n"
+                    f"- **Mediana**: {median_nights:.0f} noches\n"
+                    f"- **Moda**: {mode_nights:.0f} noches\n"
+                    f"- **Distribución**:\n"
+                    f"  - ≤30 noches: {percentages.get('≤30 noches', 0):.1f}%\n"
+                    f"  - 31-365 noches: {percentages.get('31-365 noches', 0):.1f}%\n"
+                    f"  - >365 noches: {percentages.get('>365 noches', 0):.1f}%"
+                )
+                salida.markdown(text_output)
+            except Exception as e:
+                salida.error(f"Error al generar el resumen: {str(e)}")
+                salida.write("Estadísticas de 'maximum_nights':", plot_data["maximum_nights"].describe())
+        else:
+            salida.warning("No hay datos suficientes para mostrar el resumen.")
+    else:
+        salida.info("La columna 'maximum_nights' no está disponible.")
+
+
+    if "last_scraped" in filtered_data.columns:
+        plot_data = filtered_data.dropna(subset=["last_scraped"]).copy()
+        if len(plot_data) > 0:
+            try:
+                plot_data["last_scraped"] = pd.to_datetime(plot_data["last_scraped"], errors="coerce")
+                date_counts = plot_data["last_scraped"].value_counts()
+                most_common_date = date_counts.index[0].strftime("%Y-%m-%d")
+                most_common_percentage = (date_counts.iloc[0] / len(plot_data) * 100)
+                unique_dates = len(date_counts)
+                text_output = (
+                    f"**Frecuencia de Última Fecha de Recopilación**\n\n"
+                    f"- **Fecha más común**: {most_common_date} ({most_common_percentage:.1f}% de los alojamientos)\n"
+                    f"- **Fechas únicas**: {unique_dates}"
+                )
+                salida.markdown(text_output)
+            except Exception as e:
+                salida.error(f"Error al generar el resumen: {str(e)}")
+                salida.write("Valores únicos de 'last_scraped':", plot_data["last_scraped"].unique())
+        else:
+            salida.warning("No hay datos suficientes para mostrar el resumen.")
+    else:
+        salida.info("La columna 'last_scraped' no está disponible.")
+
+    if calendario is not None:
+        mapas_temporada(salida, filtered_data, calendario)
+
+
+def tab_usuarios(salida, filtered_data=None):
+    """Pestaña "Características de Usuarios"."""
+    salida.markdown('<div class="subheader">Características de Usuarios</div>', unsafe_allow_html=True)
+    col1, col2 = salida.columns([1, 1])
+
+# Columna 1: Gráficos para Resumen General y Clusters
+    with col1:
+        # Gráfico 1: Resumen General de Reseñas
+        resumen_data = pd.DataFrame({
+            "Métrica": ["Total de Reseñas", "Total de Usuarios"],
+            "Valor": [50000, 49812]
+        })
+        fig_resumen = px.bar(
+            resumen_data,
+            x="Métrica",
+            y="Valor",
+            title="Resumen General de Reseñas",
+            color="Métrica",
+            color_discrete_sequence=px.colors.sequential.Viridis,
+            text=resumen_data["Valor"].round(4)
+        )
+        fig_resumen.update_traces(textposition="auto")
+        fig_resumen.update_layout(
+            xaxis_title="Métrica",
+            yaxis_title="Valor",
+            showlegend=False,
+            title_x=0.5
+        )
+        salida.plotly_chart(fig_resumen, use_container_width=True)
+
+        # Gráfico 2: Clusters de Reseñas
+        clusters_data = pd.DataFrame({
+            "Cluster": ["Cluster 0", "Cluster 1", "Cluster 2"],
+            "Número de Reseñas": [7130, 3837, 39033],
+            "Sentimiento Promedio": [0.853, 0.720, 0.766]
+        })
+        fig_clusters = go.Figure()
+        fig_clusters.add_trace(
+            go.Bar(
+                x=clusters_data["Cluster"],
+                y=clusters_data["Número de Reseñas"],
+                name="Número de Reseñas",
+                marker_color="#FF5A5F",
+                text=clusters_data["Número de Reseñas"],
+                textposition="auto"
+            )
+        )
+        fig_clusters.add_trace(
+            go.Scatter(
+                x=clusters_data["Cluster"],
+                y=clusters_data["Sentimiento Promedio"],
+                name="Sentimiento Promedio",
+                yaxis="y2",
+                line=dict(color="#00A699", width=3),
+                mode="lines+markers",
+                marker=dict(size=8)
+            )
+        )
+        fig_clusters.update_layout(
+            title="Clusters de Reseñas",
+            xaxis_title="Cluster",
+            yaxis_title="Número de Reseñas",
+            yaxis2=dict(
+                title="Sentimiento Promedio",
+                overlaying="y",
+                side="right"
+            ),
+            height=500,
+            hovermode="x unified"
+        )
+        salida.plotly_chart(fig_clusters, use_container_width=True)
+
+# Columna 2: Gráfico para Temas y Gráficos Originales
+    with col2:
+        # Gráfico 3: Temas Identificados
+        temas_data = pd.DataFrame({
+            "Tema": ["Check-in y asistencia", "Características del alojamiento", "Experiencia general", "Valoración positiva", "Atención y espacio"],
+            "Importancia": [5, 8, 6, 10, 4]  # Valores ficticios
+        })
+        fig_temas = px.bar(
+            temas_data,
+            y="Tema",
+            x="Importancia",
+            title="Temas Identificados",
+            orientation="h",
+            color="Tema",
+            color_discrete_sequence=px.colors.sequential.Inferno,
+            text=temas_data["Importancia"]
+        )
+        fig_temas.update_traces(textposition="auto")
+        fig_temas.update_layout(
+            xaxis_title="Recurrencia",
+            yaxis_title="Tema",
+            showlegend=False,
+            title_x=0.5
+        )
+        salida.plotly_chart(fig_temas, use_container_width=True)
+
+        # Gráfico 4: Actividad y Sentimiento por Día de la Semana
+        review_data = pd.DataFrame({
+            "Día": ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"],
+            "review_id": [8257, 6485, 6278, 6228, 6607, 6539, 9606],
+            "vader_compound": [0.776859, 0.783723, 0.776271, 0.773506, 0.775032, 0.776225, 0.764861]
+        })
+        fig = make_subplots(specs=[[{"secondary_y": True}]])
+        fig.add_trace(
+            go.Bar(
+                x=review_data["Día"],
+                y=review_data["review_id"],
+                name="Número de Reseñas",
+                marker_color="#FF5A5F",
+                text=review_data["review_id"],
+                textposition="auto"
+            ),
+            secondary_y=False
+        )
+        fig.add_trace(
+            go.Scatter(
+                x=review_data["Día"],
+                y=review_data["vader_compound"],
+                name="Sentimiento Promedio",
+                line=dict(color="#00A699", width=3),
+                mode="lines+markers",
+                marker=dict(size=8)
+            ),
+            secondary_y=True
+        )
+        fig.update_layout(
+            title=dict(text="Actividad y Sentimiento por Día de la Semana", font=dict(color="white"), x=0.5),
+            xaxis_title="Día de la Semana",
+            yaxis_title="Número de Reseñas",
+            yaxis2_title="Sentimiento Promedio",
+            height=500,
+            hovermode="x unified"
+        )
+        fig.update_yaxes(title_text="Número de Reseñas", secondary_y=False)
+        fig.update_yaxes(title_text="Sentimiento Promedio", secondary_y=True)
+        salida.plotly_chart(fig, use_container_width=True)
+
+        # Gráfico 5: Evolución del Sentimiento Promedio por Mes
+        sentiment_data = pd.DataFrame({
+            "year_month": [
+                "2011-01", "2011-04", "2011-05", "2011-06", "2011-07", "2011-08", "2011-09", "2011-11", "2011-12",
+                "2012-01", "2012-02", "2012-03", "2012-05", "2012-06", "2012-07", "2012-08", "2012-09", "2012-10",
+                "2012-11", "2012-12", "2013-01", "2013-02", "2013-03", "2013-04", "2013-05", "2013-06", "2013-07",
+                "2013-08", "2013-09", "2013-10", "2013-11", "2013-12", "2014-01", "2014-02", "2014-03", "2014-04",
+                "2014-05", "2014-06", "2014-07", "2014-08", "2014-09", "2014-10", "2014-11", "2014-12", "2015-01",
+                "2015-02", "2015-03", "2015-04", "2015-05", "2015-06", "2015-07", "2015-08", "2015-09", "2015-10",
+                "2015-11", "2015-12", "2016-01", "2016-02", "2016-03", "2016-04", "2016-05", "2016-06", "2016-07",
+                "2016-08", "2016-09", "2016-10", "2016-11", "2016-12", "2017-01", "2017-02", "2017-03", "2017-04",
+                "2017-05", "2017-06", "2017-07", "2017-08", "2017-09", "2017-10", "2017-11", "2017-12", "2018-01",
+                "2018-02", "2018-03", "2018-04", "2018-05", "2018-06", "2018-07", "2018-08", "2018-09", "2018-10",
+                "2018-11", "2018-12", "2019-01", "2019-02", "2019-03", "2019-04", "2019-05", "2019-06", "2019-07",
+                "2019-08", "2019-09", "2019-10", "2019-11", "2019-12", "2020-01", "2020-02", "2020-03", "2020-04",
+                "2020-05", "2020-06", "2020-07", "2020-08", "2020-09", "2020-10", "2020-11", "2020-12", "2021-01",
+                "2021-02", "2021-03", "2021-04", "2021-05", "2021-06", "2021-07", "2021-08", "2021-09", "2021-10",
+                "2021-11", "2021-12", "2022-01", "2022-02", "2022-03", "2022-04", "2022-05", "2022-06", "2022-07",
+                "2022-08", "2022-09", "2022-10", "2022-11", "2022-12", "2023-01", "2023-02", "2023-03", "2023-04",
+                "2023-05", "2023-06", "2023-07", "2023-08", "2023-09", "2023-10", "2023-11", "2023-12", "2024-01",
+                "2024-02", "2024-03", "2024-04", "2024-05", "2024-06", "2024-07", "2024-08", "2024-09", "2024-10",
+                "2024-11", "2024-12"
+            ],
+            "vader_compound": [
+                0.930000, 0.982000, 0.895700, 0.841100, 0.897150, 0.926600, 0.925667, 0.950100, 0.950100,
+                0.929650, 0.977467, 0.968800, 0.879814, 0.954233, 0.922167, 0.930478, 0.938389, 0.958967,
+                0.955725, 0.867740, 0.868100, 0.903800, 0.884836, 0.867258, 0.894208, 0.941038, 0.928197,
+                0.933975, 0.928989, 0.920045, 0.892260, 0.857892, 0.873842, 0.890317, 0.915682, 0.931698,
+                0.904630, 0.917828, 0.895731, 0.877517, 0.908437, 0.884002, 0.920922, 0.846467, 0.880280,
+                0.886132, 0.877107, 0.884918, 0.894229, 0.877178, 0.841583, 0.874817, 0.890381, 0.879286,
+                0.889026, 0.838844, 0.845016, 0.857054, 0.870728, 0.887189, 0.874846, 0.850709, 0.842540,
+                0.840764, 0.847850, 0.839682, 0.808977, 0.811831, 0.786819, 0.816883, 0.803289, 0.819001,
+                0.793763, 0.816881, 0.786060, 0.809665, 0.808683, 0.833374, 0.808800, 0.772921, 0.795341,
+                0.788197, 0.780953, 0.786639, 0.795594, 0.824602, 0.794505, 0.793590, 0.800579, 0.813679,
+                0.791136, 0.759824, 0.749889, 0.763619, 0.770189, 0.767264, 0.786655, 0.785676, 0.796091,
+                0.788698, 0.797587, 0.782660, 0.765938, 0.778965, 0.774635, 0.768214, 0.730183, 0.688162,
+                0.670969, 0.652791, 0.720687, 0.650906, 0.678824, 0.688786, 0.732879, 0.660308, 0.700060,
+                0.620922, 0.747775, 0.721271, 0.745978, 0.742302, 0.745000, 0.716813, 0.751618, 0.729861,
+                0.734373, 0.737536, 0.716178, 0.721339, 0.726500, 0.762065, 0.786046, 0.784476, 0.775399,
+                0.760688, 0.761779, 0.750654, 0.733250, 0.735556, 0.726192, 0.726420, 0.747397, 0.753837,
+                0.767235, 0.764159, 0.770953, 0.736370, 0.773050, 0.765165, 0.749125, 0.720443, 0.730310,
+                0.742275, 0.738527, 0.761762, 0.769454, 0.762163, 0.760203, 0.744064, 0.728979, 0.681660,
+                0.440333, 0.698543
+            ]
+        })
+        sentiment_data["year_month"] = pd.to_datetime(sentiment_data["year_month"], format="%Y-%m")
+        fig = px.line(
+            sentiment_data,
+            x="year_month",
+            y="vader_compound",
+            labels={"year_month": "Fecha", "vader_compound": "Sentimiento Promedio (VADER)"},
+            title="Evolución del Sentimiento Promedio por Mes"
+        )
+        fig.update_traces(line=dict(color="#00A699", width=3))
+        fig.update_layout(
+            title=dict(text="Evolución del Sentimiento Promedio por Mes", font=dict(color="white"), x=0.5),
+            xaxis_title="Fecha",
+            yaxis_title="Sentimiento Promedio (VADER)",
+            height=500,
+            xaxis=dict(
+                tickformat="%Y-%m",
+                dtick="M12",  # Mostrar etiquetas cada 12 meses
+                tickangle=45
+            )
+        )
+        salida.plotly_chart(fig, use_container_width=True)
+
+
+def _etiqueta_alojamiento(data, posicion):
+    fila = data.iloc[posicion]
+    nombre = fila.get("name", None)
+    nombre = nombre if isinstance(nombre, str) and nombre else f"Alojamiento {posicion}"
+    return f"{nombre[:60]} · {fila['neighbourhood_cleansed']} · €{fila['price']:.0f}"
+
+
+def tab_comparables(salida, data, indice, filtered_data, max_opciones=500, similitud=None, amenidades=None):
+    """Pestaña "Comparables": alojamientos cercanos y parecidos a uno dado.
+
+    Busca en toda la ciudad (`data`, con su `IndiceEspacial`); los filtros del
+    sidebar solo acotan los alojamientos que se ofrecen como referencia. Con
+    el `IndiceSimilitud` de la ciudad, si la referencia es un alojamiento,
+    muestra además los de amenidades más parecidas, estén donde estén (con
+    su similitud exacta si se pasan las `AmenidadesParseadas`). Usa
+    widgets, así que solo funciona con `streamlit` como salida.
+    """
+    if len(indice) == 0:
+        salida.warning("No hay alojamientos con coordenadas válidas en esta ciudad.")
+        return
+
+    col1, col2 = salida.columns([2, 1])
+    with col2:
+        modo = salida.radio("Punto de referencia", ["Un alojamiento", "Unas coordenadas"], horizontal=True)
+        if modo == "Un alojamiento":
+            # Los más reseñados del filtro actual, para no enviar miles de opciones
+            orden = filtered_data["number_of_reviews"].fillna(0).to_numpy().argsort(kind="stable")[::-1]
+            opciones = filtered_data.index.to_numpy()[orden[:max_opciones]]
+            referencia = salida.selectbox(
+                "Alojamiento", opciones, format_func=lambda p: _etiqueta_alojamiento(data, p)
+            )
+            fila = data.iloc[referencia]
+            latitud, longitud = float(fila["latitude"]), float(fila["longitude"])
+            tipo = fila["room_type"]
+            plazas = float(fila["accommodates"]) if "accommodates" in data.columns else np.nan
+        else:
+            referencia = None
+            latitud = salida.number_input("Latitud", value=indice.latitud_media, format="%.5f")
+            longitud = salida.number_input("Longitud", value=indice.longitud_media, format="%.5f")
+            tipo = salida.selectbox("Tipo de habitación", sorted(data["room_type"].dropna().astype(str).unique()))
+            plazas = float(salida.number_input("Huéspedes", min_value=1, max_value=16, value=2))
+        k = salida.slider("Número de comparables", min_value=5, max_value=50, value=10)
+        mismo_tipo = salida.checkbox("Mismo tipo de habitación", value=True)
+        tolerancia = salida.slider("Diferencia máxima de huéspedes", min_value=0, max_value=4, value=1)
+
+    if np.isnan(latitud) or np.isnan(longitud):
+        salida.warning("El alojamiento seleccionado no tiene coordenadas.")
+        return
+    posiciones, distancias = indice.comparables(
+        latitud, longitud, k,
+        room_type=str(tipo) if mismo_tipo else None,
+        accommodates=plazas,
+        tolerancia_plazas=tolerancia,
+        excluir=referencia,
+    )
+    if len(posiciones) == 0:
+        salida.warning("No hay alojamientos comparables con estos criterios.")
+        return
+
+    columnas = [c for c in ["name", "neighbourhood_cleansed", "room_type", "accommodates", "price", "review_scores_rating"] if c in data.columns]
+    comparables = data.iloc[posiciones][columnas].copy()
+    comparables["distancia_km"] = distancias
+
+    with col1:
+        fig = go.Figure()
+        fig.add_trace(TrazaMapa(
+            lat=data["latitude"].to_numpy()[posiciones],
+            lon=data["longitude"].to_numpy()[posiciones],
+            mode="markers",
+            marker=dict(size=12, color=comparables["price"], colorscale="Viridis", colorbar=dict(title="Precio (€)")),
+            text=[_etiqueta_alojamiento(data, p) for p in posiciones],
+            hoverinfo="text",
+            name="Comparables",
+        ))
+        fig.add_trace(TrazaMapa(
+            lat=[latitud], lon=[longitud], mode="markers",
+            marker=dict(size=18, color="#FF5A5F"), name="Referencia", hoverinfo="name",
+        ))
+        fig.update_layout(
+            **{CAPA_MAPA: dict(style="open-street-map", center=dict(lat=latitud, lon=longitud), zoom=14)},
+            margin={"r": 0, "t": 0, "l": 0, "b": 0},
+            height=450,
+            showlegend=False,
+        )
+        salida.plotly_chart(fig, use_container_width=True)
+
+    precios = comparables["price"].dropna()
+    col1, col2 = salida.columns([1, 1])
+    with col1:
+        fig = px.histogram(
+            precios,
+            nbins=min(20, max(len(precios), 1)),
+            labels={"value": "Precio (€)", "count": "Alojamientos"},
+            color_discrete_sequence=["#FF5A5F"],
+        )
+        if referencia is not None and pd.notna(data.iloc[referencia]["price"]):
+            fig.add_vline(x=data.iloc[referencia]["price"], line_dash="dash", line_color="white",
+                          annotation_text="Referencia")
+        fig.update_layout(
+            showlegend=False,
+            title=dict(text="Precio de los Comparables", font=dict(color="white"), x=0.5),
+        )
+        salida.plotly_chart(fig, use_container_width=True)
+    with col2:
+        if len(precios) > 0:
+            salida.markdown(
+                f"**Mediana:** €{precios.median():.2f}  \n"
+                f"**Rango intercuartílico:** €{precios.quantile(0.25):.2f} – €{precios.quantile(0.75):.2f}  \n"
+                f"**Radio de búsqueda:** {comparables['distancia_km'].max():.2f} km"
+            )
+        if len(posiciones) < k:
+            salida.info(f"Solo se han encontrado {len(posiciones)} alojamientos que cumplan los criterios.")
+    salida.dataframe(
+        comparables.round({"distancia_km": 2}),
+        use_container_width=True,
+        hide_index=True,
+    )
+
+    if referencia is not None and similitud is not None:
+        salida.markdown("**Alojamientos con amenidades parecidas**")
+        posiciones, parecido = similitud.similares(referencia, k, amenidades)
+        if len(posiciones) == 0:
+            salida.info("No hay alojamientos con amenidades parecidas a las de este.")
+            return
+        parecidos = data.iloc[posiciones][columnas].copy()
+        parecidos["similitud_amenidades"] = parecido
+        salida.dataframe(
+            parecidos.round({"similitud_amenidades": 2}),
+            use_container_width=True,
+            hide_index=True,
+        )
+
+
+
+# Columnas que el listado muestra de entrada, si existen
+COLUMNAS_LISTADO = ["name", "neighbourhood_cleansed", "room_type", "price", "accommodates",
+                    "number_of_reviews", "review_scores_rating", "minimum_nights"]
+
+
+def tab_listado(salida, data, orden, filtered_data, ciudad=""):
+    """Pestaña "Listado": los alojamientos filtrados, ordenados y paginados en el servidor.
+
+    `orden` es el `OrdenColumnas` de la ciudad (`data`). Al final permite
+    descargar los alojamientos filtrados (ver panel/descarga.py). Usa
+    widgets, así que solo funciona con `streamlit` como salida.
+    """
+    posiciones = filtered_data.index.to_numpy()
+    columnas_ciudad = [str(c) for c in data.columns]
+    col1, col2, col3, col4 = salida.columns([3, 2, 1, 1])
+    columnas = col1.multiselect(
+        "Columnas", columnas_ciudad, default=[c for c in COLUMNAS_LISTADO if c in columnas_ciudad]
+    )
+    columna_orden = col2.selectbox("Ordenar por", ["(sin ordenar)"] + columnas_ciudad, index=0)
+    ascendente = col3.radio("Orden", ["Ascendente", "Descendente"]) == "Ascendente"
+    filas_por_pagina = col4.selectbox("Filas por página", FILAS_POR_PAGINA, index=1)
+    paginas = max(1, -(-len(posiciones) // filas_por_pagina))
+    pagina = salida.number_input(f"Página (de {paginas:,})", min_value=1, max_value=paginas, value=1) - 1
+
+    tabla = orden.pagina(
+        posiciones, None if columna_orden == "(sin ordenar)" else columna_orden, ascendente,
+        pagina, filas_por_pagina, columnas or None,
+    )
+    inicio = pagina * filas_por_pagina
+    salida.caption(f"Alojamientos {inicio + 1:,}–{inicio + len(tabla):,} de {len(posiciones):,}")
+    salida.dataframe(tabla, use_container_width=True, hide_index=True)
+
+    with salida.expander("Descargar los alojamientos filtrados"):
+        col1, col2 = salida.columns([1, 3])
+        formato = col1.radio("Formato", list(descarga.FORMATOS), horizontal=True)
+        todas = col2.checkbox(
+            "Todas las columnas (con las derivadas y las de amenidades `has_*`)", value=True,
+            help="Si no, solo las columnas elegidas para el listado.",
+        )
+        columnas_descarga = [str(c) for c in filtered_data.columns] if todas or not columnas else columnas
+        # El fichero solo se lee para el botón de descarga en la ejecución que sigue a
+        # "Preparar"; en las demás no se vuelve a cargar en memoria
+        if salida.button(f"Preparar {formato} con {len(filtered_data):,} alojamientos", disabled=len(filtered_data) == 0):
+            with salida.spinner("Escribiendo el fichero..."):
+                ruta = descarga.preparar(data, filtered_data, columnas_descarga, formato, ciudad)
+            extension, tipo = descarga.FORMATOS[formato]
+            megas = os.path.getsize(ruta) / 2 ** 20
+            if megas > descarga.MAX_MB_BOTON:
+                salida.warning(
+                    f"El fichero ocupa {megas:,.1f} MB, más de los {descarga.MAX_MB_BOTON:g} MB que se pueden "
+                    "descargar desde el panel. Prueba con Parquet, con menos columnas o con más filtros."
+                )
+            else:
+                with open(ruta, "rb") as f:
+                    salida.download_button(
+                        f"Descargar ({megas:,.1f} MB)", f,
+                        file_name=f"airbnb_{ciudad.lower() or 'seleccion'}.{extension}", mime=tipo,
+                    )
+
+
+def tab_explorar(salida, explorador, ciudad, catalogos):
+    """Pestaña "Explorar": consultas SQL de solo lectura sobre las ciudades publicadas.
+
+    `explorador` es un `panel.explorar.Explorador` (None si no está DuckDB) y
+    `catalogos` da el catálogo de columnas de una ciudad. Usa widgets, así que
+    solo funciona con `streamlit` como salida.
+    """
+    if explorador is None:
+        salida.info("Instala el paquete `duckdb` para consultar los datos con SQL.")
+        return
+
+    tablas = explorador.tablas()
+    with salida.expander("Tablas disponibles"):
+        for tabla, ciudad_tabla in tablas.items():
+            columnas = ", ".join(catalogos(ciudad_tabla)["columnas"])
+            salida.markdown(f"**{tabla}** ({ciudad_tabla}): {columnas}")
+
+    tabla = nombre_tabla(ciudad)
+    with salida.form(f"consulta_{tabla}"):
+        sql = salida.text_area(
+            "Consulta SQL (solo SELECT)",
+            value=(
+                "SELECT property_type, room_type, median(price) AS precio_mediano, count(*) AS alojamientos\n"
+                f"FROM {tabla}\nGROUP BY ALL\nORDER BY alojamientos DESC"
+            ),
+            height=150,
+        )
+        limite = salida.number_input("Máximo de filas", min_value=1, max_value=MAX_FILAS, value=1000)
+        salida.form_submit_button("Ejecutar")
+
+    try:
+        resultado = explorador.consultar(sql, int(limite))
+    except (ConsultaNoPermitida, TiempoAgotado) as e:
+        salida.warning(str(e))
+        return
+    except Exception as e:
+        salida.error(f"Error en la consulta: {e}")
+        return
+
+    tabla_resultado = resultado["tabla"]
+    salida.caption(
+        f"{tabla_resultado.num_rows:,} filas · {resultado['segundos'] * 1000:.0f} ms"
+        + (" (de la caché)" if resultado["cacheado"] else "")
+        + (f" · resultado cortado en {int(limite):,} filas" if resultado["truncada"] else "")
+    )
+    columnas = tabla_resultado.column_names
+    col1, col2, col3 = salida.columns(3)
+    grafico = col1.selectbox("Mostrar como", ["Tabla", "Barras", "Líneas", "Dispersión"])
+    if grafico == "Tabla" or len(columnas) < 2:
+        salida.dataframe(tabla_resultado, use_container_width=True, hide_index=True)
+        return
+    x = col2.selectbox("Eje X", columnas, index=0)
+    y = col3.selectbox("Eje Y", columnas, index=len(columnas) - 1)
+    # Las columnas de Arrow van directamente a la figura, sin DataFrame intermedio
+    valores_x = tabla_resultado.column(x).to_numpy(zero_copy_only=False)
+    valores_y = tabla_resultado.column(y).to_numpy(zero_copy_only=False)
+    if grafico == "Barras":
+        traza = go.Bar(x=valores_x, y=valores_y, marker_color="#FF5A5F")
+    else:
+        traza = go.Scattergl(
+            x=valores_x, y=valores_y, mode="lines+markers" if grafico == "Líneas" else "markers",
+            marker=dict(color="#FF5A5F"),
+        )
+    fig = go.Figure(traza)
+    fig.update_layout(xaxis_title=x, yaxis_title=y, height=450)
+    salida.plotly_chart(fig, use_container_width=True)
+    salida.dataframe(tabla_resultado, use_container_width=True, hide_index=True)
+
+
+# Etiqueta y formato de cada métrica del histórico
+ETIQUETAS_HISTORICO = {
+    "oferta": ("Alojamientos", "{:,.0f}"),
+    "precio_mediano": ("Precio mediano (€)", "{:,.2f}"),
+    "puntuacion_media": ("Puntuación media", "{:.3f}"),
+    "resenas": ("Reseñas", "{:,.0f}"),
+}
+
+
+def tab_historico(salida, historico):
+    """Pestaña "Histórico": variaciones entre dos instantáneas de la ciudad.
+
+    `historico` es el `panel.historico.Historico` de la ciudad. Las cifras son
+    de toda la ciudad, sin los filtros del sidebar. Usa widgets, así que solo
+    funciona con `streamlit` como salida.
+    """
+    versiones = historico.versiones
+    if len(versiones) < 2:
+        salida.info(
+            "Solo hay una instantánea de esta ciudad. Las comparaciones aparecen al publicarse un scrape nuevo "
+            "o al registrar otros con `python -m panel.historico <ciudad> <fichero.parquet>`."
+        )
+        return
+
+    etiquetas = {v["version"]: f"{v['fecha']} (versión {v['version']}, {v['filas']:,} alojamientos)" for v in versiones}
+    numeros = [v["version"] for v in versiones]
+    col1, col2 = salida.columns(2)
+    actual = col1.selectbox("Instantánea", numeros[1:][::-1], format_func=etiquetas.get)
+    # Por defecto, la inmediatamente anterior en fecha
+    anterior = col2.selectbox("Comparar con", numeros[:numeros.index(actual)][::-1], format_func=etiquetas.get)
+    comparacion = historico.comparar(anterior, actual)
+
+    metricas = [m for m in METRICAS if m in comparacion["totales"]]
+    for columna, m in zip(salida.columns(len(metricas)), metricas):
+        etiqueta, formato = ETIQUETAS_HISTORICO[m]
+        total = comparacion["totales"][m]
+        columna.metric(etiqueta, formato.format(total["actual"]), formato.replace("{:", "{:+").format(total["variacion"]))
+    movimientos = comparacion["movimientos"]
+    salida.markdown(
+        f"**Alojamientos:** {movimientos['altas']:,} nuevos · {movimientos['bajas']:,} dados de baja · "
+        f"{movimientos['cambios']:,} con cambios · {movimientos['sin_cambios']:,} sin cambios"
+    )
+
+    barrios = comparacion["barrios"]
+    metrica = salida.selectbox(
+        "Variación por barrio", metricas, format_func=lambda m: ETIQUETAS_HISTORICO[m][0]
+    )
+    variacion = barrios[f"{metrica}_variacion"].dropna().sort_values()
+    fig = go.Figure(go.Bar(
+        x=variacion.to_numpy(), y=variacion.index, orientation="h",
+        marker_color=np.where(variacion.to_numpy() >= 0, "#00A699", "#FF5A5F"),
+    ))
+    fig.update_layout(
+        xaxis_title=f"Variación de {ETIQUETAS_HISTORICO[metrica][0].lower()}",
+        height=max(400, 18 * len(variacion)),
+        margin=dict(l=0, r=0, t=30, b=0),
+    )
+    salida.plotly_chart(fig, use_container_width=True)
+    salida.dataframe(barrios.rename_axis("barrio").round(3), use_container_width=True)
+
+
+def _formatear_p(tabla):
+    tabla = tabla.copy()
+    for col in tabla.columns:
+        if col.startswith("p"):
+            tabla[col] = tabla[col].map(lambda p: "-" if pd.isna(p) else f"{p:.2e}" if p < 0.001 else f"{p:.3f}")
+    return tabla
+
+
+def tab_estadistica(salida, filtered_data):
+    """Pestaña "Contrastes Estadísticos": diferencias de precio entre grupos y correlaciones."""
+    if "price" not in filtered_data.columns or filtered_data["price"].notna().sum() < 3:
+        salida.warning("No hay datos de precio suficientes para los contrastes.")
+        return
+
+    factores, pares = {}, {}
+    if "room_type" in filtered_data.columns:
+        factores["Tipo de habitación"] = filtered_data["room_type"]
+        pares["Tipo de habitación"] = list(combinations(sorted(filtered_data["room_type"].dropna().unique()), 2))
+    factores["Vecindario"] = filtered_data["neighbourhood_cleansed"]
+    if "bedrooms" in filtered_data.columns:
+        labels = ["0", "1", "2", "3", "4", "5+"]
+        bins = [-0.5, 0.5, 1.5, 2.5, 3.5, 4.5, float("inf")]
+        factores["Dormitorios"] = cortar_en_rangos(filtered_data["bedrooms"], bins, labels)
+        pares["Dormitorios"] = list(zip(labels[:-1], labels[1:]))
+    if "review_scores_rating" in filtered_data.columns:
+        puntuacion = filtered_data["review_scores_rating"]
+        max_score = puntuacion.max()
+        if max_score <= 5:
+            puntuacion = puntuacion * 20
+        elif max_score <= 10:
+            puntuacion = puntuacion * 10
+        labels = ["0-80", "80-90", "90-100"]
+        factores["Puntuación general"] = cortar_en_rangos(puntuacion, [0, 80, 90, 100], labels)
+        pares["Puntuación general"] = list(zip(labels[:-1], labels[1:]))
+
+    kruskal, mann_whitney = contrastes_precio(filtered_data["price"].to_numpy(dtype=float), factores, pares)
+
+    salida.markdown('<div class="section-header">Diferencias de Precio entre Grupos</div>', unsafe_allow_html=True)
+    salida.markdown(
+        "Kruskal-Wallis compara el precio de todos los grupos de cada factor; ε² es el tamaño del efecto "
+        "(0 = ninguno, 1 = máximo). Mann-Whitney compara parejas de grupos; la correlación biserial de rangos "
+        "es positiva si el grupo A es más caro. Los p-valores de las parejas se ajustan por Holm."
+    )
+    col1, col2 = salida.columns([1, 1])
+    with col1:
+        salida.dataframe(_formatear_p(kruskal.round({"H": 2, "ε²": 3})), use_container_width=True, hide_index=True)
+    with col2:
+        salida.dataframe(_formatear_p(mann_whitney.round({"U": 0, "r biserial": 3})), use_container_width=True, hide_index=True)
+
+    columnas = {
+        c: filtered_data[c].to_numpy(dtype=float) for c in numeric_columns
+        if c in filtered_data.columns and filtered_data[c].notna().sum() >= 3
+    }
+    if len(columnas) >= 2:
+        matriz = spearman(columnas)
+        fig = go.Figure(go.Heatmap(
+            z=matriz.to_numpy(),
+            x=matriz.columns,
+            y=matriz.index,
+            zmin=-1,
+            zmax=1,
+            colorscale="RdBu",
+            reversescale=True,
+            text=np.round(matriz.to_numpy(), 2),
+            texttemplate="%{text}",
+            hovertemplate="%{y} - %{x}: %{z:.3f}<extra></extra>",
+        ))
+        fig.update_layout(
+            title=dict(text="Correlación de Spearman entre Variables Numéricas", font=dict(color="white"), x=0.5),
+            height=650,
+            yaxis=dict(autorange="reversed"),
+        )
+        salida.plotly_chart(fig, use_container_width=True)
+
+
+# Título de cada pestaña y función que la dibuja, en el orden del panel
+PESTANAS = [
+    ("Distribución Geográfica", tab_geografica),
+    ("Análisis de Precios", tab_precios),
+    ("Características del Alojamiento", tab_alojamiento),
+    ("Características del Anfitrión", tab_anfitrion),
+    ("Puntuación, Limpieza y Ubicación", tab_puntuaciones),
+    ("Características temporales", tab_temporal),
+    ("Características de Usuarios", tab_usuarios),
+    ("Contrastes Estadísticos", tab_estadistica),
+]
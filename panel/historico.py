@@ -0,0 +1,296 @@
+"""Histórico de instantáneas de cada ciudad con ingesta por diferencias.
+
+Cada scrape que se publica (ver panel/almacen.py) se registra como una
+versión. Cada alojamiento tiene una huella de su contenido (un hash de sus
+columnas, sin `last_scraped` ni las variables derivadas) y solo se guardan las
+filas cuya huella no estaba ya en el histórico: un alojamiento que no cambia
+entre scrapes ocupa sitio una sola vez, así que el histórico crece con los
+cambios y no con el tamaño de cada scrape.
+
+Por versión se guardan, en el directorio `<ciudad>.historico` junto al dataset:
+
+- `contenido_NNNN.arrow`: las filas nuevas de esa versión y su `_huella`;
+- `version_NNNN.npz`: `id` y huella de cada alojamiento, ordenados por `id`,
+  y los agregados por barrio y de toda la ciudad (METRICAS);
+- `huellas.npz`: el índice de las huellas guardadas, ordenadas, con la versión
+  en cuyo bloque de contenido está cada una; se actualiza al registrar, así
+  que una versión nueva no tiene que releer los bloques de las anteriores;
+- `versiones.json`: la lista de versiones, que se escribe al final y es la
+  que da por registrada una versión.
+
+Las comparaciones entre dos versiones salen de sus agregados y de los arrays
+de `id` y huellas, sin leer ninguna fila.
+
+    python -m panel.historico Barcelona listings_2024_03.parquet
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from panel.preparacion import derived_columns
+
+# Columnas que cambian en cada scrape aunque el alojamiento no cambie
+COLUMNAS_VOLATILES = ["last_scraped"] + derived_columns
+# Agregados por barrio de cada versión: nombre -> (columna, función)
+METRICAS = {
+    "oferta": ("price", "size"),
+    "precio_mediano": ("price", "median"),
+    "puntuacion_media": ("review_scores_rating", "mean"),
+    "resenas": ("number_of_reviews", "sum"),
+}
+SIN_BARRIO = "(sin barrio)"
+
+
+def ruta_para(ruta_dataset):
+    """Directorio del histórico de un dataset publicado (`ciudad.arrow` -> `ciudad.historico`)."""
+    return os.path.splitext(ruta_dataset)[0] + ".historico"
+
+
+def huellas(data):
+    """Hash (uint64) del contenido de cada fila, sin las COLUMNAS_VOLATILES."""
+    estables = [c for c in data.columns if c not in COLUMNAS_VOLATILES]
+    return pd.util.hash_pandas_object(data[estables], index=False).to_numpy(dtype=np.uint64)
+
+
+def agregar(data):
+    """Agregados de METRICAS por barrio y de toda la ciudad.
+
+    Devuelve (barrios, {métrica: array por barrio}, {métrica: total}).
+    """
+    barrio = data["neighbourhood_cleansed"].fillna(SIN_BARRIO).astype(str)
+    por_barrio, total = {}, {}
+    for nombre, (columna, funcion) in METRICAS.items():
+        if columna not in data.columns:
+            continue
+        valores = pd.to_numeric(data[columna], errors="coerce")
+        por_barrio[nombre] = valores.groupby(barrio).agg(funcion).astype(float)
+        total[nombre] = float(valores.agg(funcion))
+    barrios = sorted(barrio.unique())
+    return np.array(barrios, dtype=str), {m: v.reindex(barrios).to_numpy() for m, v in por_barrio.items()}, total
+
+
+class Historico:
+    """Versiones registradas de una ciudad, ordenadas por fecha del scrape."""
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self._agregados = {}
+
+    def _ruta(self, nombre):
+        return os.path.join(self.directorio, nombre)
+
+    @property
+    def versiones(self):
+        """Lista de dicts (version, fecha, origen, filas, filas_nuevas, registrada, resumen) por fecha."""
+        try:
+            with open(self._ruta("versiones.json")) as f:
+                versiones = json.load(f)
+        except (OSError, ValueError):
+            return []
+        return sorted(versiones, key=lambda v: (v["fecha"], v["version"]))
+
+    def __len__(self):
+        return len(self.versiones)
+
+    def _version(self, version):
+        return self._ruta(f"version_{version:04d}.npz")
+
+    def _contenido(self, version):
+        return self._ruta(f"contenido_{version:04d}.arrow")
+
+    def _miembros(self, version):
+        with np.load(self._version(version), allow_pickle=False) as f:
+            return f["ids"], f["huellas"]
+
+    def _indice(self, versiones):
+        """(huellas ordenadas, versión de cada una) de las filas guardadas de `versiones`.
+
+        Las entradas de versiones sin registrar (un registro interrumpido) no
+        cuentan. Los históricos sin índice lo reconstruyen leyendo solo la
+        columna `_huella` de cada bloque.
+        """
+        registradas = np.array([v["version"] for v in versiones], dtype=np.int64)
+        try:
+            with np.load(self._ruta("huellas.npz"), allow_pickle=False) as f:
+                firmas, en_version = f["huellas"], f["versiones"]
+        except (OSError, ValueError, KeyError):
+            partes, de_bloque = [np.array([], dtype=np.uint64)], [np.array([], dtype=np.int64)]
+            for v in registradas:
+                with pa.memory_map(self._contenido(v), "r") as fuente:
+                    partes.append(pa.ipc.open_file(fuente).read_all().column("_huella").to_numpy())
+                de_bloque.append(np.full(len(partes[-1]), v, dtype=np.int64))
+            firmas, en_version = np.concatenate(partes), np.concatenate(de_bloque)
+            orden = np.argsort(firmas, kind="stable")
+            firmas, en_version = firmas[orden], en_version[orden]
+        validas = np.isin(en_version, registradas)
+        return firmas[validas], en_version[validas]
+
+    def registrar(self, data, origen=""):
+        """Registra `data` como una versión nueva y devuelve su entrada.
+
+        Devuelve None si `data` no tiene `id` o si es idéntico a una versión ya
+        registrada (por ejemplo, al volver a publicar el mismo scrape). Las
+        filas sin un `id` numérico no se pueden seguir entre versiones y no se
+        registran.
+        """
+        if "id" not in data.columns:
+            return None
+        ids = pd.to_numeric(data["id"], errors="coerce")
+        validos = ids.notna().to_numpy()
+        if not validos.all():
+            data, ids = data[validos], ids[validos]
+        if len(data) == 0:
+            return None
+        ids = ids.to_numpy(dtype=np.int64)
+        orden = np.argsort(ids, kind="stable")
+        firmas = huellas(data)
+        resumen = hashlib.blake2b(ids[orden].tobytes() + firmas[orden].tobytes(), digest_size=16).hexdigest()
+        versiones = self.versiones
+        if any(v["resumen"] == resumen for v in versiones):
+            return None
+
+        os.makedirs(self.directorio, exist_ok=True)
+        version = max((v["version"] for v in versiones), default=0) + 1
+        guardadas, en_version = self._indice(versiones)
+        nuevas = ~np.isin(firmas, guardadas)
+        tabla = pa.Table.from_pandas(data[nuevas].assign(_huella=firmas[nuevas]), preserve_index=False)
+        temporal = f"{self._contenido(version)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with pa.OSFile(temporal, "wb") as f:
+            with pa.ipc.new_file(f, tabla.schema) as escritor:
+                escritor.write_table(tabla)
+        os.replace(temporal, self._contenido(version))
+
+        barrios, por_barrio, total = agregar(data)
+        temporal = f"{self._version(version)}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez(
+            temporal, ids=ids[orden], huellas=firmas[orden], barrios=barrios,
+            **{f"barrio_{m}": v for m, v in por_barrio.items()},
+            **{f"total_{m}": v for m, v in total.items()},
+        )
+        os.replace(temporal, self._version(version))
+
+        agregadas = np.unique(firmas[nuevas])
+        posiciones = np.searchsorted(guardadas, agregadas)
+        temporal = f"{self._ruta('huellas.npz')}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez(
+            temporal, huellas=np.insert(guardadas, posiciones, agregadas),
+            versiones=np.insert(en_version, posiciones, version),
+        )
+        os.replace(temporal, self._ruta("huellas.npz"))
+
+        fechas = pd.to_datetime(data["last_scraped"], errors="coerce") if "last_scraped" in data.columns else None
+        fecha = fechas.max() if fechas is not None and fechas.notna().any() else pd.Timestamp.now()
+        entrada = dict(
+            version=version, fecha=fecha.strftime("%Y-%m-%d"), origen=origen, filas=int(len(data)),
+            filas_nuevas=int(nuevas.sum()), registrada=time.strftime("%Y-%m-%d %H:%M:%S"), resumen=resumen,
+        )
+        temporal = f"{self._ruta('versiones.json')}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, "w") as f:
+            json.dump(versiones + [entrada], f, indent=1)
+        os.replace(temporal, self._ruta("versiones.json"))
+        return entrada
+
+    def agregados(self, version):
+        """(DataFrame de METRICAS por barrio, dict de totales) de una versión."""
+        if version not in self._agregados:
+            with np.load(self._version(version), allow_pickle=False) as f:
+                barrios = f["barrios"]
+                por_barrio = pd.DataFrame(
+                    {m: f[f"barrio_{m}"] for m in METRICAS if f"barrio_{m}" in f.files}, index=barrios
+                )
+                total = {m: float(f[f"total_{m}"]) for m in METRICAS if f"total_{m}" in f.files}
+            self._agregados[version] = (por_barrio, total)
+        return self._agregados[version]
+
+    def comparar(self, anterior, actual):
+        """Variaciones de `anterior` a `actual` a partir de sus agregados.
+
+        Devuelve un dict con "barrios" (DataFrame con `<métrica>_anterior`,
+        `<métrica>_actual` y `<métrica>_variacion` por barrio), "totales" (lo
+        mismo para toda la ciudad, como dict) y "movimientos" (alojamientos
+        que aparecen, desaparecen, cambian o siguen igual).
+        """
+        barrios_a, total_a = self.agregados(anterior)
+        barrios_b, total_b = self.agregados(actual)
+        barrios = barrios_a.join(barrios_b, how="outer", lsuffix="_anterior", rsuffix="_actual")
+        totales = {}
+        for m in METRICAS:
+            if f"{m}_anterior" not in barrios.columns:
+                continue
+            if m == "oferta":
+                # Un barrio que no está en una versión tiene 0 alojamientos, no un valor desconocido
+                barrios[[f"{m}_anterior", f"{m}_actual"]] = barrios[[f"{m}_anterior", f"{m}_actual"]].fillna(0)
+            barrios[f"{m}_variacion"] = barrios[f"{m}_actual"] - barrios[f"{m}_anterior"]
+            totales[m] = dict(anterior=total_a[m], actual=total_b[m], variacion=total_b[m] - total_a[m])
+
+        ids_a, huellas_a = self._miembros(anterior)
+        ids_b, huellas_b = self._miembros(actual)
+        _, en_a, en_b = np.intersect1d(ids_a, ids_b, return_indices=True)
+        cambiados = int((huellas_a[en_a] != huellas_b[en_b]).sum())
+        movimientos = dict(
+            altas=len(ids_b) - len(en_b), bajas=len(ids_a) - len(en_a),
+            cambios=cambiados, sin_cambios=len(en_b) - cambiados,
+        )
+        return dict(barrios=barrios, totales=totales, movimientos=movimientos)
+
+    def leer(self, version):
+        """Las filas de una versión, reconstruidas a partir de los bloques de contenido.
+
+        Cada fila conserva el `last_scraped` del primer scrape en que apareció
+        con ese contenido y no tiene las variables derivadas.
+        """
+        ids, firmas = self._miembros(version)
+        guardadas, en_version = self._indice(self.versiones)
+        partes = []
+        # Solo los bloques que tienen alguna fila de la versión
+        for v in np.unique(en_version[np.isin(guardadas, firmas)]):
+            with pa.memory_map(self._contenido(v), "r") as fuente:
+                tabla = pa.ipc.open_file(fuente).read_all()
+            en_firmas = np.isin(tabla.column("_huella").to_numpy(), firmas)
+            if en_firmas.any():
+                partes.append(tabla.filter(pa.array(en_firmas)).to_pandas())
+        data = pd.concat(partes, ignore_index=True).drop_duplicates("_huella")
+        orden = pd.Series(np.arange(len(firmas)), index=firmas)
+        data = data.iloc[np.argsort(orden.reindex(data["_huella"].to_numpy()).to_numpy(), kind="stable")]
+        return data.drop(columns=["_huella"] + [c for c in derived_columns if c in data.columns]).reset_index(drop=True)
+
+
+def abrir(ruta_dataset):
+    """El histórico de un dataset publicado (vacío si aún no tiene versiones)."""
+    return Historico(ruta_para(ruta_dataset))
+
+
+def registrar(ruta_dataset, data, origen=""):
+    """Registra `data` como versión del histórico de `ruta_dataset` (ver `Historico.registrar`)."""
+    return abrir(ruta_dataset).registrar(data, origen)
+
+
+def main():
+    from panel import almacen
+    from panel.fuentes import ciudades_urls
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("ciudad", choices=list(ciudades_urls))
+    parser.add_argument("ficheros", nargs="+", help="Parquets de scrapes de la ciudad, en cualquier orden")
+    args = parser.parse_args()
+
+    historico = abrir(almacen.ruta_dataset(args.ciudad))
+    for fichero in args.ficheros:
+        partes = [parte for parte, _ in almacen.leer_por_grupos(fichero)]
+        entrada = historico.registrar(pd.concat(partes, ignore_index=True), os.path.abspath(fichero))
+        if entrada is None:
+            print(f"{fichero}: ya registrado o sin columna id")
+        else:
+            print(f"{fichero}: versión {entrada['version']} del {entrada['fecha']}, "
+                  f"{entrada['filas_nuevas']} de {entrada['filas']} filas nuevas")
+
+
+if __name__ == "__main__":
+    main()
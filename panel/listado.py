@@ -0,0 +1,61 @@
+"""Listado paginado de alojamientos con orden en el servidor.
+
+El orden de cada columna se calcula una vez sobre toda la ciudad (una
+permutación de posiciones, con los nulos al final) y se guarda. Ordenar las
+filas filtradas es entonces quedarse con las posiciones de la permutación que
+están en el filtro, en tiempo lineal y sin volver a ordenar, y solo se
+construye el DataFrame de la página visible.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+FILAS_POR_PAGINA = [25, 50, 100, 250]
+
+
+class OrdenColumnas:
+    """Permutaciones que ordenan cada columna de una ciudad, calculadas al pedirlas."""
+
+    def __init__(self, data):
+        self.data = data
+        # columna -> (permutación ascendente, número de valores no nulos)
+        self._ordenes = {}
+        self._bloqueo = threading.Lock()
+
+    def orden(self, columna):
+        """Permutación ascendente estable de `columna` (nulos al final) y cuántos valores no son nulos."""
+        with self._bloqueo:
+            if columna in self._ordenes:
+                return self._ordenes[columna]
+        serie = self.data[columna]
+        if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+            valores = serie.to_numpy(dtype=float, na_value=np.nan)
+            validos = int((~np.isnan(valores)).sum())
+        else:
+            # Los códigos de factorize ordenados siguen el orden de los valores; -1 son nulos
+            codigos, unicos = pd.factorize(serie.astype(str).where(serie.notna()), sort=True)
+            validos = int((codigos >= 0).sum())
+            valores = np.where(codigos >= 0, codigos, len(unicos))
+        resultado = (np.argsort(valores, kind="stable"), validos)
+        with self._bloqueo:
+            self._ordenes[columna] = resultado
+        return resultado
+
+    def ordenar(self, posiciones, columna, ascendente=True):
+        """`posiciones` (de filas de la ciudad) ordenadas por `columna`, con los nulos al final."""
+        permutacion, validos = self.orden(columna)
+        en_filtro = np.zeros(len(self.data), dtype=bool)
+        en_filtro[posiciones] = True
+        no_nulos = permutacion[:validos]
+        no_nulos = no_nulos[en_filtro[no_nulos]]
+        nulos = permutacion[validos:]
+        nulos = nulos[en_filtro[nulos]]
+        return np.concatenate([no_nulos if ascendente else no_nulos[::-1], nulos])
+
+    def pagina(self, posiciones, columna, ascendente, pagina, filas_por_pagina, columnas=None):
+        """DataFrame de la página `pagina` (desde 0) de `posiciones` ordenadas por `columna`."""
+        ordenadas = self.ordenar(posiciones, columna, ascendente) if columna is not None else np.sort(posiciones)
+        inicio = pagina * filas_por_pagina
+        visibles = ordenadas[inicio:inicio + filas_por_pagina]
+        return self.data.iloc[visibles] if columnas is None else self.data.iloc[visibles][list(columnas)]
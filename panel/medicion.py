@@ -0,0 +1,31 @@
+"""Medición de tiempos por etapa del panel.
+
+Solo registra cuando la variable de entorno AIRBNB_PERFIL está activa, de modo
+que en producción el coste es una comprobación por etapa.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+# Lista de (etapa, segundos) de la ejecución en curso
+registro = []
+
+
+def perfil_activo():
+    return os.environ.get("AIRBNB_PERFIL", "") not in ("", "0")
+
+
+def reiniciar():
+    registro.clear()
+
+
+@contextmanager
+def etapa(nombre):
+    if not perfil_activo():
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registro.append((nombre, time.perf_counter() - inicio))
@@ -0,0 +1,233 @@
+"""Planificador de cálculo compartido por todas las sesiones del proceso.
+
+Streamlit ejecuta el script de cada sesión en su propio hilo: con varios
+usuarios moviendo deslizadores a la vez, todos los reruns calculan en paralelo,
+compiten por los núcleos y las páginas de los demás se quedan esperando. El
+planificador ejecuta ese trabajo en un pool acotado de hilos:
+
+- cada sesión tiene su propia cola y los hilos las atienden por turnos, así
+  que una sesión con muchos trabajos pendientes no acapara el pool;
+- un trabajo con la misma clave que otro en cola o en curso no se repite: el
+  nuevo encargo se une al primero (dos sesiones con la misma ciudad y filtros
+  calculan una sola vez);
+- cada sesión recibe un `Encargo` por trabajo; cuando una sesión pasa a otro
+  rerun abandona sus encargos y el trabajo que ya no espera nadie se cancela:
+  si está en cola se descarta y si está en curso su `Testigo` hace que se
+  detenga en el siguiente punto de control (main.py detecta el rerun nuevo
+  con internals de Streamlit 1.35; sin ellos, los encargos se abandonan al
+  terminar el rerun que los pidió);
+- los resultados terminados de los trabajos marcados con `conservar` se
+  guardan (LRU) aunque su rerun se haya abandonado, para reutilizarlos;
+- se registran la profundidad de las colas y los tiempos de espera, de
+  ejecución y de cancelación de los últimos trabajos.
+
+El número de hilos se configura con AIRBNB_TRABAJADORES (por defecto, uno por CPU).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+TRABAJADORES = int(os.environ.get("AIRBNB_TRABAJADORES", "0")) or (os.cpu_count() or 2)
+# Trabajos recientes con los que se calculan los percentiles de espera y ejecución
+MUESTRAS = 1000
+# Resultados terminados que se conservan para reutilizarlos
+MAX_RESULTADOS = 64
+
+
+class Cancelado(Exception):
+    """El trabajo se ha cancelado porque ninguna sesión espera ya su resultado."""
+
+
+class Testigo:
+    """Señal de cancelación que el trabajo consulta en sus puntos de control."""
+
+    def __init__(self):
+        self._evento = threading.Event()
+
+    def cancelar(self):
+        self._evento.set()
+
+    @property
+    def cancelado(self):
+        return self._evento.is_set()
+
+    def comprobar(self):
+        """Lanza `Cancelado` si el trabajo se ha cancelado."""
+        if self._evento.is_set():
+            raise Cancelado()
+
+
+class _Trabajo:
+    __slots__ = ("sesion", "clave", "funcion", "args", "kwargs", "futuro", "encolado",
+                 "testigo", "interesados", "conservar", "cancelado_en")
+
+    def __init__(self, sesion, clave, funcion, args, kwargs, conservar=False):
+        self.sesion = sesion
+        self.clave = clave
+        self.funcion = funcion
+        self.args = args
+        self.kwargs = kwargs
+        self.futuro = Future()
+        self.encolado = time.perf_counter()
+        self.testigo = Testigo()
+        self.interesados = 1
+        self.conservar = conservar
+        self.cancelado_en = None
+
+
+class Encargo:
+    """Interés de una ejecución en un trabajo, que puede compartir con otras."""
+
+    def __init__(self, planificador, trabajo):
+        self._planificador = planificador
+        self._trabajo = trabajo
+        self._abandonado = False
+
+    def result(self, timeout=None):
+        return self._trabajo.futuro.result(timeout)
+
+    def done(self):
+        return self._trabajo.futuro.done()
+
+    def abandonar(self):
+        """Deja de esperar el resultado; el trabajo se cancela si nadie más lo espera."""
+        if not self._abandonado:
+            self._abandonado = True
+            self._planificador._soltar(self._trabajo)
+
+
+class Planificador:
+    """Pool acotado de hilos con colas por sesión y deduplicación por clave."""
+
+    def __init__(self, trabajadores=TRABAJADORES):
+        self.trabajadores = trabajadores
+        self._condicion = threading.Condition()
+        # sesión -> deque de trabajos; el orden del dict es el turno
+        self._colas = OrderedDict()
+        # clave -> trabajos en cola o en curso
+        self._en_vuelo = {}
+        # clave -> trabajo terminado de los que se conservan, en orden de uso
+        self._resultados = OrderedDict()
+        self._en_curso = 0
+        self._completados = 0
+        self._compartidos = 0
+        self._reutilizados = 0
+        self._cancelados = 0
+        self._esperas = deque(maxlen=MUESTRAS)
+        self._duraciones = deque(maxlen=MUESTRAS)
+        self._cancelaciones = deque(maxlen=MUESTRAS)
+        for i in range(trabajadores):
+            threading.Thread(target=self._trabajar, name=f"planificador-{i}", daemon=True).start()
+
+    def enviar(self, sesion, clave, funcion, *args, conservar=False, **kwargs):
+        """Encola `funcion(testigo, *args, **kwargs)` para `sesion` y devuelve su `Encargo`.
+
+        `funcion` recibe el `Testigo` del trabajo y debe llamar a
+        `testigo.comprobar()` en sus puntos de control. Si ya hay un trabajo con
+        la misma `clave` en cola o en curso (o conservado, con `conservar`), el
+        encargo se une a él. `clave` debe identificar el resultado.
+        """
+        with self._condicion:
+            trabajo = self._resultados.get(clave)
+            if trabajo is not None:
+                self._resultados.move_to_end(clave)
+                self._reutilizados += 1
+                trabajo.interesados += 1
+                return Encargo(self, trabajo)
+            trabajo = self._en_vuelo.get(clave)
+            if trabajo is not None:
+                self._compartidos += 1
+                trabajo.interesados += 1
+                return Encargo(self, trabajo)
+            trabajo = _Trabajo(sesion, clave, funcion, args, kwargs, conservar)
+            self._en_vuelo[clave] = trabajo
+            self._colas.setdefault(sesion, deque()).append(trabajo)
+            self._condicion.notify()
+            return Encargo(self, trabajo)
+
+    def _soltar(self, trabajo):
+        with self._condicion:
+            trabajo.interesados -= 1
+            if trabajo.interesados > 0 or trabajo.futuro.done():
+                return
+            # Nadie espera ya el resultado: los nuevos encargos no deben unirse a él
+            self._cancelados += 1
+            if self._en_vuelo.get(trabajo.clave) is trabajo:
+                del self._en_vuelo[trabajo.clave]
+            cola = self._colas.get(trabajo.sesion)
+            if cola is not None and trabajo in cola:
+                cola.remove(trabajo)
+                if not cola:
+                    del self._colas[trabajo.sesion]
+                trabajo.futuro.cancel()
+                return
+            trabajo.cancelado_en = time.perf_counter()
+            trabajo.testigo.cancelar()
+
+    def _siguiente(self):
+        # Primer trabajo de la sesión a la que le toca; la sesión pasa al final del turno
+        sesion, cola = next(iter(self._colas.items()))
+        trabajo = cola.popleft()
+        del self._colas[sesion]
+        if cola:
+            self._colas[sesion] = cola
+        return trabajo
+
+    def _trabajar(self):
+        while True:
+            with self._condicion:
+                while not self._colas:
+                    self._condicion.wait()
+                trabajo = self._siguiente()
+                self._en_curso += 1
+                inicio = time.perf_counter()
+                self._esperas.append(inicio - trabajo.encolado)
+            try:
+                if trabajo.futuro.set_running_or_notify_cancel():
+                    try:
+                        resultado = trabajo.funcion(trabajo.testigo, *trabajo.args, **trabajo.kwargs)
+                    except Exception as e:
+                        trabajo.futuro.set_exception(e)
+                    else:
+                        trabajo.futuro.set_result(resultado)
+            finally:
+                fin = time.perf_counter()
+                with self._condicion:
+                    self._en_curso -= 1
+                    self._completados += 1
+                    self._duraciones.append(fin - inicio)
+                    if trabajo.cancelado_en is not None:
+                        self._cancelaciones.append(fin - trabajo.cancelado_en)
+                    if self._en_vuelo.get(trabajo.clave) is trabajo:
+                        del self._en_vuelo[trabajo.clave]
+                    if trabajo.conservar and not trabajo.futuro.cancelled() and trabajo.futuro.exception() is None:
+                        self._resultados[trabajo.clave] = trabajo
+                        if len(self._resultados) > MAX_RESULTADOS:
+                            self._resultados.popitem(last=False)
+                # Los argumentos (filas filtradas, etc.) no deben vivir con el resultado conservado
+                trabajo.funcion = trabajo.args = trabajo.kwargs = None
+
+    def estadisticas(self):
+        """Estado actual del pool y percentiles (s) de espera y ejecución recientes."""
+        with self._condicion:
+            esperas = list(self._esperas)
+            duraciones = list(self._duraciones)
+            cancelaciones = list(self._cancelaciones)
+            resultado = {
+                "trabajadores": self.trabajadores,
+                "en_curso": self._en_curso,
+                "en_cola": sum(len(cola) for cola in self._colas.values()),
+                "sesiones_en_cola": len(self._colas),
+                "completados": self._completados,
+                "compartidos": self._compartidos,
+                "reutilizados": self._reutilizados,
+                "conservados": len(self._resultados),
+                "cancelados": self._cancelados,
+            }
+        for nombre, muestras in (("espera", esperas), ("ejecucion", duraciones), ("cancelacion", cancelaciones)):
+            ordenadas = sorted(muestras)
+            for p in (50, 95):
+                resultado[f"{nombre}_p{p}"] = ordenadas[min(len(ordenadas) - 1, len(ordenadas) * p // 100)] if ordenadas else 0.0
+        return resultado
@@ -0,0 +1,247 @@
+"""Núcleos de preparación de datos que se ejecutan en cada rerun del panel.
+
+Están separados de main.py para poder medirlos y optimizarlos por separado
+(ver benchmarks/bench_kernels.py).
+"""
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Columnas sin las que el panel no puede funcionar
+required_columns = ["neighbourhood_cleansed", "room_type", "price", "number_of_reviews", "minimum_nights", "latitude", "longitude"]
+
+# Columnas numéricas que llegan como texto o con valores no válidos
+numeric_columns = [
+    "price", "latitude", "longitude", "number_of_reviews", "minimum_nights", "maximum_nights",
+    "accommodates", "bathrooms", "bedrooms", "beds", "host_listings_count", "host_total_listings_count",
+    "availability_365", "review_scores_rating", "review_scores_location", "review_scores_communication",
+    "review_scores_cleanliness", "review_scores_checkin"
+]
+
+# Tasas que llegan como texto con porcentaje ("95%")
+percent_columns = ["host_response_rate", "host_acceptance_rate"]
+
+# Columnas que añaden `variables_derivadas` y `marcar_atipicos`: se recalculan al preparar y no son datos del scrape
+derived_columns = ["host_age_years", "occupancy_rate", "price_per_person", "log_price", "price_robust_z", "price_outlier"]
+
+# Grupos en los que se comparan los precios para marcar los atípicos
+outlier_groups = ["neighbourhood_cleansed", "room_type"]
+# Puntuación z robusta a partir de la que un precio es atípico en su grupo (Iglewicz y Hoaglin)
+UMBRAL_ATIPICOS = 3.5
+# Los grupos con menos precios no tienen atípicos
+MIN_PRECIOS_GRUPO = 5
+
+# Filas de amenidades que se parsean entre dos puntos de control
+FILAS_POR_BLOQUE = 256
+
+
+def limpiar_vecindarios(data):
+    data["neighbourhood_cleansed"] = data["neighbourhood_cleansed"].astype(str).replace("nan", None)
+    return data
+
+
+def opciones_categoricas(catalogo):
+    """Opciones de los selectores de vecindario y tipo de habitación, del catálogo del dataset."""
+    columnas = catalogo["columnas"]
+    neighborhoods_options = [n for n in columnas["neighbourhood_cleansed"].get("valores") or [] if n is not None]
+    room_type_options = [str(room) for room in columnas["room_type"].get("valores") or [] if room is not None]
+    return neighborhoods_options, room_type_options
+
+
+def convertir_numericas(data, columnas=numeric_columns):
+    for col in columnas:
+        if col in data.columns:
+            data[col] = pd.to_numeric(data[col], errors="coerce")
+    return data
+
+
+def convertir_porcentajes(data, columnas=percent_columns):
+    for col in columnas:
+        if col in data.columns and data[col].dtype == object:
+            data[col] = data[col].str.rstrip("%").astype(float) / 100
+    return data
+
+
+def mascara_filtros(data, neighborhoods, room_types, price_range, min_reviews, min_nights_range):
+    """Máscara booleana de los filtros del sidebar."""
+    return (
+        (data["neighbourhood_cleansed"].isin(neighborhoods)) &
+        (data["price"].ge(price_range[0])) &
+        (data["price"].le(price_range[1])) &
+        (data["room_type"].isin(room_types)) &
+        (data["number_of_reviews"].ge(min_reviews)) &
+        (data["minimum_nights"].ge(min_nights_range[0])) &
+        (data["minimum_nights"].le(min_nights_range[1]))
+    )
+
+
+def limites_filtros(catalogo):
+    """Mínimo y máximo de cada deslizador del sidebar, del catálogo del dataset."""
+    columnas = catalogo["columnas"]
+    precio, resenas, noches = columnas["price"], columnas["number_of_reviews"], columnas["minimum_nights"]
+    return dict(
+        price_range=(
+            int(precio["min"]) if precio["min"] is not None else 0,
+            min(int(precio["max"]), 1000) if precio["max"] is not None else 1000,
+        ),
+        min_reviews=(0, int(resenas["max"]) if resenas["max"] is not None else 100),
+        min_nights_range=(
+            int(noches["min"]) if noches["min"] is not None else 1,
+            min(int(noches["max"]), 30) if noches["max"] is not None else 30,
+        ),
+    )
+
+
+def filtros_por_defecto(limites, neighborhoods_options, room_type_options):
+    """Valores iniciales de los filtros del sidebar, como argumentos de `mascara_filtros`."""
+    return dict(
+        neighborhoods=neighborhoods_options[:5] if len(neighborhoods_options) > 5 else neighborhoods_options,
+        room_types=room_type_options,
+        price_range=(limites["price_range"][0], min(limites["price_range"][1], 500)),
+        min_reviews=0,
+        min_nights_range=(1, 7),
+    )
+
+
+def variables_derivadas(filtered_data):
+    """Añade antigüedad del anfitrión, ocupación, precio por persona y log-precio."""
+    filtered_data["host_since"] = pd.to_datetime(filtered_data["host_since"], errors="coerce")
+    filtered_data["host_age_years"] = (datetime.now() - filtered_data["host_since"]).dt.days / 365
+    filtered_data["occupancy_rate"] = (365 - filtered_data["availability_365"]) / 365 if "availability_365" in filtered_data.columns else np.nan
+    filtered_data["price_per_person"] = filtered_data["price"] / filtered_data["accommodates"].replace(0, 1) if "accommodates" in filtered_data.columns else np.nan
+    filtered_data["log_price"] = np.log1p(filtered_data["price"])
+    if "last_scraped" in filtered_data.columns:
+        filtered_data["last_scraped"] = pd.to_datetime(filtered_data["last_scraped"], errors="coerce")
+    return filtered_data
+
+
+def preparar_dataset(data):
+    """Limpieza, conversión y variables derivadas de una ciudad completa.
+
+    Todo lo que se calcula aquí es por fila, así que se hace una vez al cargar
+    y no en cada rerun.
+    """
+    missing_columns = [col for col in required_columns if col not in data.columns]
+    if missing_columns:
+        raise ValueError(f"Faltan las siguientes columnas en los datos: {', '.join(missing_columns)}")
+    limpiar_vecindarios(data)
+    convertir_numericas(data)
+    convertir_porcentajes(data)
+    variables_derivadas(data)
+    return data
+
+
+def marcar_atipicos(data, umbral=UMBRAL_ATIPICOS, minimo=MIN_PRECIOS_GRUPO):
+    """Añade la puntuación z robusta del precio en su grupo y la marca de atípico.
+
+    Cada precio se compara con la mediana y la MAD de su vecindario y tipo de
+    habitación: z = 0,6745 · (precio - mediana) / MAD, o con la desviación
+    absoluta media si la MAD es 0. Necesita la ciudad completa, así que se
+    llama al publicarla y no por grupos de filas como `preparar_dataset`.
+    """
+    precio = pd.Series(data["price"].to_numpy(dtype=float, na_value=np.nan))
+    grupos = data.groupby(outlier_groups, dropna=False, sort=False).ngroup().to_numpy()
+    mediana = precio.groupby(grupos).transform("median").to_numpy()
+    desviacion = pd.Series(np.abs(precio.to_numpy() - mediana))
+    por_grupo = desviacion.groupby(grupos)
+    mad = por_grupo.transform("median").to_numpy()
+    media_absoluta = por_grupo.transform("mean").to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(
+            mad > 0, 0.6745 * (precio.to_numpy() - mediana) / mad,
+            (precio.to_numpy() - mediana) / (1.253314 * media_absoluta),
+        )
+    z[desviacion.to_numpy() == 0] = 0
+    z[precio.groupby(grupos).transform("count").to_numpy() < minimo] = np.nan
+    data["price_robust_z"] = z
+    data["price_outlier"] = np.abs(np.nan_to_num(z)) > umbral
+    return data
+
+
+def techo_precio(data):
+    """Percentil 95 del precio de los alojamientos no atípicos de `data`.
+
+    Es el límite superior de los ejes de precio; sin la marca de atípicos,
+    el de todos los precios.
+    """
+    precio = data["price"].to_numpy(dtype=float, na_value=np.nan)
+    if "price_outlier" in data.columns:
+        precio = precio[~data["price_outlier"].to_numpy(dtype=bool)]
+    return float(np.nanquantile(precio, 0.95)) if np.isfinite(precio).any() else np.nan
+
+
+def parse_amenities(amenities):
+    if isinstance(amenities, str):
+        try:
+            return eval(amenities) if amenities else []
+        except:
+            return []
+    return amenities if isinstance(amenities, list) else []
+
+
+def contar_amenidades(amenities):
+    """Counter con la frecuencia de cada amenidad en una serie de listas."""
+    all_amenities = []
+    for amenity_list in amenities:
+        if isinstance(amenity_list, list):
+            all_amenities.extend(amenity_list)
+    return Counter(all_amenities)
+
+
+def marcar_amenidades(data, amenidades, comprobar=None):
+    """Añade una columna booleana `has_<amenidad>` por cada amenidad."""
+    for amenity in amenidades:
+        if comprobar is not None:
+            comprobar()
+        data[f"has_{amenity}"] = data["amenities"].apply(lambda x: amenity in x if isinstance(x, list) else False)
+    return data
+
+
+def procesar_amenidades(data, top=10, parseadas=None, comprobar=None):
+    """Parsea `amenities`, cuenta frecuencias y marca las `top` más comunes.
+
+    `parseadas` son las listas ya parseadas de las filas de `data`, si se
+    tienen (ver `AmenidadesParseadas`). `comprobar()` se llama entre etapas
+    para poder cancelar el cálculo. Devuelve el Counter de amenidades y la
+    lista de las más comunes.
+    """
+    data["amenities"] = data["amenities"].apply(parse_amenities) if parseadas is None else parseadas
+    if comprobar is not None:
+        comprobar()
+    conteo = contar_amenidades(data["amenities"])
+    common_amenities = [item[0] for item in conteo.most_common(top)]
+    marcar_amenidades(data, common_amenities, comprobar)
+    return conteo, common_amenities
+
+
+class AmenidadesParseadas:
+    """Listas de amenidades ya parseadas de una ciudad, por posición de fila.
+
+    Se rellenan por bloques a medida que los filtros piden filas nuevas; si el
+    cálculo se cancela a medias, los bloques terminados se conservan para el
+    siguiente.
+    """
+
+    def __init__(self, amenities):
+        self._textos = amenities.to_numpy(dtype=object)
+        self._listas = np.empty(len(self._textos), dtype=object)
+        self._hechas = np.zeros(len(self._textos), dtype=bool)
+
+    def obtener(self, posiciones, comprobar=None):
+        """Array con la lista de amenidades de cada fila de `posiciones`."""
+        pendientes = posiciones[~self._hechas[posiciones]]
+        for inicio in range(0, len(pendientes), FILAS_POR_BLOQUE):
+            if comprobar is not None:
+                comprobar()
+            bloque = pendientes[inicio:inicio + FILAS_POR_BLOQUE]
+            for posicion in bloque:
+                self._listas[posicion] = parse_amenities(self._textos[posicion])
+            self._hechas[bloque] = True
+        return self._listas[posiciones]
+
+
+def cortar_en_rangos(serie, bins, labels):
+    """Asigna cada valor a su rango; los límites incluyen el valor inferior."""
+    return pd.cut(serie, bins=bins, labels=labels, include_lowest=True)
@@ -0,0 +1,148 @@
+"""Mapa de calor rasterizado en el servidor.
+
+Las coordenadas filtradas se agrupan en una rejilla fija de píxeles con
+`np.bincount` (número de alojamientos o precio medio por píxel), se colorean
+con una tabla de colores y llegan al navegador como una única imagen PNG que
+el mapa superpone. Lo que se envía y lo que cuesta dibujarlo no depende del
+número de alojamientos.
+
+Las filas de la rejilla van en la proyección de Mercator, la misma del mapa,
+para que la imagen coincida con las calles. El encuadre es el de los
+alojamientos filtrados, sin los extremos aislados. Las imágenes se guardan
+por contenido (coordenadas, pesos, encuadre y tamaño), que en el panel
+equivale a guardarlas por ciudad, filtros y encuadre.
+"""
+import base64
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+from plotly.colors import sample_colorscale, unlabel_rgb
+
+# Columna que pondera cada métrica; None cuenta alojamientos
+METRICAS_CALOR = {"Alojamientos": None, "Precio medio": "price"}
+# Píxeles de ancho de la rejilla; el alto sale de la proporción del encuadre
+ANCHO = 512
+# Fracción de alojamientos que se deja fuera del encuadre por cada lado
+CUANTIL_ENCUADRE = 0.001
+# Cuantiles de los valores por píxel que marcan los extremos de la escala de color
+CUANTILES_COLOR = (0.02, 0.98)
+MAX_ENTRADAS_CACHE = 64
+
+_cache = OrderedDict()
+# Las pestañas pueden calcularse en varios hilos a la vez (ver panel/planificador.py)
+_bloqueo_cache = threading.Lock()
+
+
+def _mercator(lat):
+    return np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+
+
+def encuadre(lat, lon, cuantil=CUANTIL_ENCUADRE, margen=0.02):
+    """(lat_min, lat_max, lon_min, lon_max) de los alojamientos, sin los extremos aislados."""
+    lat_min, lat_max = np.quantile(lat, [cuantil, 1 - cuantil])
+    lon_min, lon_max = np.quantile(lon, [cuantil, 1 - cuantil])
+    dlat, dlon = max(lat_max - lat_min, 1e-4) * margen, max(lon_max - lon_min, 1e-4) * margen
+    return float(lat_min - dlat), float(lat_max + dlat), float(lon_min - dlon), float(lon_max + dlon)
+
+
+def rasterizar(lat, lon, limites, pesos=None, ancho=ANCHO):
+    """Rejilla (alto x ancho) con el recuento, o la media de `pesos`, por píxel.
+
+    La fila 0 es la del norte. Los píxeles sin alojamientos son NaN.
+    """
+    lat_min, lat_max, lon_min, lon_max = limites
+    y_min, y_max = _mercator(lat_min), _mercator(lat_max)
+    alto = int(np.clip(round(ancho * (y_max - y_min) / np.radians(lon_max - lon_min)), 1, 2 * ancho))
+    columna = np.floor((lon - lon_min) / (lon_max - lon_min) * ancho).astype(np.int64)
+    fila = np.floor((y_max - _mercator(lat)) / (y_max - y_min) * alto).astype(np.int64)
+    dentro = (columna >= 0) & (columna < ancho) & (fila >= 0) & (fila < alto)
+    if pesos is not None:
+        dentro &= ~np.isnan(pesos)
+    celdas = fila[dentro] * ancho + columna[dentro]
+    conteo = np.bincount(celdas, minlength=alto * ancho).astype(float)
+    if pesos is None:
+        valores = conteo
+    else:
+        suma = np.bincount(celdas, weights=pesos[dentro], minlength=alto * ancho)
+        valores = np.divide(suma, conteo, out=np.zeros_like(suma), where=conteo > 0)
+    valores[conteo == 0] = np.nan
+    return valores.reshape(alto, ancho)
+
+
+def _tabla_colores(escala):
+    # 256 colores RGB de la escala de Plotly
+    return np.array([unlabel_rgb(c) for c in sample_colorscale(escala, np.linspace(0, 1, 256))], dtype=np.uint8)
+
+
+def colorear(rejilla, escala="Viridis", opacidad=0.75, cuantiles=CUANTILES_COLOR):
+    """Imagen RGBA (uint8) de la rejilla y los valores de los extremos de la escala."""
+    llenos = ~np.isnan(rejilla)
+    if not llenos.any():
+        return np.zeros(rejilla.shape + (4,), dtype=np.uint8), (0.0, 0.0)
+    minimo, maximo = np.quantile(rejilla[llenos], cuantiles)
+    if maximo <= minimo:
+        maximo = minimo + 1
+    indices = np.clip((np.nan_to_num(rejilla, nan=minimo) - minimo) / (maximo - minimo) * 255, 0, 255).astype(np.uint8)
+    imagen = np.empty(rejilla.shape + (4,), dtype=np.uint8)
+    imagen[..., :3] = _tabla_colores(escala)[indices]
+    imagen[..., 3] = np.where(llenos, int(opacidad * 255), 0)
+    return imagen, (float(minimo), float(maximo))
+
+
+def a_png(imagen):
+    """URI `data:` con la imagen RGBA en PNG."""
+    buffer = io.BytesIO()
+    Image.fromarray(imagen, "RGBA").save(buffer, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def _clave(*partes):
+    resumen = hashlib.blake2b(digest_size=16)
+    for parte in partes:
+        if isinstance(parte, np.ndarray):
+            resumen.update(np.ascontiguousarray(parte).tobytes())
+        else:
+            resumen.update(repr(parte).encode())
+    return resumen.hexdigest()
+
+
+def capa_calor(lat, lon, pesos=None, limites=None, ancho=ANCHO, escala="Viridis"):
+    """Imagen del mapa de calor lista para una capa de mapa de Plotly.
+
+    Devuelve un dict con "fuente" (el PNG como URI), "coordenadas" (las
+    esquinas NO, NE, SE, SO como [lon, lat]), "encuadre" y "rango" (los
+    valores de los extremos de la escala de color).
+    """
+    limites = encuadre(lat, lon) if limites is None else tuple(limites)
+    clave = _clave(lat, lon, pesos if pesos is not None else "conteo", limites, ancho, escala)
+    with _bloqueo_cache:
+        if clave in _cache:
+            _cache.move_to_end(clave)
+            return _cache[clave]
+    imagen, rango = colorear(rasterizar(lat, lon, limites, pesos, ancho), escala)
+    lat_min, lat_max, lon_min, lon_max = limites
+    resultado = {
+        "fuente": a_png(imagen),
+        "coordenadas": [[lon_min, lat_max], [lon_max, lat_max], [lon_max, lat_min], [lon_min, lat_min]],
+        "encuadre": limites,
+        "rango": rango,
+    }
+    with _bloqueo_cache:
+        _cache[clave] = resultado
+        if len(_cache) > MAX_ENTRADAS_CACHE:
+            _cache.popitem(last=False)
+    return resultado
+
+
+def zoom_para(limites, ancho_px=700, alto_px=500):
+    """Nivel de zoom entero que encuadra `limites`, y su centro."""
+    lat_min, lat_max, lon_min, lon_max = limites
+    centro = dict(lat=(lat_min + lat_max) / 2, lon=(lon_min + lon_max) / 2)
+    ancho = max(lon_max - lon_min, 1e-6)
+    alto = max((lat_max - lat_min) / np.cos(np.radians(centro["lat"])), 1e-6)
+    zoom = np.log2(min(360 * ancho_px / (256 * ancho), 360 * alto_px / (256 * alto)))
+    return int(np.clip(np.floor(zoom), 0, 18)), centro
@@ -0,0 +1,168 @@
+"""Alojamientos con amenidades parecidas mediante MinHash y LSH.
+
+Cada alojamiento se resume en una firma MinHash de su conjunto de amenidades,
+tomado de las listas ya parseadas de `AmenidadesParseadas` (las mismas con las
+que se filtra y se cuentan las amenidades): FIRMAS funciones hash universales
+(a·x + b mod p) sobre el código de cada amenidad y, por función, el mínimo del
+conjunto. La fracción de posiciones en que coinciden dos firmas estima la
+similitud de Jaccard de los conjuntos. Las firmas se calculan en lote al
+publicar la ciudad (la tabla de hashes es por amenidad y el mínimo por fila
+sale de `np.minimum.reduceat`) y se guardan junto al dataset con los 16 bits
+bajos de cada mínimo (b-bit MinHash).
+
+Para no comparar con toda la ciudad, las firmas se cortan en BANDAS bandas de
+FIRMAS / BANDAS valores; cada banda de 4 x 16 bits es exactamente una clave
+uint64. Dos alojamientos son candidatos si coinciden en alguna banda, lo que
+pasa casi siempre con similitudes por encima de (1 / BANDAS) ** (BANDAS / FIRMAS)
+= 0,5, y solo los candidatos se ordenan por la similitud estimada. Los mejores
+se reordenan con la similitud exacta, parseando solo sus amenidades.
+"""
+import os
+import threading
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from panel.preparacion import AmenidadesParseadas
+
+BANDAS = 16
+FIRMAS = 4 * BANDAS
+# Primo de Mersenne 2^31 - 1 de las funciones hash
+PRIMO = (1 << 31) - 1
+# Candidatos por resultado pedido que se vuelven a ordenar con la similitud exacta
+PRESELECCION = 10
+
+
+def ruta_para(ruta_dataset):
+    """Ruta de las firmas de un dataset publicado (`ciudad.arrow` -> `ciudad.similitud.npz`)."""
+    return os.path.splitext(ruta_dataset)[0] + ".similitud.npz"
+
+
+def codigos_amenidades(listas):
+    """(fila, código) de cada amenidad de cada lista de `listas`, ordenados por fila.
+
+    `listas` son listas de amenidades ya parseadas (ver `AmenidadesParseadas`);
+    los nombres se codifican de una vez con Arrow.
+    """
+    listas = pa.array(list(listas), type=pa.list_(pa.string()))
+    filas = pc.list_parent_indices(listas).to_numpy()
+    valores = pc.list_flatten(listas)
+    codificados = pc.dictionary_encode(valores)
+    codigos = codificados.indices.to_numpy(zero_copy_only=False)
+    validos = pc.fill_null(pc.not_equal(valores, ""), False).to_numpy(zero_copy_only=False)
+    return filas[validos].astype(np.int64), codigos[validos].astype(np.int64), len(codificados.dictionary)
+
+
+def firmas_minhash(filas, codigos, n_filas, n_codigos, firmas=FIRMAS, semilla=0):
+    """Firmas (n_filas x `firmas`, uint16) y máscara de las filas sin amenidades.
+
+    `filas` va ordenado, así que cada fila es un tramo contiguo de `codigos`
+    y su mínimo por función sale de un `np.minimum.reduceat`.
+    """
+    azar = np.random.default_rng(semilla)
+    a = azar.integers(1, PRIMO, size=firmas, dtype=np.uint64)
+    b = azar.integers(0, PRIMO, size=firmas, dtype=np.uint64)
+    # Hash de cada amenidad con cada función: la tabla es pequeña (amenidades x firmas)
+    tabla = ((a[None, :] * np.arange(n_codigos, dtype=np.uint64)[:, None] + b[None, :]) % PRIMO).astype(np.uint32)
+    conteo = np.bincount(filas, minlength=n_filas)
+    con_amenidades = conteo > 0
+    inicios = (np.cumsum(conteo) - conteo)[con_amenidades]
+    resultado = np.zeros((n_filas, firmas), dtype=np.uint16)
+    for i in range(firmas):
+        resultado[con_amenidades, i] = np.minimum.reduceat(tabla[:, i][codigos], inicios) & 0xFFFF
+    return resultado, ~con_amenidades
+
+
+class IndiceSimilitud:
+    """Firmas MinHash de una ciudad y sus bandas LSH ordenadas para buscar candidatos."""
+
+    def __init__(self, firmas, vacias):
+        self.firmas = firmas
+        self.vacias = vacias
+        # Cada banda (4 valores de 16 bits) como una clave uint64 por fila, y el orden que la ordena
+        self._claves = np.ascontiguousarray(firmas).view(np.uint64)
+        self._ordenes = [np.argsort(self._claves[:, i], kind="stable") for i in range(self._claves.shape[1])]
+        self._ordenadas = [self._claves[orden, i] for i, orden in enumerate(self._ordenes)]
+
+    def __len__(self):
+        return len(self.firmas)
+
+    @classmethod
+    def construir(cls, data, amenidades=None):
+        """Índice de las amenidades de `data` (vacío si no tiene la columna).
+
+        `amenidades` es el `AmenidadesParseadas` de `data`, si ya hay uno con
+        parte de las listas parseadas.
+        """
+        if "amenities" not in data.columns:
+            return cls(np.zeros((len(data), FIRMAS), dtype=np.uint16), np.ones(len(data), dtype=bool))
+        if amenidades is None:
+            amenidades = AmenidadesParseadas(data["amenities"])
+        filas, codigos, n_codigos = codigos_amenidades(amenidades.obtener(np.arange(len(data))))
+        return cls(*firmas_minhash(filas, codigos, len(data), n_codigos))
+
+    def candidatos(self, posicion):
+        """Filas que coinciden con `posicion` en alguna banda, sin ella misma."""
+        partes = []
+        for i, (orden, ordenadas) in enumerate(zip(self._ordenes, self._ordenadas)):
+            clave = self._claves[posicion, i]
+            partes.append(orden[np.searchsorted(ordenadas, clave):np.searchsorted(ordenadas, clave, side="right")])
+        candidatos = np.unique(np.concatenate(partes))
+        return candidatos[(candidatos != posicion) & ~self.vacias[candidatos]]
+
+    def similares(self, posicion, k=10, amenidades=None):
+        """Las `k` filas más parecidas a `posicion` y su similitud de Jaccard, de más a menos.
+
+        La similitud es la estimada por las firmas; con el `AmenidadesParseadas`
+        de la ciudad, los k x PRESELECCION mejores candidatos se reordenan con
+        la similitud exacta de sus conjuntos, que es la que se devuelve.
+        """
+        if self.vacias[posicion]:
+            return np.array([], dtype=np.int64), np.array([])
+        candidatos = self.candidatos(posicion)
+        similitud = (self.firmas[candidatos] == self.firmas[posicion]).mean(axis=1)
+        mejores = np.argsort(-similitud, kind="stable")[:k if amenidades is None else k * PRESELECCION]
+        candidatos, similitud = candidatos[mejores], similitud[mejores]
+        if amenidades is not None:
+            similitud = jaccard(amenidades, posicion, candidatos)
+            mejores = np.argsort(-similitud, kind="stable")[:k]
+            candidatos, similitud = candidatos[mejores], similitud[mejores]
+        return candidatos, similitud
+
+
+def jaccard(amenidades, posicion, candidatos):
+    """Similitud de Jaccard exacta entre las amenidades de `posicion` y las de cada candidato.
+
+    `amenidades` es el `AmenidadesParseadas` de la ciudad.
+    """
+    seleccion = np.concatenate([[posicion], candidatos]).astype(np.int64)
+    filas, codigos, _ = codigos_amenidades(amenidades.obtener(seleccion))
+    pertenece = np.zeros((len(candidatos) + 1, codigos.max() + 1 if len(codigos) else 1), dtype=bool)
+    pertenece[filas, codigos] = True
+    comunes = (pertenece[1:] & pertenece[0]).sum(axis=1)
+    union = (pertenece[1:] | pertenece[0]).sum(axis=1)
+    return np.divide(comunes, union, out=np.zeros(len(candidatos)), where=union > 0)
+
+
+def guardar(ruta_dataset, indice):
+    """Guarda las firmas junto a `ruta_dataset`, ligadas a su fecha de modificación."""
+    ruta = ruta_para(ruta_dataset)
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+    np.savez(temporal, firmas=indice.firmas, vacias=indice.vacias, firma=os.path.getmtime(ruta_dataset))
+    os.replace(temporal, ruta)
+    return ruta
+
+
+def cargar(ruta_dataset):
+    """El índice de `ruta_dataset`, o None si no existe o es de otra versión del fichero."""
+    ruta = ruta_para(ruta_dataset)
+    if not os.path.exists(ruta) or not os.path.exists(ruta_dataset):
+        return None
+    try:
+        with np.load(ruta, allow_pickle=False) as f:
+            if float(f["firma"]) != os.path.getmtime(ruta_dataset):
+                return None
+            return IndiceSimilitud(f["firmas"], f["vacias"])
+    except (OSError, ValueError, KeyError):
+        return None
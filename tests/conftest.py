@@ -0,0 +1,9 @@
+import pytest
+
+from benchmarks.datos_sinteticos import generar_ciudad
+
+
+@pytest.fixture(scope="session")
+def ciudad():
+    """Ciudad sintética pequeña, con la forma de los ficheros de InsideAirbnb."""
+    return generar_ciudad(3000, semilla=7, barrios=12)
@@ -0,0 +1,46 @@
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from panel import almacen, backends, catalogo
+from panel.preparacion import filtros_por_defecto, limites_filtros, opciones_categoricas, preparar_dataset
+
+
+@pytest.fixture(scope="module")
+def publicado(ciudad, tmp_path_factory):
+    data = preparar_dataset(ciudad)
+    ruta = str(tmp_path_factory.mktemp("backends") / "ciudad.arrow")
+    tabla = almacen._a_tabla(data)
+    with pa.OSFile(ruta, "wb") as f:
+        with pa.ipc.new_file(f, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+    cat = catalogo.describir(data)
+    filtros = filtros_por_defecto(limites_filtros(cat), *opciones_categoricas(cat))
+    filtros["price_range"] = (40, 300)
+    return data, ruta, filtros
+
+
+@pytest.mark.parametrize("motor", [m for m in backends.disponibles() if m != "pandas"])
+def test_agregados_como_pandas(publicado, motor):
+    data, ruta, filtros = publicado
+    backend = backends.crear(data, ruta, motor)
+    referencia = backends.BackendPandas(data)
+    assert backend.nombre == motor
+    np.testing.assert_array_equal(backend.posiciones(filtros), referencia.posiciones(filtros))
+
+    esperado = referencia.agrupar(filtros, "neighbourhood_cleansed", "price")
+    obtenido = backend.agrupar(filtros, "neighbourhood_cleansed", "price")
+    assert list(obtenido["neighbourhood_cleansed"]) == list(esperado["neighbourhood_cleansed"])
+    np.testing.assert_allclose(obtenido["price"], esperado["price"])
+    np.testing.assert_array_equal(obtenido["n"], esperado["n"])
+
+    agregados = backends.Agregados(backend, filtros)
+    filtered_data = data[referencia._mascara(filtros)]
+    for columna in ("room_type", "property_type", "host_response_time"):
+        esperado = filtered_data[columna].value_counts()
+        assert agregados.contar(columna).sort_index().equals(esperado.sort_index().astype(np.int64))
+
+    bordes = [0, 30, 90, 180, 270, 365]
+    np.testing.assert_array_equal(
+        agregados.histograma("availability_365", bordes), referencia.histograma(filtros, "availability_365", bordes)
+    )
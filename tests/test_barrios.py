@@ -0,0 +1,36 @@
+import numpy as np
+
+from benchmarks.datos_sinteticos import generar_barrios
+from panel.barrios import IndiceBarrios, _poligonos
+
+
+def _dentro_por_fuerza_bruta(x, y, geometria):
+    # Regla par-impar punto a punto sobre todos los anillos, sin rejilla
+    cruces = 0
+    for poligono in _poligonos(geometria):
+        for anillo in poligono:
+            for (x1, y1), (x2, y2) in zip(anillo[:-1], anillo[1:]):
+                if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+                    cruces += 1
+    return cruces % 2 == 1
+
+
+def test_asignar_como_fuerza_bruta(ciudad):
+    geojson = generar_barrios(ciudad, vertices_por_lado=10)
+    indice = IndiceBarrios(geojson, celdas=32)
+    rng = np.random.default_rng(6)
+    muestra = ciudad.sample(300, random_state=0)
+    # Los alojamientos y puntos al azar de toda la extensión, también fuera de la ciudad
+    lon_min, lat_min, lon_max, lat_max = indice.extension
+    latitud = np.concatenate([muestra["latitude"], rng.uniform(lat_min - 0.01, lat_max + 0.01, 300)])
+    longitud = np.concatenate([muestra["longitude"], rng.uniform(lon_min - 0.01, lon_max + 0.01, 300)])
+
+    codigos = indice.asignar(latitud, longitud)
+    esperado = np.full(len(latitud), -1)
+    for i, (lat, lon) in enumerate(zip(latitud, longitud)):
+        for b, feature in enumerate(geojson["features"]):
+            if _dentro_por_fuerza_bruta(lon, lat, feature["geometry"]):
+                esperado[i] = b
+                break
+    assert codigos.tolist() == esperado.tolist()
+    assert (codigos >= 0).any() and (codigos == -1).any()
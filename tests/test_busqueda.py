@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from panel import busqueda
+
+
+@pytest.fixture(scope="module")
+def textos(ciudad):
+    descripciones = np.array([
+        "Àtic amb terrassa i vistes", "Piscina comunitaria y parking", "<b>Cerca</b> de la playa",
+        "Terrazas soleadas con barbacoa", "Close to the beach and the old town", None,
+    ], dtype=object)
+    return ciudad[["name"]].assign(description=descripciones[np.arange(len(ciudad)) % len(descripciones)])
+
+
+def _por_fuerza_bruta(textos, consulta):
+    raices_filas = [set() for _ in range(len(textos))]
+    for columna in busqueda.COLUMNAS_TEXTO:
+        for i, palabras in enumerate(busqueda._palabras(textos[columna])):
+            raices_filas[i].update(r for r in map(busqueda.raiz, palabras) if r)
+    vocabulario = set().union(*raices_filas)
+    filas = set(range(len(textos)))
+    for r in busqueda.raices_consulta(consulta):
+        exacta = r in vocabulario
+        filas &= {i for i, raices in enumerate(raices_filas)
+                  if (r in raices if exacta else any(x.startswith(r) for x in raices))}
+    return sorted(filas)
+
+
+@pytest.mark.parametrize("consulta", [
+    "piso", "Terraza", "pisc", "playa céntrico", "ático terraza", "beach town", "vistas al mar", "zzzz",
+])
+def test_buscar_como_fuerza_bruta(textos, consulta):
+    indice = busqueda.IndiceTexto.construir(textos)
+    assert indice.buscar(consulta).tolist() == _por_fuerza_bruta(textos, consulta)
+
+
+def test_consulta_sin_palabras(textos):
+    assert busqueda.IndiceTexto.construir(textos).buscar("de la y") is None
+
+
+def test_guardar_y_cargar(tmp_path, textos):
+    dataset = tmp_path / "ciudad.arrow"
+    dataset.write_bytes(b"")
+    indice = busqueda.IndiceTexto.construir(textos)
+    busqueda.guardar(str(dataset), indice)
+    cargado = busqueda.cargar(str(dataset))
+    assert cargado.buscar("terraza").tolist() == indice.buscar("terraza").tolist()
@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+
+from panel.carga_progresiva import AgregadosParciales
+
+
+def test_figura_precios_sin_precios_validos():
+    agregados = AgregadosParciales()
+    agregados.añadir(pd.DataFrame({"price": [np.nan], "neighbourhood_cleansed": ["Centro"]}))
+    assert np.isnan(agregados.metricas()["precio_mediano"])
+    barras = agregados.figura_precios().data[0]
+    assert list(barras.y) == [0]
+
+
+def test_figura_precios_hasta_el_percentil_95(ciudad):
+    agregados = AgregadosParciales()
+    for inicio in range(0, len(ciudad), 1000):
+        agregados.añadir(ciudad.iloc[inicio:inicio + 1000])
+    precios = ciudad["price"].dropna().clip(0, 1000).astype(int)
+    barras = agregados.figura_precios(ancho=10).data[0]
+    limite = int(agregados.cuantil_precio(0.95)) + 1
+    assert sum(barras.y) == (precios < limite).sum()
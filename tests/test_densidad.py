@@ -0,0 +1,24 @@
+import numpy as np
+from scipy import stats
+
+from panel import densidad
+
+
+def test_kde_como_gaussian_kde_de_scipy():
+    rng = np.random.default_rng(3)
+    valores = np.concatenate([rng.normal(50, 10, 2000), rng.lognormal(5, 0.3, 1500)])
+    grupos = np.repeat([0, 1], [2000, 1500])
+    rejilla, curvas = densidad.kde(valores, grupos, 2, puntos=512)
+    for g in range(2):
+        x = valores[grupos == g]
+        ancho = densidad.ancho_silverman(len(x), x.std(ddof=1), np.subtract(*np.percentile(x, [75, 25])))
+        referencia = stats.gaussian_kde(x, bw_method=ancho / x.std(ddof=1))(rejilla)
+        # El binning lineal solo cambia la curva en una fracción pequeña de su máximo
+        np.testing.assert_allclose(curvas[g], referencia, atol=0.01 * referencia.max())
+
+
+def test_kde_cuenta_los_valores_fuera_de_los_limites():
+    valores = np.random.default_rng(4).normal(0, 1, 5000)
+    rejilla, curvas = densidad.kde(valores, limites=(0, 5))
+    # Solo la mitad del grupo cae en la rejilla
+    assert abs(np.trapz(curvas[0], rejilla) - 0.5) < 0.03
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from panel.espacial import RADIO_TIERRA_KM, IndiceEspacial
+
+
+@pytest.fixture(scope="module")
+def indice(ciudad):
+    return IndiceEspacial(ciudad)
+
+
+def _distancias(ciudad, indice, latitud, longitud):
+    # Misma proyección equirectangular que el índice, punto a punto
+    cos_lat = np.cos(np.radians(indice.latitud_media))
+    dx = RADIO_TIERRA_KM * np.radians(ciudad["longitude"].to_numpy() - longitud) * cos_lat
+    dy = RADIO_TIERRA_KM * np.radians(ciudad["latitude"].to_numpy() - latitud)
+    return np.hypot(dx, dy)
+
+
+@pytest.mark.parametrize("km", [0.3, 1.0, 2.5])
+def test_en_radio_como_fuerza_bruta(ciudad, indice, km):
+    latitud, longitud = 41.39, 2.17
+    esperado = np.flatnonzero(_distancias(ciudad, indice, latitud, longitud) <= km)
+    assert indice.en_radio(latitud, longitud, km).tolist() == esperado.tolist()
+
+
+def test_vecinos_como_fuerza_bruta(ciudad, indice):
+    distancias = _distancias(ciudad, indice, 41.40, 2.15)
+    posiciones, obtenidas = indice.vecinos(41.40, 2.15, 25)
+    assert posiciones.tolist() == np.argsort(distancias, kind="stable")[:25].tolist()
+    np.testing.assert_allclose(obtenidas, np.sort(distancias)[:25])
+
+
+def test_comparables_como_fuerza_bruta(ciudad, indice):
+    posicion = 10
+    latitud, longitud = ciudad["latitude"].iloc[posicion], ciudad["longitude"].iloc[posicion]
+    tipo, plazas = ciudad["room_type"].iloc[posicion], ciudad["accommodates"].iloc[posicion]
+    posiciones, _ = indice.comparables(latitud, longitud, 15, tipo, plazas, excluir=posicion)
+    distancias = _distancias(ciudad, indice, latitud, longitud)
+    validos = ((ciudad["room_type"] == tipo) & ((ciudad["accommodates"] - plazas).abs() <= 1)).to_numpy()
+    validos[posicion] = False
+    candidatos = np.flatnonzero(validos)
+    esperado = candidatos[np.argsort(distancias[candidatos], kind="stable")[:15]]
+    assert posiciones.tolist() == esperado.tolist()
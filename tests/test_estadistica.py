@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from scipy import stats
+
+from panel import estadistica
+
+
+@pytest.fixture
+def muestra():
+    rng = np.random.default_rng(1)
+    valores = rng.lognormal(4, 0.5, 900).round()
+    grupos = rng.integers(0, 3, 900)
+    valores[rng.random(900) < 0.05] = np.nan
+    return valores, grupos
+
+
+def test_intervalos_mediana_como_bootstrap_de_scipy():
+    rng = np.random.default_rng(5)
+    valores = rng.lognormal(4, 0.5, 900)
+    grupos = rng.integers(0, 3, 900)
+    valores[rng.random(900) < 0.05] = np.nan
+    mediana, inferior, superior = estadistica.intervalos_mediana(valores, grupos, 4, remuestreos=4000)
+    for g in range(3):
+        x = valores[(grupos == g) & ~np.isnan(valores)]
+        referencia = stats.bootstrap(
+            (x,), np.median, n_resamples=4000, method="percentile", random_state=0
+        ).confidence_interval
+        assert mediana[g] == np.median(x)
+        np.testing.assert_allclose([inferior[g], superior[g]], [referencia.low, referencia.high], rtol=0.01)
+    # Grupo sin valores
+    assert np.isnan([mediana[3], inferior[3], superior[3]]).all()
+
+
+def test_kruskal_wallis_como_scipy(muestra):
+    valores, grupos = muestra
+    h, p, _, n = estadistica.kruskal_wallis(estadistica.RangosColumna(valores), grupos, 3)
+    validos = ~np.isnan(valores)
+    referencia = stats.kruskal(*[valores[validos & (grupos == g)] for g in range(3)])
+    assert n == validos.sum()
+    np.testing.assert_allclose([h, p], [referencia.statistic, referencia.pvalue], rtol=1e-9)
+
+
+def test_mann_whitney_como_scipy(muestra):
+    valores, grupos = muestra
+    u, p, _, n_a, n_b = estadistica.mann_whitney(estadistica.RangosColumna(valores), grupos, 0, 2)
+    validos = ~np.isnan(valores)
+    a, b = valores[validos & (grupos == 0)], valores[validos & (grupos == 2)]
+    referencia = stats.mannwhitneyu(a, b, alternative="two-sided", method="asymptotic", use_continuity=True)
+    assert (n_a, n_b) == (len(a), len(b))
+    np.testing.assert_allclose([u, p], [referencia.statistic, referencia.pvalue], rtol=1e-9)
+
+
+def test_holm_como_el_procedimiento_por_pasos():
+    p = np.array([0.01, 0.04, np.nan, 0.03, 0.005, 0.5])
+    validos = np.flatnonzero(~np.isnan(p))
+    orden = validos[np.argsort(p[validos])]
+    esperado = np.full(len(p), np.nan)
+    anterior = 0.0
+    for i, j in enumerate(orden):
+        anterior = max(anterior, min(1.0, (len(orden) - i) * p[j]))
+        esperado[j] = anterior
+    np.testing.assert_allclose(estadistica.holm(p), esperado)
+
+
+def test_spearman_como_scipy_con_casos_completos_por_pares():
+    rng = np.random.default_rng(2)
+    x = rng.normal(size=500).round(1)
+    columnas = {
+        "x": x,
+        "y": np.where(rng.random(500) < 0.1, np.nan, x + rng.normal(size=500)).round(1),
+        "z": np.where(rng.random(500) < 0.2, np.nan, rng.integers(0, 5, 500)),
+    }
+    matriz = estadistica.spearman(columnas)
+    for a in columnas:
+        for b in columnas:
+            if a == b:
+                continue
+            validos = ~np.isnan(columnas[a]) & ~np.isnan(columnas[b])
+            referencia = stats.spearmanr(columnas[a][validos], columnas[b][validos]).statistic
+            assert matriz.loc[a, b] == pytest.approx(referencia, rel=1e-9)
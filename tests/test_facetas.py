@@ -0,0 +1,29 @@
+import numpy as np
+
+from panel.facetas import IndiceFacetas
+from panel.preparacion import mascara_filtros
+
+
+def test_conteos_como_mascaras_de_pandas(ciudad):
+    barrios = sorted(ciudad["neighbourhood_cleansed"].unique())
+    tipos = sorted(ciudad["room_type"].unique())
+    indice = IndiceFacetas(ciudad, barrios, tipos)
+    filtros = dict(
+        neighborhoods=barrios[:4], room_types=tipos[:2], price_range=(40, 300),
+        min_reviews=3, min_nights_range=(1, 7),
+    )
+    restriccion = np.random.default_rng(0).random(len(ciudad)) < 0.8
+    conteos = indice.conteos(filtros, restriccion)
+
+    assert conteos["total"] == (mascara_filtros(ciudad, **filtros).to_numpy() & restriccion).sum()
+    assert np.array_equal(indice.mascara(filtros), mascara_filtros(ciudad, **filtros).to_numpy())
+    # Cada faceta cuenta con las demás activas y la suya sin restringir
+    sin_barrio = mascara_filtros(ciudad, **{**filtros, "neighborhoods": barrios}).to_numpy() & restriccion
+    esperado = ciudad["neighbourhood_cleansed"][sin_barrio].value_counts().reindex(barrios, fill_value=0)
+    assert conteos["neighborhoods"].tolist() == esperado.tolist()
+    sin_tipo = mascara_filtros(ciudad, **{**filtros, "room_types": tipos}).to_numpy() & restriccion
+    esperado = ciudad["room_type"][sin_tipo].value_counts().reindex(tipos, fill_value=0)
+    assert conteos["room_types"].tolist() == esperado.tolist()
+    for faceta, abierto in (("price_range", (0, np.inf)), ("min_reviews", 0), ("min_nights_range", (0, np.inf))):
+        esperado = (mascara_filtros(ciudad, **{**filtros, faceta: abierto}).to_numpy() & restriccion).sum()
+        assert conteos[faceta] == esperado
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from panel.historico import Historico
+
+
+@pytest.fixture
+def scrapes(ciudad):
+    anterior = ciudad.iloc[:1000].copy()
+    actual = anterior.iloc[10:].copy()
+    actual.loc[actual.index[:7], "price"] += 25
+    nuevas = ciudad.iloc[1000:1005]
+    actual = pd.concat([actual.sample(frac=1, random_state=0), nuevas], ignore_index=True)
+    actual["last_scraped"] = "2024-09-15"
+    return anterior, actual
+
+
+def test_comparar_como_pandas(tmp_path, scrapes):
+    anterior, actual = scrapes
+    historico = Historico(str(tmp_path / "ciudad.historico"))
+    primera = historico.registrar(anterior, "marzo")
+    segunda = historico.registrar(actual, "septiembre")
+    # `last_scraped` no forma parte del contenido: solo son nuevas las cambiadas y las altas
+    assert (primera["filas_nuevas"], segunda["filas_nuevas"]) == (1000, 12)
+
+    comparacion = historico.comparar(primera["version"], segunda["version"])
+    assert comparacion["movimientos"] == dict(altas=5, bajas=10, cambios=7, sin_cambios=983)
+    totales = comparacion["totales"]
+    assert totales["oferta"]["variacion"] == -5
+    assert totales["precio_mediano"]["variacion"] == actual["price"].median() - anterior["price"].median()
+    barrios = comparacion["barrios"]
+    esperado = (actual.groupby("neighbourhood_cleansed")["price"].median()
+                - anterior.groupby("neighbourhood_cleansed")["price"].median())
+    np.testing.assert_allclose(barrios["precio_mediano_variacion"].reindex(esperado.index), esperado)
+    esperado = (actual["neighbourhood_cleansed"].value_counts()
+                .sub(anterior["neighbourhood_cleansed"].value_counts(), fill_value=0))
+    np.testing.assert_allclose(barrios["oferta_variacion"].reindex(esperado.index), esperado)
+
+
+def test_registrar_dos_veces_y_leer(tmp_path, scrapes):
+    anterior, actual = scrapes
+    historico = Historico(str(tmp_path / "ciudad.historico"))
+    historico.registrar(anterior)
+    segunda = historico.registrar(actual)
+    assert historico.registrar(actual.sample(frac=1, random_state=1)) is None
+    assert len(historico) == 2
+
+    leida = historico.leer(segunda["version"])
+    esperada = actual.sort_values("id").reset_index(drop=True)
+    assert leida["id"].tolist() == esperada["id"].tolist()
+    assert leida["price"].tolist() == esperada["price"].tolist()
+
+
+def test_indice_de_huellas(tmp_path, scrapes):
+    anterior, actual = scrapes
+    directorio = tmp_path / "ciudad.historico"
+    historico = Historico(str(directorio))
+    historico.registrar(anterior)
+    # Un histórico sin índice lo reconstruye a partir de los bloques de contenido
+    (directorio / "huellas.npz").unlink()
+    segunda = historico.registrar(actual)
+    assert segunda["filas_nuevas"] == 12
+    with np.load(directorio / "huellas.npz") as f:
+        assert len(f["huellas"]) == 1012 and np.all(f["huellas"][1:] > f["huellas"][:-1])
+        assert np.bincount(f["versiones"]).tolist() == [0, 1000, 12]
+    assert historico.leer(segunda["version"])["id"].tolist() == sorted(actual["id"])
+
+
+def test_registrar_sin_ids_nulos(tmp_path, scrapes):
+    anterior, _ = scrapes
+    con_nulos = anterior.astype({"id": float})
+    con_nulos.loc[con_nulos.index[:3], "id"] = np.nan
+    historico = Historico(str(tmp_path / "ciudad.historico"))
+    registro = historico.registrar(con_nulos)
+    assert registro["filas_nuevas"] == 997
+    assert historico.leer(registro["version"])["id"].tolist() == sorted(anterior["id"].iloc[3:])
@@ -0,0 +1,113 @@
+import threading
+import time
+from concurrent.futures import CancelledError
+
+import pytest
+
+from panel.planificador import Cancelado, Planificador
+
+
+def test_misma_clave_se_calcula_una_vez():
+    planificador = Planificador(trabajadores=2)
+    liberar, llamadas = threading.Event(), []
+
+    def trabajo(testigo, valor):
+        llamadas.append(valor)
+        liberar.wait(5)
+        return valor * 2
+
+    primero = planificador.enviar("a", "clave", trabajo, 21)
+    segundo = planificador.enviar("b", "clave", trabajo, 21)
+    liberar.set()
+    assert primero.result(5) == segundo.result(5) == 42
+    assert llamadas == [21]
+    assert planificador.estadisticas()["compartidos"] == 1
+
+
+def test_sesiones_por_turnos():
+    planificador = Planificador(trabajadores=1)
+    empezado, liberar, orden = threading.Event(), threading.Event(), []
+
+    def bloquear(testigo):
+        empezado.set()
+        liberar.wait(5)
+
+    def trabajo(testigo, nombre):
+        orden.append(nombre)
+
+    ocupado = planificador.enviar("a", "bloquear", bloquear)
+    assert empezado.wait(5)
+    encargos = [planificador.enviar(s, n, trabajo, n) for s, n in (("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1"))]
+    liberar.set()
+    ocupado.result(5)
+    for encargo in encargos:
+        encargo.result(5)
+    # La sesión "b" no espera a que "a" vacíe su cola
+    assert orden == ["a1", "b1", "a2", "a3"]
+
+
+def test_trabajo_en_curso_abandonado_se_cancela():
+    planificador = Planificador(trabajadores=1)
+    empezado = threading.Event()
+
+    def trabajo(testigo):
+        empezado.set()
+        while True:
+            testigo.comprobar()
+            time.sleep(0.01)
+
+    encargo = planificador.enviar("a", "larga", trabajo)
+    assert empezado.wait(5)
+    encargo.abandonar()
+    with pytest.raises(Cancelado):
+        encargo.result(5)
+    assert planificador.estadisticas()["cancelados"] == 1
+
+
+def test_trabajo_en_cola_abandonado_no_se_ejecuta():
+    planificador = Planificador(trabajadores=1)
+    liberar, llamadas = threading.Event(), []
+
+    def bloquear(testigo):
+        liberar.wait(5)
+
+    def trabajo(testigo):
+        llamadas.append(1)
+
+    ocupado = planificador.enviar("a", "bloquear", bloquear)
+    en_cola = planificador.enviar("a", "en_cola", trabajo)
+    en_cola.abandonar()
+    liberar.set()
+    ocupado.result(5)
+    with pytest.raises(CancelledError):
+        en_cola.result(5)
+    assert llamadas == []
+
+
+def test_compartido_sigue_si_otra_sesion_lo_espera():
+    planificador = Planificador(trabajadores=1)
+    liberar = threading.Event()
+
+    def trabajo(testigo):
+        liberar.wait(5)
+        testigo.comprobar()
+        return "hecho"
+
+    primero = planificador.enviar("a", "clave", trabajo)
+    segundo = planificador.enviar("b", "clave", trabajo)
+    primero.abandonar()
+    liberar.set()
+    assert segundo.result(5) == "hecho"
+
+
+def test_resultado_conservado_se_reutiliza():
+    planificador = Planificador(trabajadores=1)
+    llamadas = []
+
+    def trabajo(testigo):
+        llamadas.append(1)
+        return len(llamadas)
+
+    planificador.enviar("a", "clave", trabajo, conservar=True).result(5)
+    assert planificador.enviar("b", "clave", trabajo, conservar=True).result(5) == 1
+    assert llamadas == [1]
@@ -0,0 +1,37 @@
+import numpy as np
+
+from panel.preparacion import MIN_PRECIOS_GRUPO, UMBRAL_ATIPICOS, marcar_atipicos, outlier_groups, techo_precio
+
+
+def test_marcar_atipicos_como_mediana_y_mad_por_grupo(ciudad):
+    data = ciudad.copy()
+    data["price"] = data["price"].astype(float)
+    data.loc[data.index[::97], "price"] *= 20
+    data.loc[data.index[5], "price"] = np.nan
+    marcar_atipicos(data)
+
+    esperado = np.full(len(data), np.nan)
+    for _, grupo in data.groupby(outlier_groups, dropna=False):
+        precio = grupo["price"].to_numpy()
+        if np.isfinite(precio).sum() < MIN_PRECIOS_GRUPO:
+            continue
+        mediana = np.nanmedian(precio)
+        desviacion = np.abs(precio - mediana)
+        mad = np.nanmedian(desviacion)
+        if mad > 0:
+            z = 0.6745 * (precio - mediana) / mad
+        else:
+            z = (precio - mediana) / (1.253314 * np.nanmean(desviacion))
+        z[desviacion == 0] = 0
+        esperado[data.index.get_indexer(grupo.index)] = z
+
+    np.testing.assert_allclose(data["price_robust_z"], esperado, equal_nan=True)
+    assert data["price_outlier"].tolist() == (np.abs(np.nan_to_num(esperado)) > UMBRAL_ATIPICOS).tolist()
+    assert data["price_outlier"].iloc[::97].mean() > 0.9
+
+
+def test_techo_precio_sin_atipicos(ciudad):
+    data = marcar_atipicos(ciudad.assign(price=ciudad["price"].astype(float)))
+    normales = data.loc[~data["price_outlier"], "price"]
+    assert techo_precio(data) == normales.quantile(0.95)
+    assert techo_precio(ciudad) == ciudad["price"].quantile(0.95)
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from panel import similitud
+from panel.preparacion import AmenidadesParseadas, parse_amenities
+
+
+@pytest.fixture(scope="module")
+def conjuntos(ciudad):
+    return [set(parse_amenities(texto)) for texto in ciudad["amenities"]]
+
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b) if a | b else 0.0
+
+
+def test_jaccard_exacta(ciudad, conjuntos):
+    candidatos = np.arange(1, 200)
+    obtenida = similitud.jaccard(AmenidadesParseadas(ciudad["amenities"]), 0, candidatos)
+    np.testing.assert_allclose(obtenida, [_jaccard(conjuntos[0], conjuntos[c]) for c in candidatos])
+
+
+@pytest.mark.parametrize("posicion", [0, 17, 512, 2999])
+def test_similares_como_jaccard_por_fuerza_bruta(ciudad, conjuntos, posicion):
+    indice = similitud.IndiceSimilitud.construir(ciudad)
+    candidatos, obtenida = indice.similares(posicion, 10, AmenidadesParseadas(ciudad["amenities"]))
+    exacta = np.array([_jaccard(conjuntos[posicion], c) for c in conjuntos])
+    exacta[posicion] = -1
+    # La similitud devuelta es la exacta y, como LSH es aproximado, la de cada
+    # puesto queda muy cerca de la del mismo puesto en la búsqueda exhaustiva
+    np.testing.assert_allclose(exacta[candidatos], obtenida)
+    assert np.all(np.diff(obtenida) <= 0)
+    np.testing.assert_allclose(obtenida, np.sort(exacta)[::-1][:10], atol=0.03)
+
+
+def test_filas_sin_amenidades(ciudad):
+    data = ciudad.iloc[:50].copy()
+    data.loc[data.index[:5], "amenities"] = ["[]", "", None, "[]", "[]"]
+    indice = similitud.IndiceSimilitud.construir(data)
+    assert indice.vacias[:5].all() and not indice.vacias[5:].any()
+    assert len(indice.similares(0)[0]) == 0
+    assert not np.isin(np.arange(5), indice.similares(10, 40)[0]).any()
+
+
+def test_mismas_amenidades_que_los_filtros(ciudad):
+    # El texto con comillas simples o espacios distintos se parsea igual que en los filtros
+    data = ciudad.iloc[:200].copy()
+    otra = data.assign(amenities=[repr(parse_amenities(texto)) for texto in data["amenities"]])
+    assert np.array_equal(
+        similitud.IndiceSimilitud.construir(data).firmas, similitud.IndiceSimilitud.construir(otra).firmas
+    )